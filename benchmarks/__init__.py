@@ -0,0 +1 @@
+"""Headless benchmarks for the runner's hot paths, run with `python -m benchmarks`."""
@@ -0,0 +1,97 @@
+"""Runs the benchmarks, writes the results as JSON and compares them to a baseline.
+
+    python -m benchmarks                          # 100, 10k and 100k items
+    python -m benchmarks --sizes 100 10000 --widgets
+    python -m benchmarks --sizes 1000000          # sharded matching too, from 200k
+    python -m benchmarks --save-baseline          # results become the new baseline
+
+Every metric is "lower is better" (milliseconds, bytes, ...). The exit code is 1 if
+any metric got slower than the baseline by more than `--threshold`.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from pathlib import Path
+
+from benchmarks import filtering, widgets
+
+BENCHMARKS_DIR = Path(__file__).parent
+DEFAULT_OUTPUT = BENCHMARKS_DIR / "results" / "latest.json"
+DEFAULT_BASELINE = BENCHMARKS_DIR / "results" / "baseline.json"
+
+
+def compare(
+    results: dict[str, float], baseline: dict[str, float], threshold: float
+) -> list[str]:
+    """Prints every metric next to its baseline, returns those that regressed"""
+    regressions = []
+    for metric, value in results.items():
+        if (before := baseline.get(metric)) is None or before <= 0:
+            print(f"{metric:<64} {value:>12.3f}")
+            continue
+        ratio = value / before
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSED"
+            regressions.append(metric)
+        elif ratio < 1 - threshold:
+            flag = "  improved"
+        print(f"{metric:<64} {value:>12.3f} {before:>12.3f} {ratio:>7.2f}x{flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5, help="best of N runs")
+    parser.add_argument(
+        "--widgets",
+        action="store_true",
+        help="also time list population, under Xvfb if there's no display",
+    )
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.15,
+        help="relative slowdown reported as a regression",
+    )
+    args = parser.parse_args()
+
+    results = filtering.run(args.sizes, args.repeat)
+    if args.widgets:
+        results |= widgets.run(args.sizes, args.repeat)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "sizes": args.sizes,
+            "repeat": args.repeat,
+        },
+        "results": {k: round(v, 4) for k, v in results.items()},
+    }
+    data = json.dumps(report, indent=2, ensure_ascii=False)
+    for path in (args.output, *([args.baseline] if args.save_baseline else [])):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(data)
+    print(f"Results written to {args.output}")
+
+    baseline = {}
+    if not args.save_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())["results"]
+    regressions = compare(report["results"], baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed past {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Synthetic runner items, generated deterministically so runs stay comparable."""
+
+import random
+
+# Real desktop app names, the bulk of what the apps plugin shows
+APP_NAMES = (
+    "Firefox", "Firefox Developer Edition", "Chromium", "Google Chrome", "Brave",
+    "Thunderbird", "Evolution", "Geary", "Files", "Nautilus", "Dolphin", "Thunar",
+    "Terminal", "GNOME Terminal", "Konsole", "Alacritty", "kitty", "foot", "WezTerm",
+    "Visual Studio Code", "VSCodium", "GNU Emacs", "Neovim", "Vim", "Kate", "gedit",
+    "Text Editor", "LibreOffice Writer", "LibreOffice Calc", "LibreOffice Impress",
+    "GIMP", "Inkscape", "Krita", "Blender", "darktable", "Shotwell", "Image Viewer",
+    "mpv Media Player", "VLC media player", "Rhythmbox", "Spotify", "Audacity",
+    "OBS Studio", "Kdenlive", "Steam", "Lutris", "Discord", "Signal", "Element",
+    "Telegram Desktop", "Slack", "Zoom", "Settings", "System Monitor", "Disks",
+    "Calculator", "Calendar", "Contacts", "Clocks", "Weather", "Maps", "Software",
+    "Extension Manager", "Tweaks", "dconf Editor", "Network Connections",
+    "Bluetooth Manager",
+    "Volume Control", "PulseAudio Volume Control", "Htop", "Btop++", "Baobab",
+    "Document Viewer", "Okular", "Zathura", "KeePassXC", "Bitwarden", "Transmission",
+    "qBittorrent", "Remmina", "Virtual Machine Manager", "Boxes", "GNOME Builder",
+    "Android Studio", "IntelliJ IDEA Community Edition", "PyCharm Professional",
+    "Qt Designer", "Wireshark", "Font Viewer", "Character Map", "Screenshot",
+    "Color Picker", "Archive Manager", "Ark", "Parcellite", "Nextcloud Desktop",
+)  # fmt: skip
+
+_WORDS = (
+    "system", "settings", "manager", "viewer", "editor", "monitor", "player",
+    "studio", "desktop", "control", "network", "audio", "video", "image", "file",
+    "browser", "mail", "terminal", "office", "backup", "printer", "devices",
+    "keyboard", "display", "power", "session", "remote", "sync", "cloud", "photo",
+)  # fmt: skip
+
+# Names in scripts whose casefolding/width differs from ASCII
+_MULTILANGUAGE = (
+    "Systemeinstellungen", "Größenänderung", "Straßenkarte", "Éditeur de texte",
+    "Lecteur multimédia", "Настройки системы", "Текстовый редактор", "Диспетчер файлов",
+    "Ρυθμίσεις συστήματος", "設定", "ファイルマネージャー", "テキストエディタ",
+    "系统监视器", "文件管理器", "시스템 설정", "파일 관리자", "إعدادات النظام",
+    "מנהל קבצים", "सिस्टम सेटिंग्स", "İnternet Tarayıcısı", "Ärende 🔥 Tracker",
+)  # fmt: skip
+
+
+def generate_items(count: int, seed: int = 0) -> dict[int, str]:
+    """`count` runner items, mostly app-like names plus multi-language and long ones"""
+    rng = random.Random(seed)
+    items: dict[int, str] = {}
+    for key in range(count):
+        roll = rng.random()
+        if key < len(APP_NAMES):
+            item = APP_NAMES[key]
+        elif roll < 0.6:
+            item = f"{rng.choice(APP_NAMES)} {rng.choice(_WORDS).title()}"
+        elif roll < 0.8:
+            item = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(2, 4)))
+            item = item.title() if rng.random() < 0.5 else item.replace(" ", "-")
+        elif roll < 0.95:
+            item = f"{rng.choice(_MULTILANGUAGE)} {rng.choice(_MULTILANGUAGE)}"
+        else:
+            # Very long entries, e.g. links or clipboard history
+            item = "/".join(rng.choice(_WORDS) for _ in range(rng.randint(40, 120)))
+        items[key] = item
+    return items
+
+
+# Scripted sessions: what gets typed, "\b" erasing the last character
+TYPING_SESSIONS: dict[str, str] = {
+    "type_firefox": "firefox",
+    "type_two_terms": "sys mon",
+    "type_typo_and_fix": "termn\b\binal",
+    "type_and_clear": "libre\b\b\b\b\b",
+    "type_multilanguage": "файл",
+    "type_no_match": "zqxjv",
+}
+
+# Queries measured for raw, uncached filtering throughput
+THROUGHPUT_QUERIES = ("f", "fi", "fire", "set", "sys mon", "editor", "zqx", "設定")
+
+
+def session_queries(script: str) -> list[str]:
+    """The query after every keystroke of a typing script"""
+    queries: list[str] = []
+    query = ""
+    for char in script:
+        query = query[:-1] if char == "\b" else query + char
+        queries.append(query)
+    return queries
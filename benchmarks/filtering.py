@@ -0,0 +1,163 @@
+"""Filtering and ranking benchmarks, no GTK needed."""
+
+import gc
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from benchmarks.corpus import (
+    THROUGHPUT_QUERIES,
+    TYPING_SESSIONS,
+    generate_items,
+    session_queries,
+)
+from modules.runner.item_filter import ItemFilter
+from modules.runner.matcher import FuzzyMatcher, Matcher, PreparedItems
+from modules.runner.sharded_matcher import MIN_SHARDED_ITEMS, ShardedMatcher
+
+# `MAX_RESULTS` of the runner, which can't be imported without GTK
+RUNNER_RESULTS = 100
+
+
+def _best_of(run: Callable[[], object], repeat: int) -> float:
+    """Fastest of `repeat` runs, in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def bench_prepare(items: dict[int, str], repeat: int) -> dict[str, float]:
+    """Time to normalize items, and the memory that takes per item"""
+    results = {"prepare_ms": _best_of(lambda: PreparedItems(items), repeat)}
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        prepared = PreparedItems(items)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    results["bytes_per_item"] = (after - before) / max(len(prepared), 1)
+    for part, size in memory_breakdown(items, prepared).items():
+        results[f"bytes_per_item.{part}"] = size / max(len(prepared), 1)
+    return results
+
+
+def memory_breakdown(items: dict[int, str], prepared: PreparedItems) -> dict[str, int]:
+    """Bytes held by each part of `prepared`, beyond the strings of `items` itself"""
+    shared = {id(text) for text in items.values()}
+    counted: set[int] = set()
+
+    def size_of(value: object) -> int:
+        size = sys.getsizeof(value)
+        if isinstance(value, list):
+            for element in value:
+                if id(element) not in shared and id(element) not in counted:
+                    counted.add(id(element))
+                    size += sys.getsizeof(element)
+        return size
+
+    return {
+        part: size_of(getattr(prepared, part))
+        for part in ("keys", "texts", "folded", "shapes", "alphabetical")
+    } | {
+        # Only built once a substring search needs them
+        "lines": sum(
+            size_of(lines.buffer) + size_of(lines.starts) + size_of(lines.indices)
+            for lines in prepared._lines or ()
+        )
+    }
+
+
+def bench_throughput(
+    items: dict[int, str], matcher: Matcher, repeat: int
+) -> dict[str, float]:
+    """Uncached filtering of the whole item set, like `_filter_items` used to do"""
+    prepared = PreparedItems(items)
+    results: dict[str, float] = {}
+    for query in THROUGHPUT_QUERIES:
+        ms = _best_of(lambda: matcher.match(query, prepared), repeat)
+        results[f"query[{query}]_ms"] = ms
+    results["us_per_item"] = (
+        statistics.mean(results.values()) * 1000 / max(len(prepared), 1)
+    )
+    return results
+
+
+def bench_sharded(items: dict[int, str], repeat: int) -> dict[str, float]:
+    """Like `bench_throughput`, over a process per core (top 2000 results only)"""
+    prepared = PreparedItems(items)
+    matcher = ShardedMatcher()
+    try:
+        # Workers start and load their shards on the first query
+        results = {"warmup_ms": _best_of(lambda: matcher.match("warmup", prepared), 1)}
+        for query in THROUGHPUT_QUERIES:
+            ms = _best_of(lambda: matcher.match(query, prepared), repeat)
+            results[f"query[{query}]_ms"] = ms
+    finally:
+        matcher.close()
+    return results
+
+
+def bench_sessions(
+    items: dict[int, str], matcher: Matcher, repeat: int, limit: int | None = None
+) -> dict[str, float]:
+    """Per-keystroke latency of scripted typing/backspacing, through `ItemFilter`"""
+    results: dict[str, float] = {}
+    all_keystrokes: list[float] = []
+    for name, script in TYPING_SESSIONS.items():
+        queries = session_queries(script)
+        best: list[float] | None = None
+        for _ in range(repeat):
+            # A fresh filter per run, the way the runner gets one per open
+            item_filter = ItemFilter(items, matcher, limit=limit)
+            keystrokes = []
+            for query in queries:
+                start = time.perf_counter()
+                item_filter.filter(query)
+                keystrokes.append((time.perf_counter() - start) * 1000)
+            if best is None or sum(keystrokes) < sum(best):
+                best = keystrokes
+        assert best is not None
+        results[f"{name}.total_ms"] = sum(best)
+        results[f"{name}.max_keystroke_ms"] = max(best)
+        all_keystrokes.extend(best)
+
+    ordered = sorted(all_keystrokes)
+    for p in (50, 95, 99):
+        results[f"keystroke_p{p}_ms"] = ordered[
+            min(len(ordered) - 1, len(ordered) * p // 100)
+        ]
+    return results
+
+
+def run(sizes: list[int], repeat: int) -> dict[str, float]:
+    matcher = FuzzyMatcher()
+    # As in the shard workers and the clipboard search
+    top_matcher = FuzzyMatcher(RUNNER_RESULTS)
+    results: dict[str, float] = {}
+    for size in sizes:
+        items = generate_items(size)
+        for group, bench in (
+            ("prepare", lambda: bench_prepare(items, repeat)),
+            ("throughput", lambda: bench_throughput(items, matcher, repeat)),
+            ("sessions", lambda: bench_sessions(items, matcher, repeat)),
+            ("top.throughput", lambda: bench_throughput(items, top_matcher, repeat)),
+            # As the runner filters by default
+            (
+                "top.sessions",
+                lambda: bench_sessions(items, matcher, repeat, RUNNER_RESULTS),
+            ),
+        ):
+            for metric, value in bench().items():
+                results[f"filter.{size}.{group}.{metric}"] = value
+        if size >= MIN_SHARDED_ITEMS:
+            for metric, value in bench_sharded(items, repeat).items():
+                results[f"filter.{size}.sharded.{metric}"] = value
+    return results
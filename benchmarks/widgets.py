@@ -0,0 +1,103 @@
+"""Result list population benchmarks. These need GTK and a (virtual) display."""
+
+import os
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+
+from loguru import logger
+
+from benchmarks.corpus import generate_items
+
+# Rows created for the legacy (one widget per result) path, beyond that it's only
+# getting slower linearly
+LEGACY_MAX_ROWS = 2000
+
+
+@contextmanager
+def virtual_display():
+    """Starts Xvfb if there's no display to draw on, yields whether one is available"""
+    if os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"):
+        yield True
+        return
+    if (xvfb := shutil.which("Xvfb")) is None:
+        yield False
+        return
+
+    display = ":97"
+    server = subprocess.Popen(
+        [xvfb, display, "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    os.environ["DISPLAY"] = display
+    time.sleep(0.5)
+    try:
+        yield server.poll() is None
+    finally:
+        del os.environ["DISPLAY"]
+        server.terminate()
+        server.wait()
+
+
+def _drain_events(gtk):
+    while gtk.events_pending():
+        gtk.main_iteration_do(False)
+
+
+def run(sizes: list[int], repeat: int) -> dict[str, float]:
+    with virtual_display() as available:
+        if not available:
+            logger.warning("No display and no Xvfb, skipping widget benchmarks")
+            return {}
+        try:
+            from gi.repository import Gtk  # type: ignore
+
+            from modules.runner.matcher import PreparedItems
+            from modules.runner.result_list import ResultRow, VirtualList
+        except ImportError:
+            logger.warning("GTK or fabric not installed, skipping widget benchmarks")
+            return {}
+
+        results: dict[str, float] = {}
+        for size in sizes:
+            prepared = PreparedItems(generate_items(size))
+            texts = [prepared.texts[i] for i in prepared.alphabetical]
+
+            legacy_ms = virtual_ms = float("inf")
+            for _ in range(repeat):
+                window = Gtk.Window()
+                box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+                window.add(box)
+                window.show_all()
+                _drain_events(Gtk)
+                start = time.perf_counter()
+                for key, text in enumerate(texts[:LEGACY_MAX_ROWS]):
+                    row = ResultRow()
+                    row.bind(key, text)
+                    box.add(row)
+                box.show_all()
+                _drain_events(Gtk)
+                legacy_ms = min(legacy_ms, (time.perf_counter() - start) * 1000)
+                window.destroy()
+
+                window = Gtk.Window(default_width=450, default_height=300)
+                scrolled = Gtk.ScrolledWindow()
+                virtual_list = VirtualList(
+                    make_row=ResultRow,
+                    bind_row=lambda row, i: row.bind(i, texts[i]),
+                )
+                scrolled.add(virtual_list)
+                window.add(scrolled)
+                window.show_all()
+                _drain_events(Gtk)
+                start = time.perf_counter()
+                virtual_list.set_count(len(texts))
+                _drain_events(Gtk)
+                virtual_ms = min(virtual_ms, (time.perf_counter() - start) * 1000)
+                window.destroy()
+
+            results[f"widgets.{size}.legacy_populate_ms"] = legacy_ms
+            results[f"widgets.{size}.virtual_populate_ms"] = virtual_ms
+        return results
@@ -0,0 +1,74 @@
+#!/usr/bin/env -S python3 -S
+"""Summons a plugin of a running fafafa instance, meant for compositor keybindings.
+
+    fafafa_msg.py apps
+    fafafa_msg.py quick_links mode=add
+    fafafa_msg.py --latency search
+
+`key=value` arguments become plugin kwargs (values are parsed as JSON when they
+can be, e.g. `limit=5`). Only the standard library is imported, and `-S` skips
+site-packages, to keep interpreter startup out of the way. Without Python:
+
+    echo '{"plugin": "apps"}' | socat - UNIX-CONNECT:$XDG_RUNTIME_DIR/fafafa.sock
+"""
+
+import json
+import os
+import socket
+import sys
+import time
+
+
+def socket_path() -> str:
+    # Same as `shared.ipc.socket_path`, not imported to keep startup minimal
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime:
+        runtime = os.path.join(
+            os.environ.get("TMPDIR", "/tmp"), f"fafafa-{os.getuid()}"
+        )
+    return os.path.join(runtime, "fafafa.sock")
+
+
+def parse_kwargs(args: list[str]) -> dict:
+    kwargs = {}
+    for arg in args:
+        key, _, value = arg.partition("=")
+        try:
+            kwargs[key] = json.loads(value)
+        except ValueError:
+            kwargs[key] = value
+    return kwargs
+
+
+def main(argv: list[str]) -> int:
+    show_latency = "--latency" in argv
+    args = [arg for arg in argv if arg != "--latency"]
+    if not args:
+        print(__doc__, file=sys.stderr)
+        return 2
+
+    request = {"plugin": args[0], "kwargs": parse_kwargs(args[1:])}
+    start = time.perf_counter()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        try:
+            conn.connect(socket_path())
+        except OSError as e:
+            print(f"fafafa doesn't seem to be running: {e}", file=sys.stderr)
+            return 1
+        conn.sendall(json.dumps(request).encode() + b"\n")
+        response = b""
+        while not response.endswith(b"\n") and (chunk := conn.recv(4096)):
+            response += chunk
+    elapsed = (time.perf_counter() - start) * 1000
+
+    result = json.loads(response or b'{"ok": false, "error": "no response"}')
+    if show_latency:
+        print(f"round trip {elapsed:.2f}ms, handled in {result.get('handled_ms')}ms")
+    if not result.get("ok"):
+        print(result.get("error"), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,11 +1,25 @@
-from fabric import Application
-from fabric.utils import get_relative_path
-from modules.window import AppWindow
-from plugins.registry import PLUGINS_REGISTRY
+from shared.instrumentation import TRACER
+from shared.paths import user_cache_dir
+from shared.startup import STARTUP
 
+with STARTUP.measure_import("fabric"):
+    from fabric import Application
+    from fabric.utils import get_relative_path
+    from gi.repository import GLib  # type: ignore
+with STARTUP.measure_import("modules.window"):
+    from modules.window import AppWindow
+with STARTUP.measure_import("plugins.registry"):
+    from plugins.registry import PLUGINS_REGISTRY, get_plugin, prewarm_plugins
+with STARTUP.measure_import("shared.ipc"):
+    from shared.ipc import IpcServer
+
+
+# Plugins loaded in idle time right after startup, instead of on first use
+PREWARM_PLUGINS: tuple[str, ...] = ("apps", "clipboard")
 
 window: AppWindow
 app: Application
+ipc: IpcServer
 
 
 def set_css(app: Application):
@@ -17,14 +31,58 @@ def set_css(app: Application):
 def use_plugin(plugin_name: str, **kwargs):
     global window
 
-    plugin = PLUGINS_REGISTRY.get(plugin_name)
+    TRACER.flow_start("summon")
+    STARTUP.mark("first summon")
+    plugin = get_plugin(plugin_name)
     if not plugin:
         return
     plugin.run(window=window, **kwargs)
 
 
+def _handle_ipc_request(plugin_name: str, kwargs: dict) -> bool:
+    if plugin_name not in PLUGINS_REGISTRY:
+        return False
+    use_plugin(plugin_name, **kwargs)
+    return True
+
+
+def startup_report() -> dict:
+    """Startup timings, handy to query through fabric's remote evaluation"""
+    return STARTUP.as_dict()
+
+
+def set_tracing(enabled: bool = True):
+    """Turns hot path latency instrumentation on or off"""
+    TRACER.enabled = enabled
+
+
+def latency_report() -> dict:
+    """Rolling p50/p95/p99 latencies (ms) per instrumented metric"""
+    return TRACER.percentiles()
+
+
+def dump_trace(path: str | None = None) -> str:
+    """Writes recorded spans as a Chrome trace JSON file, returns its path"""
+    return str(TRACER.dump_chrome_trace(path or user_cache_dir() / "trace.json"))
+
+
+def _handle_first_draw(*_):
+    # The window starts hidden, so this is the first summon's, not startup's:
+    # compare with the "first summon" mark
+    STARTUP.mark("first window draw")
+    STARTUP.save()
+    window.disconnect_by_func(_handle_first_draw)
+
+
+def _handle_main_loop_started():
+    STARTUP.mark("main loop started")
+    STARTUP.save()
+    prewarm_plugins(PREWARM_PLUGINS)
+    return False
+
+
 def main():
-    global app, window
+    global app, window, ipc
 
     window = AppWindow()
     app = Application(
@@ -34,7 +92,18 @@ def main():
 
     set_css(app=app)
 
-    app.run()
+    # Keybindings summon plugins through `fafafa_msg.py` rather than remote eval
+    ipc = IpcServer(_handle_ipc_request)
+    ipc.start()
+
+    window.connect_after("draw", _handle_first_draw)
+    GLib.idle_add(_handle_main_loop_started)
+    STARTUP.mark("window created")
+
+    try:
+        app.run()
+    finally:
+        ipc.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,89 @@
+import threading
+from collections.abc import Callable
+from functools import partial
+from typing import Any
+
+from loguru import logger
+
+from modules.runner.matcher import FilterCancelled
+
+type Dispatch = Callable[[Callable[[], Any]], Any]
+"""Schedules a callable on the thread that owns the results, e.g. `GLib.idle_add`"""
+
+
+class CancelToken:
+    """Handed to work running in `FilterWorker`, tells it whether it's still wanted"""
+
+    def __init__(self, worker: "FilterWorker", generation: int) -> None:
+        self._worker = worker
+        self.generation = generation
+
+    def cancelled(self) -> bool:
+        return self._worker.generation != self.generation
+
+
+class FilterWorker:
+    """Runs filter work on a background thread, tagged with a generation counter.
+
+    Every `submit` (or `cancel`) bumps the generation. Work that was queued but not
+    started yet is replaced by the newest submission, running work sees its token
+    get cancelled, and results are only handed to `on_done` (through `dispatch`)
+    if their generation is still the current one when they arrive.
+    """
+
+    def __init__(self, dispatch: Dispatch) -> None:
+        self.generation = 0
+        self._dispatch = dispatch
+        self._condition = threading.Condition()
+        self._pending: (
+            tuple[int, Callable[[CancelToken], Any], Callable[[Any], None]] | None
+        ) = None
+        self._thread: threading.Thread | None = None
+
+    def submit[T](
+        self,
+        work: Callable[[CancelToken], T],
+        on_done: Callable[[T], None],
+    ) -> int:
+        with self._condition:
+            self.generation += 1
+            self._pending = (self.generation, work, on_done)
+            self._condition.notify()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="runner-filter", daemon=True
+                )
+                self._thread.start()
+            return self.generation
+
+    def cancel(self):
+        """Drops queued work and makes results of running work stale"""
+        with self._condition:
+            self.generation += 1
+            self._pending = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None:
+                    self._condition.wait()
+                generation, work, on_done = self._pending
+                self._pending = None
+
+            token = CancelToken(self, generation)
+            try:
+                result = work(token)
+            except FilterCancelled:
+                continue
+            except Exception:
+                logger.exception("Exception in runner filter worker!")
+                continue
+            if not token.cancelled():
+                self._dispatch(partial(self._deliver, generation, on_done, result))
+
+    def _deliver(self, generation: int, on_done: Callable[[Any], None], result):
+        # Re-checked on the receiving thread, a newer submit may have happened
+        # while this was waiting to be dispatched
+        if generation == self.generation:
+            on_done(result)
+        return False
@@ -0,0 +1,200 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
+
+from modules.runner.matcher import (
+    CancelCheck,
+    Match,
+    Matcher,
+    PreparedItems,
+    best,
+    rank,
+)
+
+type SearchHook = Callable[[str, CancelCheck], list[tuple[int, str]]]
+"""Searches for a query on its own, returning `(key, item)` results best first"""
+
+
+class ItemFilter:
+    """Filters one set of runner items, narrowing incrementally while typing.
+
+    Keeps a bounded LRU of recent query -> matches. When the query extends a cached
+    one (typing "fir" after "fi"), only the cached matches are searched; when it
+    hits the cache exactly (backspacing), the cached result is returned as is.
+
+    `boosts` are added to the match score of the given item keys before ranking,
+    e.g. to favour frequently launched items. With a `limit`, only the best that
+    many matches (after boosts) are returned for a query, while all of them are
+    kept to narrow down from. Blank queries always list every item.
+
+    More items can be `add`ed at any time (e.g. while a source is still streaming
+    them in), they're taken in by the next `filter`.
+    """
+
+    def __init__(
+        self,
+        items: Mapping[int, str],
+        matcher: Matcher,
+        cache_size: int = 32,
+        boosts: Mapping[int, int] | None = None,
+        limit: int | None = None,
+    ) -> None:
+        self.items = PreparedItems(items)
+        self.matcher = matcher
+        self.boosts = boosts or {}
+        self.limit = limit
+        self._cache_size = cache_size
+        # Query -> (all matches, the ones returned)
+        self._cache: OrderedDict[str, tuple[list[Match], list[Match]]] = OrderedDict()
+        # Filtering normally happens on a worker thread, but may be forced on
+        # another one (e.g. when submitting before results arrived)
+        self._lock = threading.Lock()
+        self._pending: dict[int, str] = {}
+        self._pending_boosts: dict[int, int] = {}
+        self._pending_lock = threading.Lock()
+
+    def add(self, items: Mapping[int, str], boosts: Mapping[int, int] | None = None):
+        """Queues more items (and their boosts). Cheap, so it never blocks the UI."""
+        with self._pending_lock:
+            self._pending.update(items)
+            if boosts:
+                self._pending_boosts.update(boosts)
+
+    def filter(self, query: str, cancelled: CancelCheck | None = None) -> list[Match]:
+        """Matches for `query`, best first.
+
+        Raises `FilterCancelled` if `cancelled` reports True before it's done,
+        in which case nothing gets cached.
+        """
+        with self._lock:
+            self._take_pending(query)
+            if (cached := self._cache.get(query)) is not None:
+                self._cache.move_to_end(query)
+                return cached[1]
+
+            base = self._narrowest_cached(query) if self.matcher.incremental else None
+            candidates = None if base is None else [m.index for m in base]
+            ranked = self._ranked(query)
+            matches = self.matcher.match(
+                query, self.items, candidates, cancelled, ranked=ranked
+            )
+            if self.boosts:
+                self._boost(matches, blank=not query.strip(), ranked=ranked)
+
+            shown = matches if ranked else best(matches, self.items, self.limit)
+            self._cache[query] = (matches, shown)
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            return shown
+
+    def cached(self, query: str) -> list[Match] | None:
+        """Matches for `query` if they're known already, without filtering"""
+        if self._pending:
+            return None
+        cached = self._cache.get(query)
+        return None if cached is None else cached[1]
+
+    def _ranked(self, query: str) -> bool:
+        """Whether all matches get ranked, or only the best `limit` are picked"""
+        return self.limit is None or not query.strip()
+
+    def set_boosts(self, boosts: Mapping[int, int]):
+        with self._lock:
+            self.boosts = boosts
+            self._cache.clear()
+
+    def _take_pending(self, query: str):
+        with self._pending_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            boosts, self._pending_boosts = self._pending_boosts, {}
+        if boosts:
+            self.boosts = {**self.boosts, **boosts}
+        added = self.items.extend(pending)
+
+        # Cached results `query` can still build on only need the new items
+        # matched and merged in, the others are dropped. Blank queries list all
+        # items alphabetically, which merging by rank would not preserve.
+        for cached in list(self._cache):
+            if not cached.strip() or not query.startswith(cached):
+                del self._cache[cached]
+                continue
+            ranked = self._ranked(cached)
+            matches = self.matcher.match(cached, self.items, added, ranked=ranked)
+            for match in matches:
+                match.score += self.boosts.get(match.key, 0)
+            # A new list, the previous one may still be shown
+            merged = self._cache[cached][0] + matches
+            if ranked:
+                self._cache[cached] = (rank(merged, self.items),) * 2
+            else:
+                self._cache[cached] = (merged, best(merged, self.items, self.limit))
+
+    def _boost(self, matches: list[Match], blank: bool = False, ranked: bool = True):
+        boosted = False
+        for match in matches:
+            if boost := self.boosts.get(match.key):
+                match.score += boost
+                boosted = True
+        if not boosted or not ranked:
+            return
+        if blank:
+            # Stable, so items with the same boost stay in alphabetical order
+            matches.sort(key=lambda m: -m.score)
+        else:
+            rank(matches, self.items)
+
+    def _narrowest_cached(self, query: str) -> list[Match] | None:
+        """Matches of the longest cached query that `query` extends, if any"""
+        best: str | None = None
+        for cached in self._cache:
+            if (
+                cached.strip()
+                and query.startswith(cached)
+                and (best is None or len(cached) > len(best))
+            ):
+                best = cached
+        return None if best is None else self._cache[best][0]
+
+
+class SearchFilter:
+    """Stands in for `ItemFilter` when results come from a `SearchHook`.
+
+    The hook's order is kept as is; the matcher only locates the characters to
+    highlight. Items are kept (by key) across queries, a key must always come
+    with the same item.
+    """
+
+    def __init__(self, search: SearchHook, matcher: Matcher) -> None:
+        self.items = PreparedItems({})
+        self.search = search
+        self.matcher = matcher
+        self._indices: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def cached(self, query: str) -> list[Match] | None:
+        # Search results may change over time, always ask again
+        return None
+
+    def filter(self, query: str, cancelled: CancelCheck | None = None) -> list[Match]:
+        with self._lock:
+            results = self.search(query, cancelled or _never_cancelled)
+            if new := {k: item for k, item in results if k not in self._indices}:
+                self._indices.update(zip(new, self.items.extend(new), strict=True))
+
+            indices = [self._indices[k] for k, _ in results]
+            positions: dict[int, tuple[int, ...]] = {}
+            if query.strip():
+                positions = {
+                    m.index: m.positions
+                    for m in self.matcher.match(query, self.items, indices)
+                }
+            return [
+                Match(index=i, key=k, score=-n, positions=positions.get(i, ()))
+                for n, (i, (k, _)) in enumerate(zip(indices, results, strict=True))
+            ]
+
+
+def _never_cancelled() -> bool:
+    return False
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+from collections import deque
+from collections.abc import AsyncIterable, Iterable
+
+from loguru import logger
+
+type ItemSource = Iterable[tuple[int, str]] | AsyncIterable[tuple[int, str]]
+"""`(key, item)` pairs produced over time, e.g. by a generator reading a big file"""
+
+
+class ItemStream:
+    """Consumes an `ItemSource` on a background thread, buffering what it produced.
+
+    Async iterables are driven by an event loop of their own on that thread. The
+    buffer is drained by whoever owns the items (the GTK thread) through `take`.
+    """
+
+    def __init__(self, source: ItemSource) -> None:
+        self._source = source
+        self._buffer: deque[tuple[int, str]] = deque()
+        self._stopped = False
+        self._finished = False
+        self._thread = threading.Thread(
+            target=self._run, name="runner-item-source", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def done(self) -> bool:
+        """Whether the source is exhausted and everything it produced was taken"""
+        return self._finished and not self._buffer
+
+    def take(self, limit: int) -> dict[int, str]:
+        """Up to `limit` of the items produced so far, oldest first"""
+        chunk: dict[int, str] = {}
+        buffer = self._buffer
+        while buffer and len(chunk) < limit:
+            key, item = buffer.popleft()
+            chunk[key] = item
+        return chunk
+
+    def stop(self):
+        """Stops consuming the source, after the item it's currently waiting for"""
+        self._stopped = True
+        self._buffer.clear()
+
+    def _run(self):
+        try:
+            if isinstance(self._source, AsyncIterable):
+                asyncio.run(self._consume_async(self._source))
+            else:
+                for pair in self._source:
+                    if self._stopped:
+                        break
+                    self._buffer.append(pair)
+        except Exception:
+            logger.exception("Exception while reading runner items!")
+        finally:
+            self._finished = True
+
+    async def _consume_async(self, source: AsyncIterable[tuple[int, str]]):
+        async for pair in source:
+            if self._stopped:
+                break
+            self._buffer.append(pair)
@@ -0,0 +1,513 @@
+"""Matching and ranking of runner items.
+
+Nothing in here touches GTK, so it can be imported (and benchmarked) on its own.
+"""
+
+import heapq
+import re
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import dataclass
+from itertools import chain, count, islice, repeat
+from operator import contains
+from typing import Protocol
+
+# fzf-style scoring constants
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY = SCORE_MATCH // 2
+BONUS_CAMEL = BONUS_BOUNDARY - 1
+BONUS_CONSECUTIVE = -(SCORE_GAP_START + SCORE_GAP_EXTENSION)
+BONUS_FIRST_CHAR_MULTIPLIER = 2
+# Best a query char can score: at a word start, or continuing a run from one
+MAX_CHAR_SCORE = SCORE_MATCH + BONUS_BOUNDARY * BONUS_FIRST_CHAR_MULTIPLIER
+# Least a term loses to a gap: the chars after one can't do better than a word
+# start's bonus, plus the gap's own penalty
+_GAP_COST = MAX_CHAR_SCORE - (SCORE_MATCH + BONUS_BOUNDARY) - SCORE_GAP_START
+
+_SEPARATORS = frozenset(" \t-_./\\:,;|()[]{}<>'\"")
+
+# How many candidates are scored between checks of the `cancelled` callback
+CANCEL_CHECK_INTERVAL = 1024
+
+type CancelCheck = Callable[[], bool]
+
+
+class FilterCancelled(Exception):
+    """Raised by matchers when their `cancelled` callback reports True"""
+
+
+@dataclass(slots=True)
+class Match:
+    index: int
+    """Position of the item inside `PreparedItems`"""
+    key: int
+    score: int
+    positions: tuple[int, ...] = ()
+    """Indices of matched characters in the original item string, for highlighting"""
+
+
+class _Lines:
+    """Folded items joined by newlines, so bulk rejection runs inside `re`"""
+
+    def __init__(self) -> None:
+        self.buffer = ""
+        self.starts = array("Q")
+        self.indices = array("I")
+        """Item index of every line"""
+
+    def extend(self, indices: Iterable[int], folded: list[str]):
+        if not folded:
+            return
+        joined = "\n".join(folded)
+        if self.starts:
+            offset = len(self.buffer) + 1
+            self.buffer = f"{self.buffer}\n{joined}"
+        else:
+            offset = 0
+            self.buffer = joined
+        for f in folded:
+            self.starts.append(offset)
+            offset += len(f) + 1
+        self.indices.extend(indices)
+
+    def search(self, pattern: re.Pattern[str]) -> Iterator[int]:
+        starts, indices = self.starts, self.indices
+        for m in pattern.finditer(self.buffer):
+            yield indices[bisect_right(starts, m.start()) - 1]
+
+
+class _CharMasks:
+    """Per char, the set of items containing it, as bits of a Python int.
+
+    Intersecting those for every char of a query is a handful of bigint ANDs that
+    run in C, ruling out most items before any of them is looked at one by one.
+    Masks are built on first use, and only for the most recently used chars.
+    """
+
+    _TO_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+    def __init__(self, folded: list[str], max_masks: int = 256) -> None:
+        self._folded = folded
+        self._max_masks = max_masks
+        self._masks: OrderedDict[str, int] = OrderedDict()
+
+    def extend(self, added: range):
+        for char, mask in self._masks.items():
+            self._masks[char] = mask | self._bits(char, added) << added.start
+
+    def containing(self, chars: Iterable[str]) -> list[int]:
+        mask = -1
+        for char in set(chars):
+            mask &= self._mask(char)
+            if not mask:
+                return []
+        if mask < 0:
+            return list(range(len(self._folded)))
+        # Bit n stands for item n, `bin` lists them highest first
+        digits = bin(mask)
+        top = len(digits) - 1
+        return [top - m.start() for m in re.finditer("1", digits)][::-1]
+
+    def _mask(self, char: str) -> int:
+        if (mask := self._masks.get(char)) is not None:
+            self._masks.move_to_end(char)
+            return mask
+        mask = self._masks[char] = self._bits(char, range(len(self._folded)))
+        if len(self._masks) > self._max_masks:
+            self._masks.popitem(last=False)
+        return mask
+
+    def _bits(self, char: str, indices: range) -> int:
+        present = bytes(
+            map(
+                contains,
+                islice(self._folded, indices.start, indices.stop),
+                repeat(char),
+            )
+        )
+        if not present:
+            return 0
+        return int(present[::-1].translate(self._TO_DIGITS), 2)
+
+
+class PreparedItems:
+    """Runner items normalized once, so matching doesn't casefold on every keystroke.
+
+    Kept compact for large sources: keys and orderings live in typed arrays, the
+    original strings are shared with the caller's items, and folded strings are
+    only allocated when folding changed them.
+
+    Matching happens on folded strings, but positions are reported in the
+    original ones (`original_positions`), as folding changes the length of a few
+    (e.g. "ß" to "ss").
+    """
+
+    def __init__(self, items: Mapping[int, str]) -> None:
+        self.keys = array("q")
+        self.texts: list[str] = []
+        self.folded: list[str] = []
+        # Original strings are only usable for position based bonuses (camelCase)
+        # when folding didn't change their length
+        self.shapes: list[str] = []
+        # Items in alphabetical order, shown as is when there's no query
+        self.alphabetical = array("I")
+
+        # Joined buffers for `search_lines`, only built once something searches
+        # them. A single non-ASCII char makes Python store a whole string with 2
+        # or 4 bytes per char, so ASCII items get a buffer of their own.
+        self._lines: tuple[_Lines, _Lines] | None = None
+        self._lined = 0
+        """How many items the buffers hold"""
+        self._char_masks = _CharMasks(self.folded)
+        self.extend(items)
+
+    def extend(self, items: Mapping[int, str]) -> range:
+        """Appends more items, returns the indices they got"""
+        start = len(self.keys)
+        texts = list(items.values())
+        folded = []
+        for text in texts:
+            f = text.casefold().replace("\n", " ")
+            folded.append(text if f == text else f)
+        self.keys.extend(items.keys())
+        self.texts.extend(texts)
+        self.folded.extend(folded)
+        self.shapes.extend(
+            text if len(text) == len(f) else f for text, f in zip(texts, folded)
+        )
+        added = range(start, start + len(texts))
+        key = self.folded.__getitem__
+        # A new array rather than in-place, readers may hold on to the old one
+        self.alphabetical = array(
+            "I", heapq.merge(self.alphabetical, sorted(added, key=key), key=key)
+        )
+        self._char_masks.extend(added)
+        return added
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def original_positions(self, i: int, positions: Iterable[int]) -> tuple[int, ...]:
+        """Ascending positions in item `i`'s folded string, in the original one"""
+        text = self.texts[i]
+        if len(self.folded[i]) == len(text):
+            return tuple(positions)
+        # Rare enough to only be mapped once matched: where each folded char came from
+        sizes = map(len, map(str.casefold, text))
+        origins = list(chain.from_iterable(map(repeat, count(), sizes)))
+        # Chars folded into several ("ß" to "ss") only count once
+        return tuple(dict.fromkeys(origins[pos] for pos in positions))
+
+    def containing(self, chars: Iterable[str]) -> list[int]:
+        """Indices of the items whose folded string contains every one of `chars`"""
+        return self._char_masks.containing(chars)
+
+    def search_lines(self, pattern: re.Pattern[str]) -> list[int]:
+        """Indices of the items whose folded string matches `pattern`.
+
+        `pattern` must not match newlines, and should consume the rest of the line
+        (`[^\\n]*`) so that every item is reported at most once.
+        """
+        ascii_lines, other_lines = self._sync_lines()
+        found = list(ascii_lines.search(pattern))
+        found.extend(other_lines.search(pattern))
+        return found
+
+    def _sync_lines(self) -> tuple[_Lines, _Lines]:
+        """The line buffers, taking in the items added since they were last used"""
+        if self._lines is None:
+            self._lines = (_Lines(), _Lines())
+        ascii_lines, other_lines = self._lines
+        added = range(self._lined, len(self.folded))
+        if not added:
+            return self._lines
+        folded = self.folded[added.start :]
+        ascii_indices = [i for i, f in zip(added, folded) if f.isascii()]
+        if len(ascii_indices) == len(folded):
+            ascii_lines.extend(added, folded)
+        else:
+            key = self.folded.__getitem__
+            other_indices = [i for i, f in zip(added, folded) if not f.isascii()]
+            ascii_lines.extend(ascii_indices, [key(i) for i in ascii_indices])
+            other_lines.extend(other_indices, [key(i) for i in other_indices])
+        self._lined = added.stop
+        return self._lines
+
+
+class Matcher(Protocol):
+    incremental: bool
+    """Whether appending to a query can only narrow its matches.
+
+    Allows `ItemFilter` to search only the previous query's matches while typing.
+    """
+
+    def match(
+        self,
+        query: str,
+        items: PreparedItems,
+        candidates: Iterable[int] | None = None,
+        cancelled: CancelCheck | None = None,
+        ranked: bool = True,
+    ) -> list[Match]:
+        """Matches `query` against `items`, best results first.
+
+        When `candidates` is given, only items at those indices are considered.
+        `cancelled` is polled while matching; once it returns True the matcher
+        gives up by raising `FilterCancelled`. Without `ranked`, matches of a
+        non-blank query may come in any order, for callers that only want the
+        `best` few of them.
+        """
+        ...
+
+
+def _rank_key(items: PreparedItems) -> Callable[[Match], tuple[int, int, str]]:
+    folded = items.folded
+    return lambda m: (-m.score, len(folded[m.index]), folded[m.index])
+
+
+def rank(matches: list[Match], items: PreparedItems) -> list[Match]:
+    """Sorts `matches` in place, best first, and returns them"""
+    matches.sort(key=_rank_key(items))
+    return matches
+
+
+def best(matches: Iterable[Match], items: PreparedItems, limit: int) -> list[Match]:
+    """The first `limit` of what `rank` would return, without sorting them all"""
+    return heapq.nsmallest(limit, matches, key=_rank_key(items))
+
+
+def _checked(candidates: Iterable[int], cancelled: CancelCheck | None) -> Iterator[int]:
+    if cancelled is None:
+        yield from candidates
+        return
+    for n, i in enumerate(candidates):
+        if not n % CANCEL_CHECK_INTERVAL and cancelled():
+            raise FilterCancelled
+        yield i
+
+
+def _all_items(items: PreparedItems, candidates: Iterable[int] | None) -> list[Match]:
+    if candidates is None:
+        order: Iterable[int] = items.alphabetical
+    else:
+        wanted = set(candidates)
+        order = (i for i in items.alphabetical if i in wanted)
+    keys = items.keys
+    return [Match(index=i, key=keys[i], score=0) for i in order]
+
+
+class SubstringMatcher:
+    """Plain substring matching, earlier hits ranked first."""
+
+    incremental = True
+
+    def match(
+        self,
+        query: str,
+        items: PreparedItems,
+        candidates: Iterable[int] | None = None,
+        cancelled: CancelCheck | None = None,
+        ranked: bool = True,
+    ) -> list[Match]:
+        query = query.casefold().strip()
+        if not query:
+            return _all_items(items, candidates)
+
+        folded, keys = items.folded, items.keys
+        if candidates is None:
+            candidates = items.search_lines(re.compile(f"{re.escape(query)}[^\n]*"))
+        size = len(query)
+        matches: list[Match] = []
+        for i in _checked(candidates, cancelled):
+            at = folded[i].find(query)
+            if at < 0:
+                continue
+            matches.append(
+                Match(
+                    index=i,
+                    key=keys[i],
+                    score=SCORE_MATCH * size - at,
+                    positions=items.original_positions(i, range(at, at + size)),
+                )
+            )
+        return rank(matches, items) if ranked else matches
+
+
+class FuzzyMatcher:
+    """fzf-like subsequence matcher.
+
+    Every whitespace separated term of the query must appear in the item as a
+    subsequence. Matches are scored with bonuses for word starts, camelCase humps
+    and consecutive runs, and penalties for gaps.
+
+    With a `limit`, only the best `limit` matches are returned, and items that
+    can't make it are skipped without scoring them (see `_best_matches`). Those
+    results can't be narrowed down incrementally.
+    """
+
+    def __init__(self, limit: int | None = None) -> None:
+        self.limit = limit
+
+    @property
+    def incremental(self) -> bool:
+        return self.limit is None
+
+    def match(
+        self,
+        query: str,
+        items: PreparedItems,
+        candidates: Iterable[int] | None = None,
+        cancelled: CancelCheck | None = None,
+        ranked: bool = True,
+    ) -> list[Match]:
+        terms = query.casefold().split()
+        if not terms:
+            return _all_items(items, candidates)
+
+        if candidates is None:
+            # Rule out items missing any of the query's chars before scoring in python
+            candidates = items.containing("".join(terms))
+        if self.limit is not None:
+            return _best_matches(terms, items, candidates, self.limit, cancelled)
+        matches = _score(terms, items, candidates, cancelled)
+        return rank(matches, items) if ranked else matches
+
+
+def _score(
+    terms: list[str],
+    items: PreparedItems,
+    candidates: Iterable[int],
+    cancelled: CancelCheck | None,
+) -> list[Match]:
+    """Matches among `candidates`, unsorted"""
+    matches: list[Match] = []
+    for i in _checked(candidates, cancelled):
+        if (match := _score_terms(terms, i, items)) is not None:
+            matches.append(match)
+    return matches
+
+
+def _score_terms(terms: list[str], i: int, items: PreparedItems) -> Match | None:
+    folded, shape = items.folded[i], items.shapes[i]
+    if len(terms) == 1:
+        if (result := score_term(terms[0], folded, shape)) is None:
+            return None
+        positions = items.original_positions(i, result[1])
+        return Match(i, items.keys[i], result[0], positions)
+    total = 0
+    matched: set[int] = set()
+    for term in terms:
+        if (result := score_term(term, folded, shape)) is None:
+            return None
+        total += result[0]
+        matched.update(result[1])
+    positions = items.original_positions(i, sorted(matched))
+    return Match(i, items.keys[i], total, positions)
+
+
+def _best_matches(
+    terms: list[str],
+    items: PreparedItems,
+    candidates: Iterable[int],
+    limit: int,
+    cancelled: CancelCheck | None,
+) -> list[Match]:
+    """The best `limit` matches among `candidates`, best first.
+
+    Once `limit` matches are in, the worst of their scores is a bar the rest has to
+    reach, and items that can't are skipped without scoring them. A term that isn't
+    a substring of an item leaves a gap in its match, which caps the item's score.
+    Once the bar is the best possible score, ties go to shorter items, so longer
+    ones are skipped too.
+    """
+    folded = items.folded
+    best_score = MAX_CHAR_SCORE * sum(map(len, terms))
+    matches: list[Match] = []
+    # Scores of the best `limit` matches so far, worst on top
+    scores: list[int] = []
+    bar = None
+    # Negated lengths of the shortest `limit` matches with the best score
+    best_lengths: list[int] = []
+    max_length = None
+
+    for i in _checked(candidates, cancelled):
+        if bar is not None:
+            text = folded[i]
+            if max_length is not None and len(text) > max_length:
+                continue
+            missing = sum(term not in text for term in terms)
+            if best_score - missing * _GAP_COST < bar:
+                continue
+        if (match := _score_terms(terms, i, items)) is None:
+            continue
+        matches.append(match)
+        if len(scores) < limit:
+            heapq.heappush(scores, match.score)
+        elif match.score > scores[0]:
+            heapq.heapreplace(scores, match.score)
+        if len(scores) == limit:
+            bar = scores[0]
+        if match.score == best_score:
+            length = -len(folded[i])
+            if len(best_lengths) < limit:
+                heapq.heappush(best_lengths, length)
+            elif length > best_lengths[0]:
+                heapq.heapreplace(best_lengths, length)
+            if len(best_lengths) == limit:
+                max_length = -best_lengths[0]
+
+    return best(matches, items, limit)
+
+
+def score_term(term: str, folded: str, shape: str) -> tuple[int, list[int]] | None:
+    """Scores a single (folded) query term against an item.
+
+    Returns the score and matched positions, or `None` if `term` isn't a
+    subsequence of `folded`. `shape` is the original string used to detect word
+    boundaries and camelCase; it must be as long as `folded`.
+    """
+    # Forward pass: leftmost occurrence of the whole subsequence
+    end = -1
+    for char in term:
+        end = folded.find(char, end + 1)
+        if end < 0:
+            return None
+
+    # Backward pass: tighten the match to the shortest window ending at `end`
+    positions = [0] * len(term)
+    positions[-1] = pos = end
+    for i in range(len(term) - 2, -1, -1):
+        pos = folded.rfind(term[i], 0, pos)
+        positions[i] = pos
+
+    score = 0
+    run_bonus = 0
+    prev = -1
+    for pos in positions:
+        # Bonus for the char at `pos`: word boundary, camelCase hump or digit run
+        if pos == 0 or (before := shape[pos - 1]) in _SEPARATORS:
+            bonus = BONUS_BOUNDARY
+        elif (before.islower() and shape[pos].isupper()) or (
+            shape[pos].isdigit() and not before.isdigit()
+        ):
+            bonus = BONUS_CAMEL
+        else:
+            bonus = 0
+
+        if prev < 0:
+            bonus *= BONUS_FIRST_CHAR_MULTIPLIER
+            run_bonus = bonus
+        elif pos == prev + 1:
+            # Consecutive chars keep the bonus of the run's first char
+            run_bonus = max(run_bonus, bonus, BONUS_CONSECUTIVE)
+            bonus = run_bonus
+        else:
+            score += SCORE_GAP_START + SCORE_GAP_EXTENSION * (pos - prev - 2)
+            run_bonus = bonus
+        score += SCORE_MATCH + bonus
+        prev = pos
+    return score, positions
@@ -0,0 +1,211 @@
+import math
+from collections.abc import Callable
+
+from fabric.widgets.box import Box
+from fabric.widgets.button import Button
+from fabric.widgets.image import Image
+from fabric.widgets.label import Label
+from gi.repository import GdkPixbuf, GLib, Gtk  # type: ignore
+
+ICON_SIZE = 24
+
+
+class ResultRow(Button):
+    """A runner result slot, which can be rebound to another item at any time"""
+
+    key: int | None = None
+
+    def __init__(self, **kwargs) -> None:
+        self.icon = Image(name="app-icon", h_align="start")
+        # Keeps the label in place while the icon is still loading
+        self.icon.set_size_request(ICON_SIZE, ICON_SIZE)
+        self.label = Label(
+            name="app-label",
+            ellipsization="end",
+            v_align="center",
+            h_align="center",
+        )
+        super().__init__(
+            name="slot-button",
+            child=Box(
+                name="slot-box",
+                orientation="h",
+                spacing=10,
+                children=[self.icon, self.label],
+            ),
+            **kwargs,
+        )
+
+    def bind(
+        self,
+        key: int,
+        item: str,
+        positions: tuple[int, ...] = (),
+        selected: bool = False,
+        show_icon: bool = False,
+    ):
+        self.key = key
+        self.icon.clear()
+        self.icon.set_visible(show_icon)
+        self.label.set_markup(highlight_markup(item, positions))
+        self.set_tooltip_text(item)
+        style = self.get_style_context()
+        if selected:
+            style.add_class("selected")
+        else:
+            style.remove_class("selected")
+
+    def set_icon(self, pixbuf: GdkPixbuf.Pixbuf | None):
+        if pixbuf is None:
+            self.icon.clear()
+        else:
+            self.icon.set_from_pixbuf(pixbuf)
+
+
+class VirtualList(Gtk.Layout):
+    """Scrollable list that only ever holds enough rows to fill its visible area.
+
+    Rows come from a fixed pool and are rebound (through `bind_row`) to whichever
+    result indices are scrolled into view, so the cost of showing results depends
+    on the viewport height, not on how many results there are. All rows are assumed
+    to be as tall as the first result.
+    """
+
+    def __init__(
+        self,
+        make_row: Callable[[], Gtk.Widget],
+        bind_row: Callable[[Gtk.Widget, int], None],
+        spacing: int = 4,
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        self._make_row = make_row
+        self._bind_row = bind_row
+        self._spacing = spacing
+
+        self._count = 0
+        self._rows: list[Gtk.Widget] = []
+        self._row_height = 0
+        self._width = 0
+        self._page_height = 0
+        self._adjustment: Gtk.Adjustment | None = None
+        self._adjustment_handler = 0
+
+        self.connect("size-allocate", self._handle_size_allocate)
+        self.connect("notify::vadjustment", lambda *_: self._track_adjustment())
+        self._track_adjustment()
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def row_height(self) -> int:
+        """Height of a row including spacing, 0 until one was measured"""
+        return self._row_height
+
+    def set_count(self, count: int, keep_offset: bool = False):
+        """Shows `count` results from the top, rebinding every visible row.
+
+        With `keep_offset`, stays scrolled where it was instead (e.g. when the
+        results only grew).
+        """
+        self._count = count
+        self._ensure_pool()
+        if count:
+            # Measured from a bound row, row contents (e.g. icons) vary per source
+            row = self._rows[0]
+            self._bind_row(row, 0)
+            self._row_height = row.get_preferred_height()[1] + self._spacing
+        self.set_size(self._width, self._count * self._row_height)
+        if (
+            not keep_offset
+            and self._adjustment is not None
+            and self._adjustment.get_value() != 0
+        ):
+            self._adjustment.set_value(0)  # rebinds through "value-changed"
+        else:
+            self.refresh()
+
+    def refresh(self):
+        """Rebinds the visible rows, e.g. after the selection changed"""
+        if not self._row_height:
+            return
+        offset = self._adjustment.get_value() if self._adjustment else 0
+        first = int(offset // self._row_height)
+        for i, row in enumerate(self._rows):
+            index = first + i
+            if index >= self._count:
+                row.hide()
+                continue
+            self._bind_row(row, index)
+            self.move(row, 0, index * self._row_height)
+            row.show()
+
+    def scroll_to(self, index: int):
+        """Scrolls the least amount needed for row `index` to be fully visible"""
+        if self._adjustment is None or not self._row_height:
+            return
+        top = index * self._row_height
+        bottom = top + self._row_height - self._spacing
+        value = self._adjustment.get_value()
+        page = self._adjustment.get_page_size()
+        if top < value:
+            self._adjustment.set_value(top)
+        elif bottom > value + page:
+            self._adjustment.set_value(bottom - page)
+
+    def _track_adjustment(self):
+        if self._adjustment is not None and self._adjustment_handler:
+            self._adjustment.disconnect(self._adjustment_handler)
+        self._adjustment = self.get_vadjustment()
+        self._adjustment_handler = (
+            self._adjustment.connect("value-changed", lambda *_: self.refresh())
+            if self._adjustment is not None
+            else 0
+        )
+
+    def _ensure_pool(self):
+        if not self._rows:
+            # Height estimate until the first row is bound and measured
+            row = self._make_row()
+            self.put(row, 0, 0)
+            self._rows.append(row)
+            self._row_height = row.get_preferred_height()[1] + self._spacing
+
+        needed = max(1, math.ceil(self._page_height / self._row_height) + 1)
+        while len(self._rows) < needed:
+            row = self._make_row()
+            row.set_size_request(self._width, -1)
+            self.put(row, 0, 0)
+            self._rows.append(row)
+
+    def _handle_size_allocate(self, _, allocation):
+        if allocation.width == self._width and allocation.height == self._page_height:
+            return
+        self._width, self._page_height = allocation.width, allocation.height
+
+        # Resizing from within size-allocate isn't allowed, defer it
+        def resize():
+            for row in self._rows:
+                row.set_size_request(self._width, -1)
+            self._ensure_pool()
+            self.set_size(self._width, self._count * self._row_height)
+            self.refresh()
+            return False
+
+        GLib.idle_add(resize)
+
+
+def highlight_markup(text: str, positions: tuple[int, ...]) -> str:
+    """Pango markup for `text`, with the chars at `positions` underlined"""
+    markup: list[str] = []
+    last = 0
+    for pos in positions:
+        if pos >= len(text):
+            break
+        markup.append(GLib.markup_escape_text(text[last:pos]))
+        markup.append(f"<u>{GLib.markup_escape_text(text[pos])}</u>")
+        last = pos + 1
+    markup.append(GLib.markup_escape_text(text[last:]))
+    return "".join(markup).replace("</u><u>", "")
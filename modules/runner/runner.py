@@ -1,35 +1,86 @@
-from dataclasses import dataclass
-import operator
-from re import sub
-from typing import Iterator
-from collections.abc import Callable
+import time
+from collections.abc import Callable, Iterator, Mapping
+from dataclasses import dataclass, field
+from functools import partial
 
-from fabric.utils import idle_add, remove_handler
 from fabric.widgets.box import Box
 from fabric.widgets.button import Button
 from fabric.widgets.entry import Entry
 from fabric.widgets.label import Label
 from fabric.widgets.scrolledwindow import ScrolledWindow
-from gi.repository import GLib, Gdk  # type: ignore
-
+from gi.repository import Gdk, GLib, Gtk  # type: ignore
+
+from modules.runner.filter_worker import FilterWorker
+from modules.runner.item_filter import ItemFilter, SearchFilter, SearchHook
+from modules.runner.item_source import ItemSource, ItemStream
+from modules.runner.matcher import FuzzyMatcher, Match, Matcher
+from modules.runner.result_list import ICON_SIZE, ResultRow, VirtualList
+from modules.runner.selection import SelectionModel
 from shared import icons
+from shared.frecency import FRECENCY
+from shared.icon_service import ICON_SERVICE
+from shared.instrumentation import TRACER
+from shared.launcher import LAUNCHER
+from shared.scheduler import SCHEDULER, Priority, Task
 
 type SubmitCallback = Callable[[int | str], None]
-"""We send either the integer key from the items dict, or an arbitrary user-provided string input."""
+"""We send either the integer key from the items dict, or an arbitrary
+user-provided string input."""
+
+# Streamed items are taken in once per frame, for at most this long
+STREAM_FRAME_MS = 16
+STREAM_FRAME_BUDGET_MS = 4
+# How often results get re-filtered while items are still streaming in
+STREAM_ARRANGE_INTERVAL_MS = 100
+# Matches shown for a query by default, nobody scrolls further than that
+MAX_RESULTS = 100
 
 
 @dataclass
 class RunnerConfig:
-    items: dict[int, str]
+    items: dict[int, str] | ItemSource
+    """Either all items, or a (sync or async) iterable of `(key, item)` pairs that
+    gets consumed in the background while the runner is already shown"""
     submit_callback: SubmitCallback
 
     input_hint: str = "Search..."
     input_password: bool = False
+    matcher: Matcher = field(default_factory=FuzzyMatcher)
+    max_results: int | None = MAX_RESULTS
+    """Matches shown for a query, the best ones once boosts are applied. Blank
+    queries list every item."""
+    virtualized: bool = False
+    """Show results in a recycled, fixed-size pool of rows. Meant for big sources."""
+    filter_debounce_ms: int = 0
+    """Wait for typing to pause this long before filtering. Meant for huge sources."""
+    item_icons: dict[int, str] | None = None
+    """Icon names (or paths) by item key, loaded asynchronously while rows show up"""
+    history_key: Callable[[int], str] | None = None
+    """Stable ID for an item key. When set, submitted items are recorded in the
+    launch history, and frequently/recently launched items rank higher."""
+    item_boosts: dict[int, int] | None = None
+    """Fixed score adjustments by item key, e.g. negative ones to rank a kind of
+    items below the others"""
+    retain_key: str | None = None
+    """Keeps the prepared items and the shown list around while hidden, under this
+    key, and shows them again on the next open if `items` is the same object. Only
+    for virtualized runners with a fixed `items` dict, e.g. the apps launcher."""
+    search: SearchHook | None = None
+    """Produces the results for every query instead of filtering `items`. Runs on
+    the filter worker, see `Runner.refilter` for results that change over time."""
+
+
+@dataclass
+class _RetainedState:
+    items: Mapping[int, str]
+    item_filter: ItemFilter
+    stale_boosts: bool = False
 
 
 class Runner(Box):
-    _items_map: dict[int, str] | None = None
-    _selected_index: int | None = None
+    _items_map: Mapping[int, str] | None = None
+    _item_filter: ItemFilter | SearchFilter | None = None
+    _item_stream: ItemStream | None = None
     cfg: RunnerConfig | None = None
 
     def __init__(self, close_callback: Callable | None = None, **kwargs) -> None:
@@ -40,12 +91,32 @@ class Runner(Box):
             **kwargs,
         )
 
-        self._arranger_handler: int = 0
-        self._selected_index = None  # Track the selected item index
+        self._arranger_task: Task | None = None  # Adds the plain viewport's rows
+        self._selection = SelectionModel()
+        self._selection_tick = 0  # Shows the selection on the next frame
+        # Results shown, plain rows for them may still be getting added
+        self._matches: list[Match] = []
+        self._rows: list[ResultRow] = []  # Rows of the plain viewport, in order
+        self._highlighted_row: ResultRow | None = None
+        self._shown_query: str | None = None  # Query the shown results belong to
+        self._debounce_handler: int = 0
+        self._stream_handler: int = 0
+        self._last_stream_arrange = 0.0
+        self._summon_painted = True  # Whether the rows shown on open were painted
+        self._retained: dict[str, _RetainedState] = {}
+        self._ignore_input = False
+        # Filtering never runs on the GTK thread, results come back via idle_add
+        self._filter_worker = FilterWorker(dispatch=GLib.idle_add)
         self._close_callback = close_callback
 
         ### Viewport
         self.viewport = Box(name="viewport", spacing=4, orientation="v")
+        self.virtual_list = VirtualList(
+            name="viewport",
+            spacing=4,
+            make_row=self._make_pooled_slot,
+            bind_row=self._bind_pooled_slot,
+        )
 
         ### Scrolled Window
         self.scrolled_window = ScrolledWindow(
@@ -70,6 +141,12 @@ class Runner(Box):
         )
         self.input_entry.props.xalign = 0.5  # type: ignore
 
+        # Shown while a streamed item source is still producing items
+        self.loading_label = Label(
+            name="runner-loading-label", label="Loading...", visible=False
+        )
+        self.loading_label.set_no_show_all(True)
+
         ### Input box
         self.input_box = Box(
             name="runner-header-box",
@@ -77,6 +154,7 @@ class Runner(Box):
             orientation="h",
             children=[
                 self.input_entry,
+                self.loading_label,
                 Button(
                     name="runner-close-button",
                     child=Label(name="runner-close-label", markup=icons.cancel),
@@ -104,9 +182,11 @@ class Runner(Box):
         self.show_all()
 
     def open(self, cfg: RunnerConfig):
+        self._summon_painted = False
         self._setup_cfg(cfg=cfg)
+        if not self._restore_retained():
+            self._refresh_items()
         self._arrange_viewport()
-        self._refresh_items()
 
         # Disable text selection when opening
         def post_open():
@@ -119,13 +199,24 @@ class Runner(Box):
             return False
 
         # Schedule a selection clear after GTK finishes rendering
-        GLib.idle_add(post_open)
-
-    def close(self, submit_callback: bool = True):
-        self.viewport.children = []
-        self._selected_index = None  # Reset selection
-        if submit_callback:
-            self._submit_callback("")
+        SCHEDULER.submit(post_open, Priority.INPUT)
+
+    def close(self):
+        """Hides the runner without submitting anything, e.g. on Escape"""
+        self._cancel_filtering()
+        self._cancel_arranging()
+        self._stop_streaming()
+        if self._selection_tick:
+            self.remove_tick_callback(self._selection_tick)
+            self._selection_tick = 0
+        if (retained := self._retained_state()) is not None:
+            self._prepare_retained(retained)
+        else:
+            self._clear_viewport()
+            self._matches = []
+            self._shown_query = None
+            self.virtual_list.set_count(0)
+            self._selection.reset(0)
         self.cfg = None
         if self._close_callback:
             self._close_callback()
@@ -135,201 +226,532 @@ class Runner(Box):
         self.input_entry.placeholder = cfg.input_hint  # type: ignore
         self.input_entry.tooltip_text = cfg.input_hint  # type: ignore
         self.input_entry.password = cfg.input_password  # type: ignore
+        self._use_list_widget(self.virtual_list if cfg.virtualized else self.viewport)
+
+    def _use_list_widget(self, widget: Gtk.Widget):
+        """Puts either the plain viewport or the virtual list in the scrolled window"""
+        child = self.scrolled_window.get_child()
+        # Non-scrollable children (the viewport box) get wrapped in a Gtk.Viewport
+        current = child.get_child() if isinstance(child, Gtk.Viewport) else child
+        if current is widget:
+            return
+        if child is not None:
+            if current is not child and current is not None:
+                child.remove(current)
+            self.scrolled_window.remove(child)
+        self.scrolled_window.add(widget)
+        widget.show_all()
 
     def _submit_callback(self, key: int | str):
-        if not self.cfg:
+        if not (cfg := self.cfg):
             return
-        self.cfg.submit_callback(key)
-        self.close(submit_callback=False)
+        if isinstance(key, int) and cfg.history_key:
+            FRECENCY.record(cfg.history_key(key))
+            if (retained := self._retained_state()) is not None:
+                retained.stale_boosts = True
+        # Hidden first, so it never lingers on screen while something starts up.
+        # Callbacks may also show the runner again, e.g. for a follow-up prompt.
+        self.close()
+        with TRACER.span("submit.launch"), LAUNCHER.submitting():
+            cfg.submit_callback(key)
+
+    ### Retained mode
+
+    def _retained_state(self) -> _RetainedState | None:
+        """Retained state of the current config, if it's (still) valid"""
+        if not self.cfg or self.cfg.retain_key is None:
+            return None
+        retained = self._retained.get(self.cfg.retain_key)
+        if retained is None or retained.items is not self.cfg.items:
+            return None
+        return retained
+
+    def _restore_retained(self) -> bool:
+        if (retained := self._retained_state()) is None:
+            return False
+        self._cancel_filtering()
+        self._stop_streaming()
+        self._items_map = retained.items
+        self._item_filter = retained.item_filter
+        return True
+
+    def _prepare_retained(self, retained: _RetainedState):
+        """Gets the list ready for the next open while hidden"""
+        assert self.cfg
+        self._ignore_input = True
+        try:
+            self.input_entry.set_text("")
+        finally:
+            self._ignore_input = False
+        self._selection.reset(self._selection.count)
+        if not retained.stale_boosts:
+            self._arrange_viewport("")
+            return
+
+        # Something got launched, history boosts changed
+        retained.stale_boosts = False
+        item_filter = retained.item_filter
+        boosts = partial(self._boosts_for, self.cfg, retained.items)
+
+        def work(token):
+            item_filter.set_boosts(boosts())
+            # Warms the cache up, so the next open can show the list right away
+            return item_filter.filter("", cancelled=token.cancelled)
+
+        self._filter_worker.submit(work, lambda _: None)
 
     def _refresh_items(self):
         if not self.cfg:
             return
-        self._items_map = self.cfg.items
+        self._cancel_filtering()
+        self._stop_streaming()
+        if self.cfg.search is not None:
+            self._items_map = {}
+            self._item_filter = SearchFilter(self.cfg.search, matcher=self.cfg.matcher)
+            return
+        if isinstance(self.cfg.items, Mapping):
+            self._items_map = self.cfg.items
+        else:
+            self._items_map = {}
+            self._item_stream = ItemStream(self.cfg.items)
+        # Normalized once per config, not on every keystroke
+        self._item_filter = ItemFilter(
+            self._items_map,
+            matcher=self.cfg.matcher,
+            boosts=self._history_boosts(self._items_map),
+            limit=self.cfg.max_results,
+        )
+        if self.cfg.retain_key is not None and self._item_stream is None:
+            self._retained[self.cfg.retain_key] = _RetainedState(
+                self._items_map, self._item_filter
+            )
+        if self._item_stream is not None:
+            self._set_loading(True)
+            self._last_stream_arrange = 0.0
+            self._stream_handler = GLib.timeout_add(
+                STREAM_FRAME_MS, self._handle_stream_tick
+            )
+
+    def _history_boosts(self, items: Mapping[int, str]) -> dict[int, int]:
+        if not self.cfg:
+            return {}
+        return self._boosts_for(self.cfg, items)
+
+    @staticmethod
+    def _boosts_for(cfg: RunnerConfig, items: Mapping[int, str]) -> dict[int, int]:
+        boosts: dict[int, int] = {}
+        if fixed := cfg.item_boosts:
+            boosts = {k: boost for k in items if (boost := fixed.get(k))}
+        if history_key := cfg.history_key:
+            for k in items:
+                if boost := FRECENCY.boost(history_key(k)):
+                    boosts[k] = boosts.get(k, 0) + boost
+        return boosts
+
+    def _handle_stream_tick(self):
+        stream, item_filter = self._item_stream, self._item_filter
+        if stream is None or item_filter is None or not self.cfg:
+            self._stream_handler = 0
+            return False
+
+        assert isinstance(item_filter, ItemFilter)
+        received = False
+        now = time.perf_counter()
+        deadline = now + STREAM_FRAME_BUDGET_MS / 1000
+        while time.perf_counter() < deadline and (chunk := stream.take(256)):
+            assert isinstance(self._items_map, dict)
+            self._items_map.update(chunk)
+            item_filter.add(chunk, self._history_boosts(chunk))
+            received = True
+
+        done = stream.done
+        if done or (
+            received
+            and (now - self._last_stream_arrange) * 1000 >= STREAM_ARRANGE_INTERVAL_MS
+        ):
+            self._last_stream_arrange = now
+            # Same query, the filter only has to match the items that came in
+            self.refilter()
+        if done:
+            self._item_stream = None
+            self._stream_handler = 0
+            self._set_loading(False)
+            return False
+        return True
+
+    def refilter(self):
+        """Filters the current query again, e.g. after a search source got results"""
+        if self.cfg:
+            self._arrange_viewport(self.input_entry.get_text())
+
+    def _stop_streaming(self):
+        if self._stream_handler:
+            GLib.source_remove(self._stream_handler)
+            self._stream_handler = 0
+        if self._item_stream is not None:
+            self._item_stream.stop()
+            self._item_stream = None
+        self._set_loading(False)
+
+    def _set_loading(self, loading: bool):
+        self.loading_label.set_visible(loading)
+        style = self.input_entry.get_style_context()
+        if loading:
+            style.add_class("loading")
+        else:
+            style.remove_class("loading")
 
     def _resize_viewport(self):
         self.scrolled_window.set_min_content_width(
             self.viewport.get_allocation().width  # type: ignore
         )
 
-    def _filter_items(self, query: str) -> dict[int, str]:
-        assert self.cfg
+    def _cancel_filtering(self):
+        if self._debounce_handler:
+            GLib.source_remove(self._debounce_handler)
+            self._debounce_handler = 0
+        self._filter_worker.cancel()
 
-        query = query.casefold()
-        filtered: dict[int, str] = {}
-        if self._items_map is None:
-            self._refresh_items()
-            assert self._items_map is not None
-        for k, val in self._items_map.items():
-            if query in val.casefold():
-                filtered[k] = val
-        return {
-            k: v for k, v in sorted(filtered.items(), key=lambda v: v[1].casefold())
-        }
-
-    def _make_item_slot(self, key: int, item: str, **kwargs) -> Button:
+    def _make_item_slot(
+        self, key: int, item: str, positions: tuple[int, ...] = (), **kwargs
+    ) -> ResultRow:
         assert self.cfg
-        button = Button(
-            name="slot-button",
-            child=Box(
-                name="slot-box",
-                orientation="h",
-                spacing=10,
-                children=[
-                    # Image(
-                    #     name="app-icon",
-                    #     pixbuf=app.get_icon_pixbuf(size=24),
-                    #     h_align="start",
-                    # ),
-                    Label(
-                        name="app-label",
-                        label=item,
-                        ellipsization="end",
-                        v_align="center",
-                        h_align="center",
-                    ),
-                ],
-            ),
-            tooltip_text=item,
-            on_clicked=lambda *_: (
-                self._submit_callback(key),
-                self.close(),
-            ),
-            **kwargs,
+        row = ResultRow(on_clicked=lambda *_: self._submit_callback(key), **kwargs)
+        row.bind(
+            key=key,
+            item=item,
+            positions=positions,
+            show_icon=self.cfg.item_icons is not None,
+        )
+        self._bind_icon(row, key)
+        return row
+
+    def _make_pooled_slot(self) -> ResultRow:
+        return ResultRow(on_clicked=self._handle_pooled_slot_clicked)
+
+    def _bind_pooled_slot(self, row: ResultRow, index: int):
+        assert self._item_filter
+        match = self._matches[index]
+        row.bind(
+            key=match.key,
+            item=self._item_filter.items.texts[match.index],
+            positions=match.positions,
+            selected=index == self._selection.index,
+            show_icon=self.cfg is not None and self.cfg.item_icons is not None,
         )
-        return button
+        self._bind_icon(row, match.key)
 
-    def _add_next_item(self, items_iter: Iterator[tuple[int, str]]):
-        if not (item := next(items_iter, None)):
-            return False
-        k, v = item
-        self.viewport.add(self._make_item_slot(key=k, item=v))
-        return True
+    def _bind_icon(self, row: ResultRow, key: int):
+        if not self.cfg or not self.cfg.item_icons:
+            return
+        if not (icon := self.cfg.item_icons.get(key)):
+            return
 
-    def _scroll_to_selected(self, button):
-        def scroll():
-            adj = self.scrolled_window.get_vadjustment()
-            alloc = button.get_allocation()
-            if alloc.height == 0:
-                return False  # Retry if allocation isn't ready
-
-            y = alloc.y
-            height = alloc.height
-            page_size = adj.get_page_size()
-            current_value = adj.get_value()
-
-            # Calculate visible boundaries
-            visible_top = current_value
-            visible_bottom = current_value + page_size
-
-            if y < visible_top:
-                # Item above viewport - align to top
-                adj.set_value(y)
-            elif y + height > visible_bottom:
-                # Item below viewport - align to bottom
-                new_value = y + height - page_size
-                adj.set_value(new_value)
-            # No action if already fully visible
-            return False
+        def on_loaded(pixbuf):
+            # The row may have been recycled for another item meanwhile
+            if row.key == key:
+                row.set_icon(pixbuf)
 
-        GLib.idle_add(scroll)
+        ICON_SERVICE.request(icon, on_loaded, size=ICON_SIZE)
 
-    def _move_selection(self, delta: int):
-        children = self.viewport.get_children()
-        if not children:
+    def _handle_pooled_slot_clicked(self, row: ResultRow):
+        if row.key is None:
             return
+        self._submit_callback(row.key)
 
-        # starting selection from 0
-        if self._selected_index is None:
-            new_index = 0
+    def _clear_viewport(self):
+        self.viewport.children = []
+        self._rows = []
+        self._highlighted_row = None
+
+    def _add_next_item(self, items_iter: Iterator[Match]):
+        if not (match := next(items_iter, None)):
+            return False
+        assert self._item_filter
+        row = self._make_item_slot(
+            key=match.key,
+            item=self._item_filter.items.texts[match.index],
+            positions=match.positions,
+        )
+        self.viewport.add(row)
+        self._rows.append(row)
+        self._selection.count = len(self._rows)
+        if not self._summon_painted and len(self._rows) == 1:
+            self._mark_after_paint("summon", "first_row_painted")
+        return True
+
+    ### Selection
+
+    def _scroll_row_into_view(self, row: ResultRow):
+        adj = self.scrolled_window.get_vadjustment()
+        alloc = row.get_allocation()
+        if alloc.height <= 1:
+            return  # Not allocated yet
+
+        y = alloc.y
+        height = alloc.height
+        page_size = adj.get_page_size()
+        current_value = adj.get_value()
+
+        # Calculate visible boundaries
+        visible_top = current_value
+        visible_bottom = current_value + page_size
+
+        if y < visible_top:
+            # Item above viewport - align to top
+            adj.set_value(y)
+        elif y + height > visible_bottom:
+            # Item below viewport - align to bottom
+            adj.set_value(y + height - page_size)
+        # No action if already fully visible
+
+    def _page_rows(self) -> int:
+        """How many rows fit in the scrolled window"""
+        if self.cfg and self.cfg.virtualized:
+            row_height = self.virtual_list.row_height
+        elif self._rows:
+            row_height = (
+                self._rows[0].get_allocated_height() + self.viewport.get_spacing()
+            )
         else:
-            new_index = self._selected_index + delta
-        new_index = max(0, min(new_index, len(children) - 1))
-        self._update_selection(new_index)
-
-    def _update_selection(self, new_index: int):
-        # Unselect current:
-        if self._selected_index is not None and self._selected_index < len(
-            self.viewport.get_children()
-        ):
-            current_button = self.viewport.get_children()[self._selected_index]
-            current_button.get_style_context().remove_class("selected")
-        # Select new:
-        if new_index != -1 and new_index < len(self.viewport.get_children()):
-            new_button = self.viewport.get_children()[new_index]
-            new_button.get_style_context().add_class("selected")
-            self._selected_index = new_index
-            self._scroll_to_selected(new_button)
-        else:  # Invalid index!
-            self._selected_index = None
+            return 1
+        page_size = self.scrolled_window.get_vadjustment().get_page_size()
+        return max(1, int(page_size // row_height)) if row_height else 1
+
+    def _handle_selection_moved(self, changed: bool):
+        # Auto-repeated keys come in faster than frames, only the last move of a
+        # frame gets shown
+        if changed and not self._selection_tick:
+            self._selection_tick = self.add_tick_callback(self._handle_selection_tick)
+
+    def _handle_selection_tick(self, *_):
+        self._selection_tick = 0
+        self._show_selection()
+        return False
+
+    def _show_selection(self):
+        index = self._selection.index
+        if self.cfg and self.cfg.virtualized:
+            # Rows are bound by index, no need to look any widget up
+            if index is not None:
+                self.virtual_list.scroll_to(index)
+            self.virtual_list.refresh()
+            return
+
+        if self._highlighted_row is not None:
+            self._highlighted_row.get_style_context().remove_class("selected")
+        row = self._rows[index] if index is not None else None
+        if row is not None:
+            row.get_style_context().add_class("selected")
+            self._scroll_row_into_view(row)
+        self._highlighted_row = row
 
     def _handle_arrange_complete(self, should_resize: bool, query: str):
+        if not self._summon_painted:
+            self._summon_painted = True
+            self._mark_after_paint("summon", "last_row_painted")
         if should_resize:
             self._resize_viewport()
         # Only auto-select first item if query exists
-        if query.strip() != "" and self.viewport.get_children():
-            self._update_selection(0)
+        if query.strip() != "" and self._rows:
+            self._selection.select(0)
+            self._show_selection()
         return False
 
-    def _arrange_viewport(self, query: str = ""):
+    def _arrange_viewport(self, query: str = "", activate: bool = False):
+        """Shows the matches for `query`, then submits the first if `activate`"""
         if not self.cfg:
             return
-        if self._arranger_handler:
-            remove_handler(self._arranger_handler)
-        if self._items_map is None:
+        if self._item_filter is None:
             self._refresh_items()
-            assert self._items_map is not None
+            assert self._item_filter is not None
 
-        self.viewport.children = []
-        self._selected_index = None  # Clear selection when viewport changes
+        item_filter = self._item_filter
+        on_done = partial(
+            self._activate_matches if activate else self._apply_matches, query
+        )
+        if (cached := item_filter.cached(query)) is not None:
+            # Nothing to compute (e.g. backspacing, or reopening), show it now
+            self._filter_worker.cancel()
+            on_done(cached)
+            return
 
-        filtered_items_iter = iter(self._filter_items(query=query).items())
+        # Stale results are dropped by the worker, only the latest query lands
 
-        should_resize = operator.length_hint(filtered_items_iter) == len(
-            self._items_map
-        )
+        def work(token):
+            with TRACER.span("keystroke.filter"):
+                return item_filter.filter(query, cancelled=token.cancelled)
+
+        self._filter_worker.submit(work, on_done)
+
+    def _apply_matches(self, query: str, matches: list[Match]):
+        with TRACER.span("keystroke.arrange"):
+            self._arrange_matches(query, matches)
+        TRACER.flow_mark("keystroke", "arranged")
+
+    def _activate_matches(self, query: str, matches: list[Match]):
+        self._apply_matches(query, matches)
+        self._submit_callback(matches[0].key if matches else query)
+
+    def _arrange_matches(self, query: str, matches: list[Match]):
+        if not self.cfg or not self._item_filter:
+            return
+        self._cancel_arranging()
+
+        # Re-filtering the same query (more items streamed in) keeps the selection
+        refreshed = query == self._shown_query
+        selected_key = None
+        if (
+            refreshed
+            and (selected := self._selection.index) is not None
+            and selected < len(self._matches)
+        ):
+            selected_key = self._matches[selected].key
+
+        self._clear_viewport()
+        self._selection.reset(0)  # Clear selection when viewport changes
+        self._shown_query = query
+
+        if self.cfg.virtualized:
+            unchanged = refreshed and matches is self._matches
+            self._matches = matches
+            if selected_key is not None:
+                self._selection.reset(
+                    len(matches),
+                    next(
+                        (i for i, m in enumerate(matches) if m.key == selected_key),
+                        None,
+                    ),
+                )
+            else:
+                # Only auto-select first item if query exists
+                self._selection.reset(len(matches), 0 if query.strip() else None)
+            if unchanged:
+                # Still showing exactly this (retained while hidden)
+                self.virtual_list.refresh()
+            else:
+                self.virtual_list.set_count(len(matches), keep_offset=refreshed)
+            if not self._summon_painted:
+                # Every visible row gets bound at once
+                self._summon_painted = True
+                self._mark_after_paint("summon", "first_row_painted")
+                self._mark_after_paint("summon", "last_row_painted")
+            return
+        self._matches = matches
+        filtered_items_iter = iter(matches)
 
-        # Lazily add app slots
-        self._arranger_handler = idle_add(
-            lambda items_iter: self._add_next_item(items_iter)
-            or self._handle_arrange_complete(should_resize, query),
-            filtered_items_iter,
-            pin=True,
+        should_resize = len(matches) == len(self._item_filter.items)
+
+        # Lazily add app slots, as many per frame as fit in the frame budget
+        self._arranger_task = SCHEDULER.submit(
+            lambda: (
+                self._add_next_item(filtered_items_iter)
+                or self._handle_arrange_complete(should_resize, query)
+            ),
+            Priority.INPUT,
+            name="runner.arrange",
         )
 
+    def _cancel_arranging(self):
+        if self._arranger_task is not None:
+            self._arranger_task.cancel()
+            self._arranger_task = None
+
+    def _mark_after_paint(self, flow: str, stage: str):
+        """Marks a traced flow's stage once the next frame has been painted"""
+        if not TRACER.enabled:
+            return
+        if (clock := self.get_frame_clock()) is None:
+            TRACER.flow_mark(flow, stage)
+            return
+
+        def on_after_paint(clock):
+            clock.disconnect(handler)
+            TRACER.flow_mark(flow, stage)
+
+        handler = clock.connect("after-paint", on_after_paint)
+
     def _handle_input_update(self, entry: Entry, *_):
         """Handle updates in the runner input"""
+        if self._ignore_input:
+            return
         text: str = entry.get_text()
+        TRACER.flow_start("keystroke")
+
+        if self._debounce_handler:
+            GLib.source_remove(self._debounce_handler)
+            self._debounce_handler = 0
+        if self.cfg and self.cfg.filter_debounce_ms > 0:
+            self._filter_worker.cancel()
+            self._debounce_handler = GLib.timeout_add(
+                self.cfg.filter_debounce_ms, self._handle_debounce_timeout, text
+            )
+            return
+
+        self._arrange_viewport(text)
 
+    def _handle_debounce_timeout(self, text: str):
+        self._debounce_handler = 0
         self._arrange_viewport(text)
+        return False
 
     def _handle_input_activate(self, text):
         """Handle "pressing enter" in the runner input"""
         # Only activate if we have selection or non-empty query
-        if text.strip() == "" and self._selected_index is None:
+        if text.strip() == "" and self._selection.index is None:
             return  # Prevent accidental activation when empty
 
-        children = self.viewport.get_children()
-        if not children:
-            # TODO: process user-supplied input
-            self._submit_callback(text)
-            self.close(submit_callback=False)
+        if text != self._shown_query:
+            # Results for the latest keystrokes haven't landed yet, so don't act
+            # on stale ones; act on this query's once the worker delivers them.
+            # Typing on in the meantime makes them stale, dropping the activation.
+            self._cancel_filtering()
+            self._arrange_viewport(text, activate=True)
+            return
+
+        if self.cfg and self.cfg.virtualized:
+            if not self._matches:
+                self._submit_callback(text)
+                return
+            selected_index = self._selection.index or 0
+            self._submit_callback(self._matches[selected_index].key)
+            return
+
+        if not self._rows:
+            # Rows may still be on their way; with no matches at all, the callback
+            # gets the typed text to handle as it sees fit (see `SubmitCallback`)
+            self._submit_callback(self._matches[0].key if self._matches else text)
+            return
 
         # Open selected index, or the first one
-        selected_index = self._selected_index if self._selected_index is not None else 0
-        if 0 <= selected_index < len(children):
-            children[selected_index].clicked()
-            self.close(submit_callback=False)
+        selected_index = self._selection.index or 0
+        if 0 <= selected_index < len(self._rows):
+            self._rows[selected_index].clicked()
 
     def _handle_input_press(self, widget, event):
         """Handle key presses inside the entry"""
 
         # Normal app mode behavior
+        selection = self._selection
+        ctrl = bool(event.state & Gdk.ModifierType.CONTROL_MASK)
         if event.keyval == Gdk.KEY_Down:
-            self._move_selection(1)
+            self._handle_selection_moved(selection.move(1))
             return True
         elif event.keyval == Gdk.KEY_Up:
-            self._move_selection(-1)
+            self._handle_selection_moved(selection.move(-1))
+            return True
+        elif event.keyval == Gdk.KEY_Page_Down:
+            self._handle_selection_moved(selection.move(self._page_rows()))
+            return True
+        elif event.keyval == Gdk.KEY_Page_Up:
+            self._handle_selection_moved(selection.move(-self._page_rows()))
+            return True
+        # Without Ctrl, Home and End keep moving the text cursor
+        elif event.keyval == Gdk.KEY_Home and ctrl:
+            self._handle_selection_moved(selection.first())
+            return True
+        elif event.keyval == Gdk.KEY_End and ctrl:
+            self._handle_selection_moved(selection.last())
             return True
         elif event.keyval == Gdk.KEY_Escape:
             self.close()
@@ -0,0 +1,35 @@
+class SelectionModel:
+    """Which result is selected, kept as a plain index into the shown results.
+
+    Moving never looks at row widgets, so it costs the same whatever the number
+    of results. Showing the selection is left to the runner, which does it at
+    most once per frame however many moves (e.g. auto-repeated keys) came in.
+    """
+
+    def __init__(self) -> None:
+        self.index: int | None = None
+        self.count = 0
+
+    def reset(self, count: int, index: int | None = None):
+        """New results are shown, optionally selecting one of them"""
+        self.count = count
+        self.index = index if index is not None and 0 <= index < count else None
+
+    def select(self, index: int) -> bool:
+        """Selects `index` (clamped to the results), returns whether it changed"""
+        if not self.count:
+            return False
+        index = max(0, min(index, self.count - 1))
+        changed = index != self.index
+        self.index = index
+        return changed
+
+    def move(self, delta: int) -> bool:
+        # Starts from the first result when nothing is selected yet
+        return self.select(0 if self.index is None else self.index + delta)
+
+    def first(self) -> bool:
+        return self.select(0)
+
+    def last(self) -> bool:
+        return self.select(self.count - 1)
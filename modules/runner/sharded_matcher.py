@@ -0,0 +1,258 @@
+"""Fuzzy matching spread over processes, for sources with millions of items.
+
+Items are copied once into shared memory, one block per shard, and every shard
+belongs to a worker process that prepares its items on first use and keeps them.
+A query then only sends the query string across, every shard returns its best
+`limit` matches, and those get merged here.
+
+Workers are spawned rather than forked (the parent runs GTK) and only use this
+module and `matcher`.
+"""
+
+import heapq
+import multiprocessing
+import os
+import struct
+import threading
+import weakref
+from array import array
+from collections.abc import Iterable
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import accumulate, islice
+from multiprocessing.shared_memory import SharedMemory
+
+from modules.runner.matcher import (
+    CancelCheck,
+    FilterCancelled,
+    FuzzyMatcher,
+    Match,
+    PreparedItems,
+)
+
+# Smaller sources are matched in process, sharding wouldn't pay for itself
+MIN_SHARDED_ITEMS = 200_000
+MIN_SHARD_SIZE = 50_000
+# How long shard results are waited on between checks of `cancelled`, in seconds
+CANCEL_POLL_INTERVAL = 0.005
+
+_COUNT = struct.Struct("<Q")
+
+
+def _pack(texts: list[str]) -> SharedMemory:
+    """Item count, end offset of every item, then all items as UTF-8"""
+    encoded = [text.encode("utf-8", "surrogatepass") for text in texts]
+    ends = array("Q", accumulate(map(len, encoded)))
+    header = _COUNT.pack(len(texts)) + ends.tobytes()
+    blob = b"".join(encoded)
+    memory = SharedMemory(create=True, size=max(len(header) + len(blob), 1))
+    memory.buf[: len(header)] = header
+    memory.buf[len(header) : len(header) + len(blob)] = blob
+    return memory
+
+
+def _unpack(name: str) -> list[str]:
+    memory = SharedMemory(name=name)
+    try:
+        (count,) = _COUNT.unpack_from(memory.buf)
+        blob_start = _COUNT.size + count * 8
+        ends = array("Q")
+        ends.frombytes(memory.buf[_COUNT.size : blob_start])
+        blob = bytes(memory.buf[blob_start : blob_start + (ends[-1] if count else 0)])
+    finally:
+        memory.close()
+    starts = (0, *ends)
+    return [
+        blob[start:end].decode("utf-8", "surrogatepass")
+        for start, end in zip(starts, ends)
+    ]
+
+
+### Worker processes
+
+_worker_generation = None
+_worker_shards: dict[str, PreparedItems] = {}
+
+
+def _init_worker(generation):
+    global _worker_generation
+    _worker_generation = generation
+
+
+def _match_shard(
+    name: str, query: str, limit: int, generation: int, live: frozenset[str]
+) -> list[tuple[int, int, tuple[int, ...]]]:
+    """Best matches inside one shard, as `(index in shard, score, positions)`"""
+    for stale in _worker_shards.keys() - live:
+        del _worker_shards[stale]
+    if (items := _worker_shards.get(name)) is None:
+        items = _worker_shards[name] = PreparedItems(dict(enumerate(_unpack(name))))
+
+    def cancelled() -> bool:
+        return _worker_generation.value != generation  # type: ignore
+
+    try:
+        matches = FuzzyMatcher(limit).match(query, items, cancelled=cancelled)
+    except FilterCancelled:
+        return []
+    return [(m.index, m.score, m.positions) for m in matches]
+
+
+### Parent process
+
+
+@dataclass
+class _Shard:
+    memory: SharedMemory
+    start: int
+    stop: int
+    worker: int
+
+
+def _drop_shards(shards: list[_Shard]):
+    for shard in shards:
+        shard.memory.close()
+        shard.memory.unlink()
+    shards.clear()
+
+
+def _release(executors: list[ProcessPoolExecutor], shards: list[_Shard]):
+    for executor in executors:
+        executor.shutdown(wait=False, cancel_futures=True)
+    executors.clear()
+    _drop_shards(shards)
+
+
+class ShardedMatcher:
+    """`FuzzyMatcher` over a pool of processes, returning only the best `limit`.
+
+    Results are the first `limit` of what `FuzzyMatcher` would return. Since they
+    are cut short, later keystrokes can't narrow them down (`incremental` is off),
+    and boosts only reorder what made the cut. Call `close` when done with it.
+    """
+
+    incremental = False
+
+    def __init__(
+        self,
+        limit: int = 2000,
+        workers: int | None = None,
+        min_items: int = MIN_SHARDED_ITEMS,
+    ) -> None:
+        self.limit = limit
+        self.workers = workers or os.cpu_count() or 1
+        self.min_items = min_items
+        self._local = FuzzyMatcher(limit)
+        self._context = multiprocessing.get_context("spawn")
+        self._generation = self._context.RawValue("Q", 0)
+        self._lock = threading.Lock()
+        self._items: PreparedItems | None = None
+        self._executors: list[ProcessPoolExecutor] = []
+        self._shards: list[_Shard] = []
+        self._finalizer = weakref.finalize(
+            self, _release, self._executors, self._shards
+        )
+
+    def close(self):
+        self._finalizer()
+
+    def match(
+        self,
+        query: str,
+        items: PreparedItems,
+        candidates: Iterable[int] | None = None,
+        cancelled: CancelCheck | None = None,
+        ranked: bool = True,
+    ) -> list[Match]:
+        # Always ranked, it's only the best `limit` anyway
+        if candidates is not None or len(items) < self.min_items:
+            return self._local.match(query, items, candidates, cancelled)
+        if not query.split():
+            keys = items.keys
+            return [
+                Match(index=i, key=keys[i], score=0)
+                for i in islice(items.alphabetical, self.limit)
+            ]
+
+        with self._lock:
+            shards = self._sync_shards(items)
+            # Bumping the generation stops whatever shards are still working on
+            self._generation.value += 1
+            generation = self._generation.value
+            live = frozenset(shard.memory.name for shard in shards)
+            futures: list[Future] = [
+                self._executors[shard.worker].submit(
+                    _match_shard,
+                    shard.memory.name,
+                    query,
+                    self.limit,
+                    generation,
+                    live,
+                )
+                for shard in shards
+            ]
+
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=CANCEL_POLL_INTERVAL)
+            if pending and cancelled is not None and cancelled():
+                with self._lock:
+                    if self._generation.value == generation:
+                        self._generation.value += 1
+                raise FilterCancelled
+        if self._generation.value != generation:
+            # Overtaken by a query from another thread
+            raise FilterCancelled
+
+        keys, folded = items.keys, items.folded
+        runs = [
+            [
+                Match(shard.start + i, keys[shard.start + i], score, positions)
+                for i, score, positions in future.result()
+            ]
+            for shard, future in zip(shards, futures)
+        ]
+        # Same order as `rank`: every run is sorted already, earlier shards win ties
+        merged = heapq.merge(
+            *runs,
+            key=lambda m: (-m.score, len(folded[m.index]), folded[m.index]),
+        )
+        return list(islice(merged, self.limit))
+
+    def _sync_shards(self, items: PreparedItems) -> list[_Shard]:
+        """Shards covering all of `items`, packing the ones added since last time"""
+        if items is not self._items:
+            _drop_shards(self._shards)
+            self._items = items
+
+        if not self._executors:
+            self._executors.extend(
+                ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=self._context,
+                    initializer=_init_worker,
+                    initargs=(self._generation,),
+                )
+                for _ in range(self.workers)
+            )
+
+        start = self._shards[-1].stop if self._shards else 0
+        if start < len(items) and self._shards:
+            last = self._shards[-1]
+            if last.stop - last.start < MIN_SHARD_SIZE:
+                # Items streamed in since, repack the small tail with them
+                _drop_shards([self._shards.pop()])
+                start = last.start
+
+        size = max(MIN_SHARD_SIZE, -(-(len(items) - start) // self.workers))
+        for shard_start in range(start, len(items), size):
+            stop = min(shard_start + size, len(items))
+            self._shards.append(
+                _Shard(
+                    memory=_pack(items.texts[shard_start:stop]),
+                    start=shard_start,
+                    stop=stop,
+                    worker=len(self._shards) % self.workers,
+                )
+            )
+        return list(self._shards)
@@ -2,6 +2,7 @@ from fabric.widgets.wayland import WaylandWindow
 from loguru import logger
 
 from modules.runner.runner import Runner, RunnerConfig
+from shared.instrumentation import TRACER
 
 
 class AppWindow(WaylandWindow):
@@ -20,6 +21,7 @@ class AppWindow(WaylandWindow):
 
         self.runner = Runner(close_callback=self.hide_runner)
         self._is_runner_open = False
+        self._shown_before = False
 
         self.add_keybinding("Escape", self.hide_runner)
         self.add(self.runner)
@@ -30,8 +32,14 @@ class AppWindow(WaylandWindow):
         self._is_runner_open = False
 
     def show_runner(self, cfg: RunnerConfig):
+        TRACER.flow_mark("summon", "show_runner")
         try:
-            self.show_all()
+            if self._shown_before:
+                # Everything inside kept its visibility while hidden
+                self.show()
+            else:
+                self.show_all()
+                self._shown_before = True
             self.set_keyboard_mode("exclusive")
             self.runner.open(cfg=cfg)
             self.runner.input_entry.set_text("")
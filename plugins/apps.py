@@ -1,34 +1,152 @@
-from fabric.utils import DesktopApp, get_desktop_applications
 from loguru import logger
 
+from modules.runner.item_filter import ItemFilter
+from modules.runner.matcher import CancelCheck
 from modules.runner.runner import RunnerConfig
 from modules.window import AppWindow
+from plugins.base import SearchHit
+from shared.app_catalogue import APP_CATALOGUE, AppCatalogue, AppEntry
+from shared.app_index import AppIndex, AppMatcher
+from shared.frecency import FRECENCY
+from shared.launcher import LAUNCHER
+from shared.path_index import PATH_INDEX, PathIndex
+
+# Commands from $PATH are offered too, but always below apps
+COMMAND_BOOST = -10_000
+COMMAND_ICON = "utilities-terminal"
 
 
 class AppsPlugin:
-    def _get_apps(self) -> list[DesktopApp]:
-        return get_desktop_applications()
+    def __init__(
+        self,
+        catalogue: AppCatalogue = APP_CATALOGUE,
+        path_index: PathIndex = PATH_INDEX,
+    ) -> None:
+        self._catalogue = catalogue
+        self._path_index = path_index
+        self._generation = -1
+        self._items_generation = (-1, -1)
+        self._apps: list[AppEntry] = []
+        self._matcher = AppMatcher(AppIndex([]))
+        self._app_names_from_ids: dict[int, str] = {}
+        self._app_icons_from_ids: dict[int, str] = {}
+        self._search_filter: ItemFilter | None = None
+        self._search_apps: list[AppEntry] = []
+        # Runner items: apps first, then commands
+        self._commands: list[str] = []
+        self._executables: dict[str, str] = {}
+        self._items: dict[int, str] = {}
+        self._item_icons: dict[int, str] = {}
+        self._item_boosts: dict[int, int] = {}
+
+    def _get_apps(self) -> list[AppEntry]:
+        # Only rebuilt when the catalogue actually changed
+        if self._generation != self._catalogue.generation:
+            self._apps = self._catalogue.entries
+            self._app_names_from_ids = {
+                i: app.display_name or "Unknown" for i, app in enumerate(self._apps)
+            }
+            self._app_icons_from_ids = {
+                i: app.icon for i, app in enumerate(self._apps) if app.icon
+            }
+            # Names are matched fuzzily, the other fields through the index
+            self._matcher = AppMatcher(AppIndex(self._apps))
+            self._generation = self._catalogue.generation
+        return self._apps
+
+    def _get_items(self) -> dict[int, str]:
+        """App names followed by the names of commands on $PATH"""
+        apps = self._get_apps()
+        # One snapshot per summon, it's a stat per $PATH directory
+        executables = self._path_index.executables()
+        generation = (self._generation, self._path_index.generation)
+        if self._items_generation != generation:
+            self._executables = executables
+            self._commands = sorted(executables)
+            first = len(apps)
+            commands = range(first, first + len(self._commands))
+            self._items = {
+                **self._app_names_from_ids,
+                **dict(zip(commands, self._commands)),
+            }
+            self._item_icons = {
+                **self._app_icons_from_ids,
+                **dict.fromkeys(commands, COMMAND_ICON),
+            }
+            self._item_boosts = dict.fromkeys(commands, COMMAND_BOOST)
+            self._items_generation = generation
+        return self._items
+
+    def prewarm(self) -> None:
+        """Loads the app catalogue and $PATH index ahead of the first summon"""
+        self._get_items()
+
+    ### Global search
+
+    def prepare_search(self) -> None:
+        apps = self._get_apps()
+        self._search_apps = apps
+        self._search_filter = ItemFilter(
+            self._app_names_from_ids,
+            matcher=self._matcher,
+            boosts={
+                i: boost
+                for i, app in enumerate(apps)
+                if (boost := FRECENCY.boost(f"apps:{app.id}"))
+            },
+        )
+
+    def search(self, query: str, limit: int, cancelled: CancelCheck) -> list[SearchHit]:
+        if (item_filter := self._search_filter) is None:
+            return []
+        apps = self._search_apps
+        return [
+            SearchHit(
+                id=apps[match.key].id,
+                text=item_filter.items.texts[match.index],
+                score=match.score,
+                icon=apps[match.key].icon,
+            )
+            for match in item_filter.filter(query, cancelled)[:limit]
+        ]
+
+    def activate(self, hit_id: str) -> None:
+        for app in self._search_apps:
+            if app.id == hit_id:
+                LAUNCHER.launch_app(app)
+                return
+        logger.warning(f"App '{hit_id}' is gone")
 
     def run(self, window: AppWindow, **__) -> None:
-        apps_from_ids = {i: app for i, app in enumerate(self._get_apps())}
-        app_names_from_ids = {
-            i: app.display_name or "Unknown" for i, app in apps_from_ids.items()
-        }
+        items = self._get_items()
+        apps, commands, executables = self._apps, self._commands, self._executables
+
+        def history_key(key: int) -> str:
+            if key < len(apps):
+                return f"apps:{apps[key].id}"
+            return f"commands:{commands[key - len(apps)]}"
 
         def runner_callback(result: int | str):
-            if isinstance(result, int):
-                # result is a key from our map
-                app = apps_from_ids[result]
-                app.launch()
+            if isinstance(result, str):
+                # Nothing matched, run what was typed as a command line
+                if result.strip():
+                    LAUNCHER.run_command(result)
+            elif result < len(apps):
+                LAUNCHER.launch_app(apps[result])
             else:
-                # result is user-provided cmd, run it!
-                # TODO: run cmd
-                logger.warning(f"Attempting to run cmd: {result}")
+                command = commands[result - len(apps)]
+                LAUNCHER.spawn([command], executable=executables[command])
 
         window.show_runner(
             cfg=RunnerConfig(
-                items=app_names_from_ids,
+                items=items,
+                matcher=self._matcher,
+                item_icons=self._item_icons,
+                item_boosts=self._item_boosts,
+                history_key=history_key,
                 submit_callback=runner_callback,
                 input_hint="Search apps...",
+                virtualized=True,
+                retain_key="apps",
             )
         )
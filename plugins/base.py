@@ -1,7 +1,39 @@
+from dataclasses import dataclass
 from typing import Protocol
 
+from modules.runner.matcher import CancelCheck
 from modules.window import AppWindow
 
 
 class BasePlugin(Protocol):
     def run(self, window: AppWindow, **kwargs) -> None: ...
+
+
+@dataclass(slots=True)
+class SearchHit:
+    id: str
+    """Identifies the hit to its provider, handed back to `activate`"""
+    text: str
+    score: float
+    """Provider specific, higher is better. Only compared within one provider."""
+    icon: str | None = None
+
+
+class SearchProvider(Protocol):
+    """Plugins implementing this show up in the global search"""
+
+    def prepare_search(self) -> None:
+        """Called on the GTK thread whenever a global search opens"""
+        ...
+
+    def search(self, query: str, limit: int, cancelled: CancelCheck) -> list[SearchHit]:
+        """Best `limit` hits for `query`, best first.
+
+        Runs on a background thread. Should give up early (returning anything, or
+        raising `FilterCancelled`) once `cancelled()` is True.
+        """
+        ...
+
+    def activate(self, hit_id: str) -> None:
+        """Called on the GTK thread when a hit gets submitted"""
+        ...
@@ -0,0 +1,183 @@
+"""Clipboard history: records what gets copied, and copies it back when picked.
+
+Recording needs `wl-paste` (wl-clipboard). `wl-paste --watch` only signals
+changes, the content is then fetched in the type that suits it best.
+"""
+
+import subprocess
+import threading
+
+from gi.repository import Gio, GLib  # type: ignore
+from loguru import logger
+
+from modules.runner.matcher import CancelCheck, FuzzyMatcher, PreparedItems
+from modules.runner.runner import RunnerConfig
+from modules.window import AppWindow
+from shared.clipboard_history import ClipboardRing
+from shared.paths import user_data_dir
+
+MAX_RESULTS = 500
+# Entries decoded and scored per query, the newest ones that may match
+MAX_CANDIDATES = 5000
+MAX_ENTRY_BYTES = 16 * 1024 * 1024
+FETCH_TIMEOUT = 2
+# Set by password managers on secrets, such entries aren't recorded
+SECRET_HINT = "x-kde-passwordManagerHint"
+
+_TEXT_TYPES = ("text/plain;charset=utf-8", "text/plain", "UTF8_STRING", "TEXT")
+
+
+def _pick_type(types: list[str]) -> str | None:
+    for mime in _TEXT_TYPES:
+        if mime in types:
+            return mime
+    return next((mime for mime in types if mime.startswith("image/")), None)
+
+
+class _Watcher:
+    """Appends clipboard changes to the ring, from a thread of its own"""
+
+    def __init__(self, ring: ClipboardRing) -> None:
+        self._ring = ring
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._watch, name="clipboard-watcher", daemon=True
+            )
+            self._thread.start()
+
+    def _watch(self):
+        try:
+            process = subprocess.Popen(
+                ["wl-paste", "--watch", "echo"],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            logger.warning(f"Not recording the clipboard, wl-paste failed: {e}")
+            return
+        assert process.stdout is not None
+        for _ in process.stdout:
+            try:
+                self._record()
+            except Exception:
+                logger.exception("Could not record clipboard entry")
+        logger.warning(f"wl-paste exited ({process.wait()}), clipboard not recorded")
+
+    def _paste(self, *args: str) -> bytes | None:
+        try:
+            result = subprocess.run(
+                ["wl-paste", "--no-newline", *args],
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                timeout=FETCH_TIMEOUT,
+                check=False,
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if result.returncode != 0:
+            # e.g. the clipboard got emptied, or its owner went away meanwhile
+            error = result.stderr.decode("utf-8", "replace").strip()
+            logger.debug(
+                f"wl-paste {' '.join(args)} failed ({result.returncode}): {error}"
+            )
+            return None
+        return result.stdout
+
+    def _record(self):
+        if (listed := self._paste("--list-types")) is None:
+            return
+        types = listed.decode("utf-8", "replace").splitlines()
+        if SECRET_HINT in types or (mime := _pick_type(types)) is None:
+            return
+        data = self._paste("--type", mime)
+        if data and len(data) <= MAX_ENTRY_BYTES:
+            self._ring.append(data, "text/plain" if mime in _TEXT_TYPES else mime)
+
+
+class ClipboardPlugin:
+    def __init__(self, ring: ClipboardRing | None = None) -> None:
+        self._ring = ring or ClipboardRing(user_data_dir() / "clipboard.ring")
+        self._watcher = _Watcher(self._ring)
+        self._matcher = FuzzyMatcher(MAX_RESULTS)
+
+    def prewarm(self) -> None:
+        """Starts recording, the history is only useful if that happens early"""
+        self._watcher.start()
+
+    def _runner_search(
+        self, query: str, cancelled: CancelCheck
+    ) -> list[tuple[int, str]]:
+        terms = query.casefold().split()
+        if not terms:
+            return [
+                (entry.seq, entry.preview) for entry in self._ring.latest(MAX_RESULTS)
+            ]
+
+        # The ring only narrows down by the longest term, scoring has the last word
+        entries = self._ring.search(max(terms, key=len), MAX_CANDIDATES, cancelled)
+        items = PreparedItems({entry.seq: entry.preview for entry in entries})
+        matches = self._matcher.match(query, items, cancelled=cancelled)
+        return [(match.key, items.texts[match.index]) for match in matches]
+
+    def _copy(self, seq: int):
+        if (content := self._ring.content(seq)) is None:
+            logger.warning(f"Clipboard entry {seq} is gone")
+            return
+        data, mime = content
+        try:
+            process = Gio.Subprocess.new(
+                ["wl-copy", "--type", mime],
+                Gio.SubprocessFlags.STDIN_PIPE
+                | Gio.SubprocessFlags.STDOUT_SILENCE
+                | Gio.SubprocessFlags.STDERR_SILENCE,
+            )
+        except GLib.Error as e:
+            logger.error(f"Could not copy clipboard entry {seq}: {e.message}")
+            return
+        # Written from the main loop, a big entry doesn't block the UI
+        cancellable = Gio.Cancellable()
+        timeout = GLib.timeout_add_seconds(FETCH_TIMEOUT, cancellable.cancel)
+        process.communicate_async(
+            GLib.Bytes.new(data),
+            cancellable,
+            self._handle_copied,
+            (seq, data, mime, cancellable, timeout),
+        )
+
+    def _handle_copied(self, process: Gio.Subprocess, result, entry):
+        seq, data, mime, cancellable, timeout = entry
+        if not cancellable.is_cancelled():
+            GLib.source_remove(timeout)
+        try:
+            process.communicate_finish(result)
+        except GLib.Error as e:
+            process.force_exit()
+            logger.error(f"Could not copy clipboard entry {seq}: {e.message}")
+            return
+        if not process.get_successful():
+            logger.error(f"Could not copy clipboard entry {seq}: wl-copy failed")
+            return
+        # Moves it to the top; the watcher then sees the same data and skips it
+        self._ring.remove(seq)
+        self._ring.append(data, mime)
+
+    def run(self, window: AppWindow, **__) -> None:
+        self._watcher.start()
+
+        def runner_callback(result: int | str):
+            if isinstance(result, int):
+                self._copy(result)
+
+        window.show_runner(
+            cfg=RunnerConfig(
+                items={},
+                search=self._runner_search,
+                submit_callback=runner_callback,
+                input_hint="Search clipboard...",
+                virtualized=True,
+            )
+        )
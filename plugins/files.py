@@ -0,0 +1,89 @@
+import os
+
+from gi.repository import Gio  # type: ignore
+
+from modules.runner.matcher import CancelCheck
+from modules.runner.runner import RunnerConfig
+from modules.window import AppWindow
+from plugins.base import SearchHit
+from shared.file_index import FileIndex, FileIndexConfig
+from shared.launcher import LAUNCHER
+
+MAX_RESULTS = 50
+
+
+def _icon_for(path: str) -> str:
+    return "folder" if path.endswith("/") else "text-x-generic"
+
+
+class FilesPlugin:
+    # Searching goes through a trigram index, yet the global search shouldn't wait
+    # on cold page cache for long
+    search_budget_ms = 50
+
+    def __init__(self, index: FileIndex | None = None) -> None:
+        self._index = index or FileIndex(FileIndexConfig.load())
+        self._home = os.path.expanduser("~")
+        # Runner keys of the paths shown during the current run
+        self._keys: dict[str, int] = {}
+        self._paths: list[str] = []
+        self._icons: dict[int, str] = {}
+
+    def _display(self, path: str) -> str:
+        if path.startswith(self._home):
+            return "~" + path[len(self._home) :]
+        return path
+
+    def _open(self, path: str):
+        LAUNCHER.open_uri(Gio.File.new_for_path(path.rstrip("/")).get_uri())
+
+    def _runner_search(
+        self, query: str, cancelled: CancelCheck
+    ) -> list[tuple[int, str]]:
+        results: list[tuple[int, str]] = []
+        for _, path in self._index.search(query, MAX_RESULTS, cancelled):
+            if (key := self._keys.get(path)) is None:
+                key = self._keys[path] = len(self._paths)
+                self._paths.append(path)
+                self._icons[key] = _icon_for(path)
+            results.append((key, self._display(path)))
+        return results
+
+    ### Global search
+
+    def prepare_search(self) -> None:
+        self._index.load()
+
+    def search(self, query: str, limit: int, cancelled: CancelCheck) -> list[SearchHit]:
+        return [
+            SearchHit(
+                id=path, text=self._display(path), score=score, icon=_icon_for(path)
+            )
+            for score, path in self._index.search(query, limit, cancelled)
+        ]
+
+    def activate(self, hit_id: str) -> None:
+        self._open(hit_id)
+
+    def run(self, window: AppWindow, **__) -> None:
+        self._index.load()
+        self._keys, self._paths, self._icons = {}, [], {}
+        paths = self._paths
+
+        def runner_callback(result: int | str):
+            if isinstance(result, int):
+                self._open(paths[result])
+            elif result.strip():
+                self._open(os.path.expanduser(result.strip()))
+
+        window.show_runner(
+            cfg=RunnerConfig(
+                items={},
+                search=self._runner_search,
+                item_icons=self._icons,
+                history_key=lambda i: f"files:{paths[i]}",
+                submit_callback=runner_callback,
+                input_hint="Search files...",
+                virtualized=True,
+            )
+        )
@@ -1,15 +1,19 @@
 # Warning: this code is trash, I'll rewrite this some time
-import json
-import webbrowser
-import os
-from enum import Enum
 from collections.abc import Callable
+from enum import Enum
 from functools import partial
 from typing import Any
+
 from loguru import logger
+
+from modules.runner.item_filter import ItemFilter
+from modules.runner.matcher import CancelCheck, FuzzyMatcher
 from modules.runner.runner import RunnerConfig
 from modules.window import AppWindow
-from pathlib import Path
+from plugins.base import SearchHit
+from shared.frecency import FRECENCY
+from shared.launcher import LAUNCHER
+from shared.link_store import LinkStore, default_link_store
 
 
 class QuickLinksMode(Enum):
@@ -21,78 +25,47 @@ class QuickLinksMode(Enum):
 
 
 class QuickLinksPlugin:
-    # Constant for JSON file path - can be changed later
-    LINKS_FILE = Path("quicklinks.json")
-
-    def _load_links(self) -> dict[str, str]:
-        """Load links from JSON file"""
-        if not os.path.exists(self.LINKS_FILE):
-            logger.error("quicklinks.json file not found!")
-            return {}
-
-        try:
-            with self.LINKS_FILE.open("r", encoding="utf-8") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            logger.warning(
-                f"Could not load links from {self.LINKS_FILE}, starting with empty links"
-            )
-            return {}
-
-    def _save_links(self, links: dict[str, str]) -> None:
-        """Save links to JSON file"""
-        try:
-            with self.LINKS_FILE.open("w", encoding="utf-8") as f:
-                json.dump(links, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            logger.error(f"Failed to save links to {self.LINKS_FILE}: {e}")
+    def __init__(self, store: LinkStore | None = None) -> None:
+        self.store = store or default_link_store()
+        self._search_filter: ItemFilter | None = None
 
     def _add_link(self, name: str, link: str, overwrite: bool = False) -> None:
         """Add a new link or update existing one"""
-        links = self._load_links()
+        exists = self.store.get(name) is not None
 
-        if name in links and not overwrite:
+        if exists and not overwrite:
             logger.warning(
                 f"Link '{name}' already exists. Use overwrite=True to update."
             )
             return
 
-        links[name] = link
-        self._save_links(links)
+        self.store.set(name, link)
 
-        action = "Updated" if name in links else "Added"
+        action = "Updated" if exists else "Added"
         logger.info(f"{action} link '{name}': {link}")
 
     def _open_link(self, name: str) -> None:
         """Open a link by name in the default browser"""
-        links = self._load_links()
+        url = self.store.get(name)
 
-        if name not in links:
+        if url is None:
             logger.error(f"Link '{name}' not found")
             return
 
-        url = links[name]
-        try:
-            webbrowser.open(url)
-            logger.info(f"Opened link '{name}': {url}")
-        except Exception as e:
-            logger.error(f"Failed to open link '{name}': {e}")
+        LAUNCHER.open_uri(url)
+        logger.info(f"Opening link '{name}': {url}")
 
     def _remove_link(self, name: str) -> None:
         """Remove a link by name"""
-        links = self._load_links()
-
-        if name not in links:
+        if not self.store.remove(name):
             logger.warning(f"Link '{name}' not found")
             return
 
-        del links[name]
-        self._save_links(links)
         logger.info(f"Removed link '{name}'")
 
     def _get_links(self) -> dict[str, str]:
         """Get all links as a dict mapping names to URLs"""
-        return self._load_links()
+        return self.store.list()
 
     def _input_prompt(
         self, window: AppWindow, callback: Callable[[str], Any], hint: str = ""
@@ -154,6 +127,7 @@ class QuickLinksPlugin:
                 items=idx_to_names,
                 submit_callback=open_link_callback,
                 input_hint="Search apps...",
+                history_key=lambda i: f"quick_links:{idx_to_names[i]}",
             )
         )
 
@@ -216,6 +190,37 @@ class QuickLinksPlugin:
         #     callback=lambda idx: self.run(window=window, mode=choices[idx]),
         # )
 
+    ### Global search
+
+    def prepare_search(self) -> None:
+        names = dict(enumerate(self._get_links()))
+        self._search_filter = ItemFilter(
+            names,
+            matcher=FuzzyMatcher(),
+            boosts={
+                i: boost
+                for i, name in names.items()
+                if (boost := FRECENCY.boost(f"quick_links:{name}"))
+            },
+        )
+
+    def search(self, query: str, limit: int, cancelled: CancelCheck) -> list[SearchHit]:
+        if (item_filter := self._search_filter) is None:
+            return []
+        texts = item_filter.items.texts
+        return [
+            SearchHit(
+                id=texts[match.index],
+                text=texts[match.index],
+                score=match.score,
+                icon="web-browser",
+            )
+            for match in item_filter.filter(query, cancelled)[:limit]
+        ]
+
+    def activate(self, hit_id: str) -> None:
+        self._open_link(name=hit_id)
+
     def run(
         self, window: AppWindow, *, mode: QuickLinksMode | str | None = None, **__
     ) -> None:
@@ -1,9 +1,61 @@
-from plugins.apps import AppsPlugin
-from plugins.base import BasePlugin
-from plugins.quick_links import QuickLinksPlugin
+"""Plugins are registered by import path and only imported on first use."""
+
+import importlib
+from collections.abc import Iterable
 
+from loguru import logger
+
+from plugins.base import BasePlugin
+from shared.scheduler import SCHEDULER, Priority
+from shared.startup import STARTUP
 
-PLUGINS_REGISTRY: dict[str, BasePlugin] = {
-    "apps": AppsPlugin(),
-    "quick_links": QuickLinksPlugin(),
+PLUGINS_REGISTRY: dict[str, str] = {
+    "apps": "plugins.apps:AppsPlugin",
+    "clipboard": "plugins.clipboard:ClipboardPlugin",
+    "files": "plugins.files:FilesPlugin",
+    "quick_links": "plugins.quick_links:QuickLinksPlugin",
+    "search": "plugins.search:GlobalSearchPlugin",
 }
+"""Plugin names to `module:ClassName` factories"""
+
+_loaded_plugins: dict[str, BasePlugin] = {}
+
+
+def get_plugin(plugin_name: str) -> BasePlugin | None:
+    """Returns the plugin instance, importing and creating it if needed"""
+    if (plugin := _loaded_plugins.get(plugin_name)) is not None:
+        return plugin
+    if (spec := PLUGINS_REGISTRY.get(plugin_name)) is None:
+        return None
+
+    module_name, _, class_name = spec.partition(":")
+    with STARTUP.measure_import(module_name):
+        try:
+            module = importlib.import_module(module_name)
+            plugin = getattr(module, class_name)()
+        except Exception:
+            logger.exception(f"Could not load plugin '{plugin_name}'")
+            return None
+    _loaded_plugins[plugin_name] = plugin
+    return plugin
+
+
+def prewarm_plugins(plugin_names: Iterable[str]):
+    """Loads plugins in the background, leaving frames to the UI.
+
+    Plugins may implement `prewarm()` to prepare expensive state (e.g. caches)
+    ahead of their first `run`.
+    """
+    pending = iter(plugin_names)
+
+    def load_next():
+        if (plugin_name := next(pending, None)) is None:
+            STARTUP.mark("plugins prewarmed")
+            return False
+        if (plugin := get_plugin(plugin_name)) is not None and (
+            prewarm := getattr(plugin, "prewarm", None)
+        ):
+            prewarm()
+        return True
+
+    SCHEDULER.submit(load_next, Priority.BACKGROUND, name="plugins.prewarm")
@@ -0,0 +1,157 @@
+"""Global search: queries every plugin implementing `SearchProvider` at once."""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+
+from gi.repository import GLib  # type: ignore
+from loguru import logger
+
+from modules.runner.matcher import CancelCheck, FilterCancelled
+from modules.runner.runner import RunnerConfig
+from modules.window import AppWindow
+from plugins.base import SearchHit, SearchProvider
+from plugins.registry import PLUGINS_REGISTRY, get_plugin
+from shared.search_ranking import merge_hits
+
+# How long a keystroke waits for a provider before showing results without it.
+# Providers can set their own `search_budget_ms`.
+DEFAULT_BUDGET_MS = 30
+MAX_RESULTS = 50
+
+
+class _Source:
+    """A provider with an executor of its own, a slow one only holds itself up"""
+
+    def __init__(self, name: str, provider: SearchProvider) -> None:
+        self.name = name
+        self.provider = provider
+        self.budget = getattr(provider, "search_budget_ms", DEFAULT_BUDGET_MS) / 1000
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"search-{name}"
+        )
+        # Results for the latest query searched, also filled by searches that
+        # finished after their budget ran out
+        self.last: tuple[str, list[SearchHit]] | None = None
+        self.lock = threading.Lock()
+
+    def search(self, query: str, cancelled: CancelCheck) -> list[SearchHit]:
+        if cancelled():
+            raise FilterCancelled
+        hits = self.provider.search(query, MAX_RESULTS, cancelled)
+        with self.lock:
+            self.last = (query, hits)
+        return hits
+
+    def cached(self, query: str) -> list[SearchHit] | None:
+        with self.lock:
+            if self.last is not None and self.last[0] == query:
+                return self.last[1]
+            return None
+
+
+class GlobalSearchPlugin:
+    def __init__(self) -> None:
+        self._sources: dict[str, _Source] = {}
+        self._window: AppWindow | None = None
+        self._cfg: RunnerConfig | None = None
+        # Result identities get runner keys that stay the same for a whole search
+        self._keys: dict[tuple[str, str], int] = {}
+        self._hits: list[tuple[str, str]] = []
+        self._icons: dict[int, str] = {}
+
+    def _load_sources(self):
+        for name in PLUGINS_REGISTRY:
+            if name in self._sources:
+                continue
+            plugin = get_plugin(name)
+            if plugin is self or not callable(getattr(plugin, "search", None)):
+                continue
+            self._sources[name] = _Source(name, plugin)  # type: ignore
+
+    def _key_for(self, source: str, hit: SearchHit) -> int:
+        identity = (source, hit.id)
+        if (key := self._keys.get(identity)) is None:
+            key = self._keys[identity] = len(self._hits)
+            self._hits.append(identity)
+            if hit.icon:
+                self._icons[key] = hit.icon
+        return key
+
+    def _search(self, query: str, cancelled: CancelCheck) -> list[tuple[int, str]]:
+        """Search hook for the runner, called on its filter worker"""
+        if not query.strip():
+            return []
+        start = time.perf_counter()
+        pending: list[tuple[_Source, Future]] = []
+        results: dict[str, list[SearchHit]] = {}
+        for source in self._sources.values():
+            if (hits := source.cached(query)) is not None:
+                results[source.name] = hits
+            else:
+                future = source.executor.submit(source.search, query, cancelled)
+                pending.append((source, future))
+
+        for source, future in sorted(pending, key=lambda p: p[0].budget):
+            timeout = max(0.0, start + source.budget - time.perf_counter())
+            try:
+                results[source.name] = future.result(timeout=timeout)
+            except TimeoutError:
+                # Shown once it's done, a slow source never holds the others up
+                future.add_done_callback(
+                    lambda f: self._handle_late_results(f, query, cancelled)
+                )
+                continue
+            except FilterCancelled:
+                raise
+            except Exception:
+                logger.exception(f"Search provider '{source.name}' failed")
+        if cancelled():
+            raise FilterCancelled
+
+        return [
+            (self._key_for(name, hit), hit.text)
+            for name, hit in islice(merge_hits(results), MAX_RESULTS)
+        ]
+
+    def _handle_late_results(self, future: Future, query: str, cancelled: CancelCheck):
+        # Results are cached by their source, so refiltering picks them up
+        if future.cancelled() or future.exception() is not None or cancelled():
+            return
+        GLib.idle_add(self._refilter, query)
+
+    def _refilter(self, query: str):
+        window = self._window
+        if (
+            window is not None
+            and self._cfg is not None
+            and window.runner.cfg is self._cfg
+            and window.runner.input_entry.get_text() == query
+        ):
+            window.runner.refilter()
+        return False
+
+    def _handle_submit(self, result: int | str):
+        if isinstance(result, str):
+            return
+        name, hit_id = self._hits[result]
+        self._sources[name].provider.activate(hit_id)
+
+    def run(self, window: AppWindow, **__) -> None:
+        self._load_sources()
+        for source in self._sources.values():
+            source.provider.prepare_search()
+            source.last = None
+        self._window = window
+        self._keys, self._hits, self._icons = {}, [], {}
+        self._cfg = RunnerConfig(
+            items={},
+            search=self._search,
+            item_icons=self._icons,
+            history_key=lambda key: ":".join(self._hits[key]),
+            submit_callback=self._handle_submit,
+            input_hint="Search everything...",
+            virtualized=True,
+        )
+        window.show_runner(cfg=self._cfg)
@@ -0,0 +1,284 @@
+"""In-memory catalogue of installed desktop applications.
+
+Desktop files are parsed once. A snapshot of the parsed entries is kept on disk,
+keyed by the mtimes of the application directories, so that later cold starts
+don't parse anything at all; while running, the catalogue is updated file by file
+from `Gio.FileMonitor` events instead of rescanning.
+"""
+
+import json
+import os
+from collections.abc import Iterator
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+
+from fabric.utils import DesktopApp
+from gi.repository import Gio, GLib  # type: ignore
+from loguru import logger
+
+from shared.paths import atomic_write, data_dirs, user_cache_dir
+
+SNAPSHOT_VERSION = 1
+# Package managers touch lots of desktop files at once, wait for them to settle
+UPDATE_DELAY_MS = 250
+
+_MONITORED_EVENTS = {
+    Gio.FileMonitorEvent.CREATED,
+    Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+    Gio.FileMonitorEvent.DELETED,
+    Gio.FileMonitorEvent.MOVED_IN,
+    Gio.FileMonitorEvent.MOVED_OUT,
+    Gio.FileMonitorEvent.RENAMED,
+}
+
+
+@dataclass(slots=True)
+class AppEntry:
+    id: str
+    """Desktop file ID, e.g. `org.mozilla.firefox.desktop`"""
+    path: str
+    name: str
+    display_name: str
+    generic_name: str = ""
+    comment: str = ""
+    keywords: list[str] = field(default_factory=list)
+    categories: list[str] = field(default_factory=list)
+    executable: str = ""
+    command_line: str = ""
+    icon: str = ""
+    """Icon name from the theme, or an absolute path"""
+    window_class: str = ""
+
+    _app: DesktopApp | None = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_app_info(cls, id: str, path: str, info: Gio.DesktopAppInfo) -> "AppEntry":
+        icon = info.get_icon()
+        return cls(
+            id=id,
+            path=path,
+            name=info.get_name() or "",
+            display_name=info.get_display_name() or info.get_name() or "",
+            generic_name=info.get_generic_name() or "",
+            comment=info.get_description() or "",
+            keywords=list(info.get_keywords() or []),
+            categories=[c for c in (info.get_categories() or "").split(";") if c],
+            executable=info.get_executable() or "",
+            command_line=info.get_commandline() or "",
+            icon=icon.to_string() if icon else "",
+            window_class=info.get_startup_wm_class() or "",
+        )
+
+    def desktop_app(self) -> DesktopApp:
+        """The fabric `DesktopApp` for this entry, only parsed when first needed"""
+        if self._app is None:
+            self._app = DesktopApp(Gio.DesktopAppInfo.new_from_filename(self.path))
+        return self._app
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in _ENTRY_FIELDS}
+
+
+_ENTRY_FIELDS = {f.name for f in fields(AppEntry)} - {"_app"}
+
+
+class AppCatalogue:
+    def __init__(self, snapshot_file: Path | None = None) -> None:
+        self.snapshot_file = snapshot_file or user_cache_dir() / "apps.json"
+        self.generation = 0
+        """Bumped every time the catalogue changes"""
+
+        self._roots = [d / "applications" for d in data_dirs()]
+        self._entries: dict[str, AppEntry] = {}
+        self._sorted_entries: list[AppEntry] | None = None
+        self._monitors: dict[str, Gio.FileMonitor] = {}
+        self._dirty: set[str] = set()  # desktop file paths relative to a root
+        self._update_handler = 0
+        self._loaded = False
+
+    @property
+    def entries(self) -> list[AppEntry]:
+        """Visible applications, sorted by ID"""
+        self.load()
+        if self._sorted_entries is None:
+            self._sorted_entries = [self._entries[k] for k in sorted(self._entries)]
+        return self._sorted_entries
+
+    def load(self):
+        """Loads the catalogue once, from the snapshot if it's still fresh"""
+        if self._loaded:
+            return
+        self._loaded = True
+
+        dir_mtimes = self._dir_mtimes()
+        if not self._load_snapshot(dir_mtimes):
+            logger.info("App catalogue snapshot is stale, parsing desktop files")
+            self._entries = self._scan()
+            self._save_snapshot(dir_mtimes)
+        self.generation += 1
+        self._watch(dir_mtimes)
+
+    ### Scanning
+
+    def _walk(self, top: Path | None = None) -> Iterator[tuple[str, str]]:
+        """Desktop files as (path relative to their root, absolute path).
+
+        Walks every root, or only `top` (which must be inside one of them).
+        """
+        for root in self._roots:
+            if top is not None and not top.is_relative_to(root):
+                continue
+            for dirpath, _, filenames in os.walk(top or root):
+                for filename in filenames:
+                    if filename.endswith(".desktop"):
+                        path = os.path.join(dirpath, filename)
+                        yield os.path.relpath(path, root), path
+
+    def _scan(self) -> dict[str, AppEntry]:
+        entries: dict[str, AppEntry] = {}
+        seen: set[str] = set()
+        for rel, path in self._walk():
+            desktop_id = rel.replace(os.sep, "-")
+            # Earlier roots shadow later ones, even when hiding the app
+            if desktop_id in seen:
+                continue
+            seen.add(desktop_id)
+            if entry := self._parse(desktop_id, path):
+                entries[desktop_id] = entry
+        return entries
+
+    def _parse(self, desktop_id: str, path: str) -> AppEntry | None:
+        try:
+            info = Gio.DesktopAppInfo.new_from_filename(path)
+        except Exception:
+            logger.exception(f"Could not parse desktop file {path}")
+            return None
+        if info is None or not info.should_show():
+            return None
+        return AppEntry.from_app_info(desktop_id, path, info)
+
+    def _resolve(self, rel: str) -> AppEntry | None:
+        """Re-reads whichever root currently provides the desktop file `rel`"""
+        desktop_id = rel.replace(os.sep, "-")
+        for root in self._roots:
+            path = root / rel
+            if path.exists():
+                return self._parse(desktop_id, str(path))
+        return None
+
+    def _dir_mtimes(self) -> dict[str, int]:
+        mtimes: dict[str, int] = {}
+        for root in self._roots:
+            for dirpath, _, _ in os.walk(root):
+                try:
+                    mtimes[dirpath] = os.stat(dirpath).st_mtime_ns
+                except OSError:
+                    continue
+        return mtimes
+
+    ### Snapshot
+
+    def _load_snapshot(self, dir_mtimes: dict[str, int]) -> bool:
+        try:
+            snapshot = json.loads(self.snapshot_file.read_bytes())
+        except (OSError, ValueError):
+            return False
+        if (
+            snapshot.get("version") != SNAPSHOT_VERSION
+            or snapshot.get("dirs") != dir_mtimes
+        ):
+            return False
+        try:
+            self._entries = {
+                data["id"]: AppEntry(
+                    **{k: v for k, v in data.items() if k in _ENTRY_FIELDS}
+                )
+                for data in snapshot["entries"]
+            }
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def _save_snapshot(self, dir_mtimes: dict[str, int]):
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "dirs": dir_mtimes,
+            "entries": [entry.to_dict() for entry in self._entries.values()],
+        }
+        try:
+            atomic_write(self.snapshot_file, json.dumps(snapshot).encode())
+        except OSError:
+            logger.exception("Could not save app catalogue snapshot")
+
+    ### Monitoring
+
+    def _watch(self, dir_mtimes: dict[str, int]):
+        for dirpath in dir_mtimes:
+            self._watch_dir(dirpath)
+
+    def _watch_dir(self, dirpath: str):
+        if dirpath in self._monitors:
+            return
+        try:
+            monitor = Gio.File.new_for_path(dirpath).monitor_directory(
+                Gio.FileMonitorFlags.WATCH_MOVES, None
+            )
+        except GLib.Error:
+            logger.warning(f"Could not monitor {dirpath} for app changes")
+            return
+        monitor.connect("changed", self._handle_monitor_event)
+        self._monitors[dirpath] = monitor
+
+    def _root_of(self, path: str) -> Path | None:
+        for root in self._roots:
+            if path.startswith(f"{root}{os.sep}"):
+                return root
+        return None
+
+    def _handle_monitor_event(self, _, file: Gio.File, other: Gio.File | None, event):
+        if event not in _MONITORED_EVENTS:
+            return
+        for changed in (file, other):
+            if changed is None or not (path := changed.get_path()):
+                continue
+            if os.path.isdir(path):
+                # New subdirectory (e.g. applications/wine/), watch it too
+                self._watch_dir(path)
+                self._dirty.update(rel for rel, _ in self._walk(Path(path)))
+            elif path.endswith(".desktop") and (root := self._root_of(path)):
+                self._dirty.add(os.path.relpath(path, root))
+            elif not os.path.exists(path):
+                # Removed subdirectory, taking every desktop file inside with it
+                self._forget_dir(path)
+        if self._dirty and not self._update_handler:
+            self._update_handler = GLib.timeout_add(
+                UPDATE_DELAY_MS, self._apply_updates
+            )
+
+    def _forget_dir(self, dirpath: str):
+        prefix = f"{dirpath}{os.sep}"
+        for entry in self._entries.values():
+            if entry.path.startswith(prefix) and (root := self._root_of(entry.path)):
+                self._dirty.add(os.path.relpath(entry.path, root))
+        gone = [d for d in self._monitors if d == dirpath or d.startswith(prefix)]
+        for watched in gone:
+            self._monitors.pop(watched).cancel()
+
+    def _apply_updates(self):
+        self._update_handler = 0
+        dirty, self._dirty = self._dirty, set()
+        for rel in dirty:
+            desktop_id = rel.replace(os.sep, "-")
+            if entry := self._resolve(rel):
+                self._entries[desktop_id] = entry
+            else:
+                self._entries.pop(desktop_id, None)
+
+        self.generation += 1
+        self._sorted_entries = None
+        self._save_snapshot(self._dir_mtimes())
+        return False
+
+
+APP_CATALOGUE = AppCatalogue()
+"""Shared catalogue instance, loaded on first use"""
@@ -0,0 +1,146 @@
+"""Inverted index over the searchable fields of desktop entries.
+
+Every field is split into lowercased word tokens, and every token maps to the apps
+having it along with the weight of the best field it's in. A query term matches
+the tokens it's a prefix of (a range of the sorted tokens), and every term of a
+query must match, so multi-word queries intersect the terms' postings instead of
+scanning every string.
+"""
+
+import os
+import re
+from bisect import bisect_left
+from collections.abc import Iterable, Sequence
+
+from modules.runner.matcher import (
+    SCORE_MATCH,
+    CancelCheck,
+    FuzzyMatcher,
+    Match,
+    PreparedItems,
+    rank,
+)
+from shared.app_catalogue import AppEntry
+
+# Score a query term adds when it's a whole token of a field, halved for prefixes.
+# In the units of the fuzzy matcher's scores, which they're added to.
+FIELD_WEIGHTS = {
+    "name": 4 * SCORE_MATCH,
+    "generic_name": 3 * SCORE_MATCH,
+    "keywords": 3 * SCORE_MATCH,
+    "executable": 3 * SCORE_MATCH,
+    "categories": 2 * SCORE_MATCH,
+    "comment": SCORE_MATCH,
+}
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.casefold())
+
+
+def _field_texts(app: AppEntry) -> Iterable[tuple[str, str]]:
+    yield "name", app.display_name
+    if app.name != app.display_name:
+        yield "name", app.name
+    yield "generic_name", app.generic_name
+    for keyword in app.keywords:
+        yield "keywords", keyword
+    yield "executable", os.path.basename(app.executable)
+    for category in app.categories:
+        yield "categories", category
+    yield "comment", app.comment
+
+
+class AppIndex:
+    def __init__(self, apps: Sequence[AppEntry]) -> None:
+        postings: dict[str, dict[int, int]] = {}
+        for i, app in enumerate(apps):
+            for field_name, text in _field_texts(app):
+                weight = FIELD_WEIGHTS[field_name]
+                for token in tokenize(text):
+                    posting = postings.setdefault(token, {})
+                    if posting.get(i, 0) < weight:
+                        posting[i] = weight
+        self.tokens = sorted(postings)
+        self._postings = [postings[token] for token in self.tokens]
+
+    def term_hits(self, term: str) -> dict[int, int]:
+        """Apps having a token `term` is a prefix of, with the best weight"""
+        hits: dict[int, int] = {}
+        tokens = self.tokens
+        for n in range(bisect_left(tokens, term), len(tokens)):
+            token = tokens[n]
+            if not token.startswith(term):
+                break
+            exact = len(token) == len(term)
+            for app, weight in self._postings[n].items():
+                if not exact:
+                    weight //= 2
+                if hits.get(app, 0) < weight:
+                    hits[app] = weight
+        return hits
+
+    def search(self, query: str) -> dict[int, int]:
+        """Apps matching every term of `query`, with their summed weights"""
+        terms = tokenize(query)
+        if not terms:
+            return {}
+        per_term = sorted((self.term_hits(term) for term in terms), key=len)
+        # Smallest postings first, the intersection only ever shrinks
+        scores = dict(per_term[0])
+        for hits in per_term[1:]:
+            scores = {app: s + hits[app] for app, s in scores.items() if app in hits}
+            if not scores:
+                break
+        return scores
+
+
+class AppMatcher:
+    """Fuzzy matching on app names, plus whatever the index finds in other fields.
+
+    Item keys below the number of indexed apps are taken to be positions in the
+    app list the index was built from; any other items are matched on name only.
+    Index weights are added to the fuzzy scores, so hits in more important fields
+    rank higher.
+    """
+
+    incremental = True
+
+    def __init__(self, index: AppIndex) -> None:
+        self.index = index
+        self._fuzzy = FuzzyMatcher()
+        self._positions: tuple[PreparedItems, int, dict[int, int]] | None = None
+
+    def match(
+        self,
+        query: str,
+        items: PreparedItems,
+        candidates: Iterable[int] | None = None,
+        cancelled: CancelCheck | None = None,
+        ranked: bool = True,
+    ) -> list[Match]:
+        if candidates is not None:
+            candidates = set(candidates)
+        matches = self._fuzzy.match(query, items, candidates, cancelled, ranked)
+        if not (scores := self.index.search(query)):
+            return matches
+
+        for match in matches:
+            match.score += scores.pop(match.key, 0)
+        # Apps found through their other fields only
+        positions = self._item_positions(items)
+        for key, score in scores.items():
+            i = positions.get(key)
+            if i is not None and (candidates is None or i in candidates):
+                matches.append(Match(index=i, key=key, score=score))
+        return rank(matches, items) if ranked else matches
+
+    def _item_positions(self, items: PreparedItems) -> dict[int, int]:
+        """Item index by key, kept until the items change"""
+        cached = self._positions
+        if cached is None or cached[0] is not items or cached[1] != len(items):
+            positions = {key: i for i, key in enumerate(items.keys)}
+            cached = self._positions = (items, len(items), positions)
+        return cached[2]
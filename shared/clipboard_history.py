@@ -0,0 +1,303 @@
+"""Clipboard history in a fixed-size ring of slots, kept in a memory-mapped file.
+
+Layout, little endian:
+
+    header   magic, slot size, capacity, next sequence number (64 bytes)
+    slots    `capacity` slots of `slot_size` bytes each
+
+Every slot holds an entry's sequence number (0 for an empty slot), timestamp,
+size, MIME type and a preview: the text itself when it fits, or its first line(s)
+otherwise. Entries that don't fit (and anything that isn't text) are stored out of
+line, in a file per entry next to the ring, deleted when their slot gets reused.
+
+Appending writes one slot and the header, so it costs the same no matter how long
+the history is. Nothing is read into Python objects up front: listing decodes the
+previews of the slots asked for, and searching runs `re` over the mapping to find
+candidate slots before decoding just those.
+"""
+
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from loguru import logger
+
+from modules.runner.matcher import CancelCheck, FilterCancelled
+
+MAGIC = b"FFCLIP\x00\x01"
+_HEADER = struct.Struct("<8sIIQ")
+HEADER_SIZE = 64
+_SLOT = struct.Struct("<QdIHB32s")
+"""Sequence number, timestamp, size in bytes, preview length, flags, MIME type"""
+FLAG_INLINE = 1
+"""The preview is the whole entry"""
+
+DEFAULT_CAPACITY = 20_000
+DEFAULT_SLOT_SIZE = 256
+# Searches stop after the chunk in which they found enough entries
+SEARCH_CHUNK_SLOTS = 1024
+
+
+@dataclass(slots=True)
+class ClipboardEntry:
+    seq: int
+    timestamp: float
+    size: int
+    mime: str
+    preview: str
+    inline: bool
+    """Whether the preview is the whole entry"""
+
+
+def _is_text(mime: str) -> bool:
+    return mime.startswith("text/") or mime in ("UTF8_STRING", "STRING", "TEXT")
+
+
+def make_preview(data: bytes, mime: str, max_bytes: int) -> tuple[bytes, bool]:
+    """Preview of an entry in at most `max_bytes`, and whether it's all of it"""
+    if not _is_text(mime):
+        return f"[{mime}, {len(data) // 1024} KiB]".encode()[:max_bytes], False
+    if len(data) <= max_bytes and b"\x00" not in data and b"\n" not in data:
+        try:
+            data.decode("utf-8")
+            return data, True
+        except UnicodeDecodeError:
+            pass
+    head = data[: max_bytes * 4].decode("utf-8", "replace").replace("\x00", "")
+    preview = " ".join(head.split()).encode()[:max_bytes]
+    # Don't cut a char in half
+    return preview.decode("utf-8", "ignore").encode(), False
+
+
+def _subsequence_pattern(term: bytes) -> bytes:
+    # Like the matcher's, negated classes keep `re` from backtracking
+    pattern = re.escape(term[:1])
+    for char in term[1:]:
+        escaped = re.escape(bytes((char,)))
+        pattern += b"[^\x00" + escaped + b"]*" + escaped
+    return pattern
+
+
+class ClipboardRing:
+    def __init__(
+        self,
+        file: Path,
+        capacity: int = DEFAULT_CAPACITY,
+        slot_size: int = DEFAULT_SLOT_SIZE,
+    ) -> None:
+        self.file = file
+        self.blob_dir = file.with_suffix(".blobs")
+        self.capacity = capacity
+        self.slot_size = slot_size
+        # At least one zero byte ends every preview, so searches stop at it
+        self.preview_size = slot_size - _SLOT.size - 1
+        self._map: mmap.mmap | None = None
+        self._next_seq = 1
+        self._lock = threading.Lock()
+
+    def _open(self) -> mmap.mmap:
+        if self._map is not None:
+            return self._map
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        size = HEADER_SIZE + self.capacity * self.slot_size
+        fd = os.open(self.file, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            header = os.pread(fd, _HEADER.size, 0)
+            valid = len(header) == _HEADER.size and _HEADER.unpack(header)[:3] == (
+                MAGIC,
+                self.slot_size,
+                self.capacity,
+            )
+            if not valid:
+                if header:
+                    logger.warning(f"{self.file} has another layout, starting over")
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)  # sparse, pages get allocated when written
+                os.pwrite(fd, _HEADER.pack(MAGIC, self.slot_size, self.capacity, 1), 0)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._next_seq = _HEADER.unpack_from(self._map)[3]
+        return self._map
+
+    def _slot_offset(self, seq: int) -> int:
+        return HEADER_SIZE + (seq % self.capacity) * self.slot_size
+
+    def _blob_file(self, seq: int) -> Path:
+        return self.blob_dir / f"{seq:016x}"
+
+    def _write_blob(self, seq: int, data: bytes):
+        # Private like the ring itself, copied secrets may end up in there
+        self.blob_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd = os.open(self._blob_file(seq), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+
+    def _read(self, seq: int) -> ClipboardEntry | None:
+        offset = self._slot_offset(seq)
+        assert self._map is not None
+        stored, timestamp, size, preview_len, flags, mime = _SLOT.unpack_from(
+            self._map, offset
+        )
+        if stored != seq:
+            return None
+        start = offset + _SLOT.size
+        return ClipboardEntry(
+            seq=seq,
+            timestamp=timestamp,
+            size=size,
+            mime=mime.rstrip(b"\x00").decode("utf-8", "replace"),
+            preview=self._map[start : start + preview_len].decode("utf-8", "replace"),
+            inline=bool(flags & FLAG_INLINE),
+        )
+
+    ### Writing
+
+    def append(self, data: bytes, mime: str = "text/plain") -> int | None:
+        """Records an entry, returns its sequence number.
+
+        Skipped (returning None) if it's empty or the same as the latest entry.
+        """
+        if not data:
+            return None
+        preview, inline = make_preview(data, mime, self.preview_size)
+        with self._lock:
+            mapping = self._open()
+            if self._is_latest(data):
+                return None
+
+            seq = self._next_seq
+            offset = self._slot_offset(seq)
+            replaced = _SLOT.unpack_from(mapping, offset)[0]
+            if not inline:
+                self._write_blob(seq, data)
+
+            flags = FLAG_INLINE if inline else 0
+            slot = _SLOT.pack(
+                seq, time.time(), len(data), len(preview), flags, mime.encode()[:32]
+            )
+            padding = b"\x00" * (self.slot_size - len(slot) - len(preview))
+            mapping[offset : offset + self.slot_size] = slot + preview + padding
+            self._next_seq = seq + 1
+            _HEADER.pack_into(mapping, 0, MAGIC, self.slot_size, self.capacity, seq + 1)
+        if replaced:
+            self._blob_file(replaced).unlink(missing_ok=True)
+        return seq
+
+    def remove(self, seq: int) -> bool:
+        with self._lock:
+            mapping = self._open()
+            offset = self._slot_offset(seq)
+            if _SLOT.unpack_from(mapping, offset)[0] != seq:
+                return False
+            mapping[offset : offset + self.slot_size] = b"\x00" * self.slot_size
+        self._blob_file(seq).unlink(missing_ok=True)
+        return True
+
+    ### Reading
+
+    def _seqs(self) -> range:
+        """Sequence numbers slots may hold, newest first"""
+        newest = self._next_seq - 1
+        return range(newest, max(newest - self.capacity, 0), -1)
+
+    def _is_latest(self, data: bytes) -> bool:
+        for seq in self._seqs():
+            if (entry := self._read(seq)) is not None:
+                return entry.size == len(data) and self._content(entry) == data
+        return False
+
+    def _content(self, entry: ClipboardEntry) -> bytes | None:
+        if entry.inline:
+            return entry.preview.encode()
+        try:
+            return self._blob_file(entry.seq).read_bytes()
+        except OSError:
+            return None
+
+    def content(self, seq: int) -> tuple[bytes, str] | None:
+        """Full data and MIME type of an entry, if it's still around"""
+        with self._lock:
+            self._open()
+            if (entry := self._read(seq)) is None:
+                return None
+            data = self._content(entry)
+        return None if data is None else (data, entry.mime)
+
+    def latest(self, limit: int) -> Iterator[ClipboardEntry]:
+        """Up to `limit` entries, newest first"""
+        with self._lock:
+            self._open()
+            seqs = self._seqs()
+        for seq in seqs:
+            if limit <= 0:
+                return
+            with self._lock:
+                entry = self._read(seq)
+            if entry is not None:
+                limit -= 1
+                yield entry
+
+    def _slot_chunks(self) -> Iterator[tuple[int, int]]:
+        """Slot ranges holding ever older entries, for scanning newest first"""
+        newest = (self._next_seq - 1) % self.capacity
+        for low_end, high in ((0, newest + 1), (newest + 1, self.capacity)):
+            while high > low_end:
+                low = max(high - SEARCH_CHUNK_SLOTS, low_end)
+                yield low, high
+                high = low
+
+    def search(
+        self, term: str, limit: int, cancelled: CancelCheck | None = None
+    ) -> list[ClipboardEntry]:
+        """Up to `limit` entries whose preview may contain the chars of `term` in
+        order, newest first.
+
+        Only ASCII chars are looked for (case insensitively), so callers should
+        check what they get.
+        """
+        ascii_term = "".join(char for char in term if char.isascii()).lower()
+        if not ascii_term:
+            return list(self.latest(limit))
+        # Chunks get lowercased as a copy: `re.IGNORECASE` would keep `re` from
+        # skipping ahead to the first char, and is several times slower
+        compiled = re.compile(_subsequence_pattern(ascii_term.encode()))
+        entries: list[ClipboardEntry] = []
+        with self._lock:
+            mapping = self._open()
+            for low, high in self._slot_chunks():
+                if cancelled is not None and cancelled():
+                    raise FilterCancelled
+                found_in_chunk: list[ClipboardEntry] = []
+                chunk_start = HEADER_SIZE + low * self.slot_size
+                chunk = mapping[
+                    chunk_start : HEADER_SIZE + high * self.slot_size
+                ].lower()
+                position = 0
+                while found := compiled.search(chunk, position):
+                    offset = found.start() - found.start() % self.slot_size
+                    if found.start() < offset + _SLOT.size:
+                        # Inside the slot's binary fields, try again from its preview
+                        position = offset + _SLOT.size
+                        continue
+                    seq = _SLOT.unpack_from(mapping, chunk_start + offset)[0]
+                    if seq and (entry := self._read(seq)) is not None:
+                        found_in_chunk.append(entry)
+                    # One hit per slot is enough
+                    position = offset + self.slot_size
+                entries.extend(reversed(found_in_chunk))
+                if len(entries) >= limit:
+                    break
+        return entries[:limit]
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
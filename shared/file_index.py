@@ -0,0 +1,451 @@
+"""Index of the files under a few roots, for the files plugin.
+
+The bulk of it is a `TrigramIndex` on disk, mapped on load. While running,
+`Gio.FileMonitor` events are kept in a small in-memory overlay (paths added and
+removed since the index was written) instead of rescanning; once the overlay
+grows big it's folded into a new index file in the background.
+
+Searches run on other threads than the one handling events, so the overlay is
+never changed in place: every change publishes a new one, and a search reads a
+single, consistent overlay.
+"""
+
+import fnmatch
+import heapq
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator, Mapping
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+
+from gi.repository import Gio, GLib  # type: ignore
+from loguru import logger
+
+from modules.runner.matcher import CANCEL_CHECK_INTERVAL, CancelCheck, FilterCancelled
+from shared.paths import user_cache_dir, user_config_dir
+from shared.scheduler import SCHEDULER, Priority
+from shared.trigram_index import TrigramIndex, write_index
+
+INDEX_VERSION = 1
+# Paths looked at per query, shallower ones come first
+CANDIDATE_LIMIT = 5000
+# Changes kept in memory before they're written into a new index
+COMPACT_AFTER = 2000
+# Changes made while the launcher wasn't running are only caught by a rescan
+MAX_INDEX_AGE_S = 24 * 60 * 60
+# inotify watches are a limited resource, only the shallowest dirs get one
+MAX_WATCHED_DIRS = 4096
+
+DEFAULT_IGNORE = [
+    ".git",
+    "node_modules",
+    "__pycache__",
+    ".venv",
+    "venv",
+    "target",
+    "*.pyc",
+    "*.o",
+]
+
+_MONITORED_EVENTS = {
+    Gio.FileMonitorEvent.CREATED,
+    Gio.FileMonitorEvent.DELETED,
+    Gio.FileMonitorEvent.MOVED_IN,
+    Gio.FileMonitorEvent.MOVED_OUT,
+    Gio.FileMonitorEvent.RENAMED,
+}
+
+
+def _in_removed_dir(path: str, removed_dirs: frozenset[str] | set[str]) -> bool:
+    """Whether `path` is below one of `removed_dirs`, a lookup per ancestor"""
+    if not removed_dirs:
+        return False
+    slash = path.find("/", 1)
+    while slash != -1:
+        if path[: slash + 1] in removed_dirs:
+            return True
+        slash = path.find("/", slash + 1)
+    return False
+
+
+@dataclass(frozen=True, slots=True)
+class _Overlay:
+    """Changes since the index was written. Directories end with a slash."""
+
+    added: Mapping[str, None]
+    """In the order they were added, never changed once published"""
+    removed: frozenset[str]
+    removed_dirs: frozenset[str]
+    """Deleted directories: everything below them is gone too"""
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.removed)
+
+
+type _OverlayEdit = Callable[[dict[str, None], set[str], set[str]], None]
+
+
+@dataclass
+class FileIndexConfig:
+    roots: list[str] = field(default_factory=lambda: [str(Path.home())])
+    ignore: list[str] = field(default_factory=lambda: list(DEFAULT_IGNORE))
+    """Glob patterns matched against file and directory names"""
+    include_hidden: bool = False
+
+    @classmethod
+    def load(cls, path: Path | None = None) -> "FileIndexConfig":
+        """Reads `files.json` from the config dir, if there is one"""
+        path = path or user_config_dir() / "files.json"
+        try:
+            data = json.loads(path.read_text())
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError):
+            logger.warning(f"Could not read {path}, using default file roots")
+            return cls()
+        names = {f.name for f in fields(cls)}
+        config = cls(**{k: v for k, v in data.items() if k in names})
+        config.roots = [os.path.expanduser(root) for root in config.roots]
+        return config
+
+
+class FileIndex:
+    def __init__(self, config: FileIndexConfig, index_file: Path | None = None):
+        self.config = config
+        self.index_file = index_file or user_cache_dir() / "files.idx"
+        self._base: TrigramIndex | None = None
+        self._overlay = _Overlay({}, frozenset(), frozenset())
+        self._overlay_lock = threading.Lock()
+        # Created directories, walked one after the other by a single thread
+        self._walks: queue.SimpleQueue[str] = queue.SimpleQueue()
+        self._walker: threading.Thread | None = None
+        self._monitors: dict[str, Gio.FileMonitor] = {}
+        self._building = False
+        self._loaded = False
+        self._ignored = re.compile(
+            "|".join(fnmatch.translate(p) for p in config.ignore) or "(?!)"
+        )
+
+    def _metadata(self) -> dict:
+        return {"version": INDEX_VERSION, **asdict(self.config)}
+
+    def load(self):
+        """Maps the index once, rebuilding it in the background if it's stale"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            base = TrigramIndex(self.index_file)
+            age = time.time() - self.index_file.stat().st_mtime
+        except (OSError, ValueError):
+            self._rebuild()
+            return
+        self._base = base
+        if base.metadata != self._metadata() or age > MAX_INDEX_AGE_S:
+            self._rebuild()
+        else:
+            self._watch_indexed_dirs(base)
+
+    ### Searching
+
+    def search(
+        self, query: str, limit: int, cancelled: CancelCheck | None = None
+    ) -> list[tuple[float, str]]:
+        """Best `limit` (score, path) pairs for `query`, best first.
+
+        Every whitespace separated term must appear in the path (below its root),
+        matches in the file name rank higher. Directories end with a slash.
+        """
+        terms = query.casefold().split()
+        if not terms:
+            return []
+        base, overlay = self._base, self._overlay
+        removed, removed_dirs = overlay.removed, overlay.removed_dirs
+        # Paths created again after being removed are in both, hence the dict
+        candidates = {
+            path: None
+            for path in overlay.added
+            if not _in_removed_dir(path, removed_dirs)
+        }
+        if base is not None:
+            for number in base.candidates(terms, CANDIDATE_LIMIT):
+                path = base.path(number)
+                if path not in removed and not _in_removed_dir(path, removed_dirs):
+                    candidates[path] = None
+
+        scored: list[tuple[float, str]] = []
+        for n, path in enumerate(candidates):
+            if not n % CANCEL_CHECK_INTERVAL and cancelled and cancelled():
+                raise FilterCancelled
+            if (score := self._score(path, terms)) is not None:
+                scored.append((score, path))
+        return heapq.nlargest(limit, scored)
+
+    def _score(self, path: str, terms: list[str]) -> float | None:
+        lowered = self._relative(path).casefold()
+        name = lowered.rstrip("/").rpartition("/")[2]
+        score = -len(lowered) / 16 - lowered.count("/")
+        for term in terms:
+            if term in name:
+                score += 16 * len(term) + (32 if name.startswith(term) else 0)
+            elif term in lowered:
+                score += 4 * len(term)
+            else:
+                return None
+        return score
+
+    def _relative(self, path: str) -> str:
+        for root in self.config.roots:
+            if path.startswith(root):
+                return path[len(root) :]
+        return path
+
+    ### Building
+
+    def _walk(self, top: str) -> Iterator[str]:
+        """Paths below `top`, breadth first, directories with a trailing slash"""
+        include_hidden, ignored = self.config.include_hidden, self._ignored
+        pending = deque([top])
+        while pending:
+            try:
+                entries = list(os.scandir(pending.popleft()))
+            except OSError:
+                continue
+            for entry in sorted(entries, key=lambda e: e.name):
+                name = entry.name
+                if (not include_hidden and name[0] == ".") or ignored.match(name):
+                    continue
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if is_dir:
+                    pending.append(entry.path)
+                    yield entry.path + "/"
+                else:
+                    yield entry.path
+
+    def _write(self, paths: Iterator[str]):
+        searchable_from: list[int] = []
+        collected: list[str] = []
+        roots = [(root, len(os.fsencode(root))) for root in self.config.roots]
+        for path in paths:
+            collected.append(path)
+            searchable_from.append(
+                next((size for root, size in roots if path.startswith(root)), 0)
+            )
+        write_index(self.index_file, collected, self._metadata(), searchable_from)
+
+    def _rebuild(self, compact_only: bool = False):
+        """Writes a new index in the background, by walking the roots or (with
+        `compact_only`) by folding the overlay into the current one"""
+        if self._building:
+            return
+        self._building = True
+        base, overlay = self._base, self._overlay
+        added, removed, removed_dirs = (
+            list(overlay.added),
+            overlay.removed,
+            overlay.removed_dirs,
+        )
+
+        def paths() -> Iterator[str]:
+            if compact_only and base is not None:
+                for path in base.paths():
+                    if path not in removed and not _in_removed_dir(path, removed_dirs):
+                        yield path
+                yield from (p for p in added if not _in_removed_dir(p, removed_dirs))
+            else:
+                for root in self.config.roots:
+                    yield from self._walk(root)
+
+        def build():
+            start = time.perf_counter()
+            try:
+                self._write(paths())
+                index = TrigramIndex(self.index_file)
+            except (OSError, ValueError):
+                logger.exception("Could not build the file index")
+                index = None
+            logger.info(
+                f"File index {'compacted' if compact_only else 'rebuilt'} in "
+                f"{time.perf_counter() - start:.1f}s"
+            )
+            GLib.idle_add(self._swap, index, compact_only, added, removed, removed_dirs)
+
+        threading.Thread(target=build, name="file-index", daemon=True).start()
+
+    def _swap(
+        self,
+        index: TrigramIndex | None,
+        compacted: bool,
+        added: list[str],
+        removed: frozenset[str],
+        removed_dirs: frozenset[str],
+    ):
+        self._building = False
+        if index is None:
+            return False
+
+        # Only changes from before the build started are in the new index
+        def forget_indexed(now_added, now_removed, now_removed_dirs):
+            for path in added:
+                now_added.pop(path, None)
+            now_removed.difference_update(removed)
+            now_removed_dirs.difference_update(removed_dirs)
+
+        self._base = index
+        self._edit_overlay(forget_indexed)
+        if not compacted:
+            self._watch_indexed_dirs(index)
+        return False
+
+    ### Monitoring
+
+    def _watch_indexed_dirs(self, index: TrigramIndex):
+        def collect():
+            dirs = [*self.config.roots]
+            for path in index.paths():
+                if len(dirs) >= MAX_WATCHED_DIRS:
+                    logger.warning(
+                        f"Only watching the first {MAX_WATCHED_DIRS} directories "
+                        "for file changes"
+                    )
+                    break
+                if path.endswith("/"):
+                    dirs.append(path.rstrip("/"))
+            GLib.idle_add(self._watch_dirs, iter(dirs))
+
+        threading.Thread(target=collect, name="file-index-dirs", daemon=True).start()
+
+    def _watch_dirs(self, dirs: Iterator[str]):
+        # Spread over frames, creating thousands of monitors takes a while
+        def watch_next() -> bool:
+            if (dirpath := next(dirs, None)) is None:
+                return False
+            self._watch_dir(dirpath)
+            return True
+
+        SCHEDULER.submit(watch_next, Priority.BACKGROUND, name="file_index.watch")
+        return False
+
+    def _watch_dir(self, dirpath: str):
+        if dirpath in self._monitors or len(self._monitors) >= MAX_WATCHED_DIRS:
+            return
+        try:
+            monitor = Gio.File.new_for_path(dirpath).monitor_directory(
+                Gio.FileMonitorFlags.WATCH_MOVES, None
+            )
+        except GLib.Error:
+            return
+        monitor.connect("changed", self._handle_monitor_event)
+        self._monitors[dirpath] = monitor
+
+    def _handle_monitor_event(self, _, file: Gio.File, other: Gio.File | None, event):
+        if event not in _MONITORED_EVENTS:
+            return
+        if event in (Gio.FileMonitorEvent.CREATED, Gio.FileMonitorEvent.MOVED_IN):
+            self._handle_created(file.get_path())
+        elif event == Gio.FileMonitorEvent.RENAMED:
+            self._handle_deleted(file.get_path())
+            if other is not None:
+                self._handle_created(other.get_path())
+        else:
+            self._handle_deleted(file.get_path())
+
+        if len(self._overlay) > COMPACT_AFTER:
+            self._rebuild(compact_only=True)
+
+    def _edit_overlay(self, edit: _OverlayEdit):
+        """Publishes a new overlay: `edit` changes copies of the current one's parts"""
+        with self._overlay_lock:
+            overlay = self._overlay
+            added = dict(overlay.added)
+            removed, removed_dirs = set(overlay.removed), set(overlay.removed_dirs)
+            edit(added, removed, removed_dirs)
+            self._overlay = _Overlay(added, frozenset(removed), frozenset(removed_dirs))
+
+    def _handle_created(self, path: str | None):
+        if not path:
+            return
+        name = os.path.basename(path)
+        if (not self.config.include_hidden and name[0] == ".") or self._ignored.match(
+            name
+        ):
+            return
+        if not os.path.isdir(path):
+
+            def add_file(added, removed, _):
+                removed.discard(path)
+                added[path] = None
+
+            self._edit_overlay(add_file)
+            return
+
+        def add_dir(added, removed, removed_dirs):
+            removed.discard(path + "/")
+            # Created again, what's below it now gets walked into the overlay
+            removed_dirs.discard(path + "/")
+            added[path + "/"] = None
+
+        self._edit_overlay(add_dir)
+        self._walks.put(path)
+        if self._walker is None:
+            self._walker = threading.Thread(
+                target=self._walk_loop, name="file-index-walk", daemon=True
+            )
+            self._walker.start()
+
+    def _walk_loop(self):
+        while True:
+            top = self._walks.get()
+            found = list(self._walk(top))
+            GLib.idle_add(self._add_subtree, top, found)
+
+    def _add_subtree(self, top: str, paths: list[str]):
+        def add_paths(added, _, __):
+            added.update(dict.fromkeys(paths))
+
+        self._edit_overlay(add_paths)
+        self._watch_dir(top)
+        for path in paths:
+            if path.endswith("/"):
+                self._watch_dir(path.rstrip("/"))
+        return False
+
+    def _handle_deleted(self, path: str | None):
+        if not path:
+            return
+        prefix = path + "/"
+        # It's gone, whether it was a directory is only known from what we saw
+        is_dir = prefix in self._overlay.added
+        if (monitor := self._monitors.pop(path, None)) is not None:
+            monitor.cancel()
+            is_dir = True
+        is_dir = is_dir or self._is_indexed(prefix)
+
+        def remove(added, removed, removed_dirs):
+            added.pop(path, None)
+            added.pop(prefix, None)
+            removed.update((path, prefix))
+            if is_dir:
+                # Whatever was below it is gone too
+                removed_dirs.add(prefix)
+                for below in [p for p in added if p.startswith(prefix)]:
+                    del added[below]
+
+        self._edit_overlay(remove)
+
+    def _is_indexed(self, path: str) -> bool:
+        if (base := self._base) is None:
+            return False
+        name = os.path.basename(path.rstrip("/"))
+        return any(
+            base.path(number) == path
+            for number in base.candidates([name], CANDIDATE_LIMIT)
+        )
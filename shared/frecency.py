@@ -0,0 +1,155 @@
+"""Launch history with exponentially decaying scores.
+
+Launches are appended to a plain text log (`<timestamp>\\t<weight>\\t<key>` per
+line) by a background thread, so recording never waits on the disk. Scores live
+in memory as (score, time of last update) pairs, making lookups O(1). Once the log
+grows well past the number of keys, it's compacted to one line per key carrying
+the decayed score, which keeps loading fast no matter how old the history is.
+"""
+
+import atexit
+import math
+import queue
+import threading
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from shared.paths import atomic_write, user_data_dir
+
+HALF_LIFE_SECONDS = 7 * 24 * 60 * 60
+# Boost worth about one matched character per doubling of the score
+BOOST_WEIGHT = 16
+# Keys decayed below this are dropped on compaction
+MIN_SCORE = 0.01
+
+
+class FrecencyStore:
+    def __init__(
+        self,
+        log_file: Path,
+        half_life: float = HALF_LIFE_SECONDS,
+        compact_ratio: int = 4,
+        compact_min_lines: int = 1000,
+    ) -> None:
+        self.log_file = log_file
+        self._decay = math.log(2) / half_life
+        self._compact_ratio = compact_ratio
+        self._compact_min_lines = compact_min_lines
+
+        self._scores: dict[str, tuple[float, float]] = {}
+        # What the log holds so far. Compaction works off this instead of
+        # `_scores`, which may include launches still queued for writing
+        self._logged: dict[str, tuple[float, float]] = {}
+        self._log_lines = 0
+        self._loaded = False
+        self._queue: queue.SimpleQueue[tuple[float, float, str] | None] = (
+            queue.SimpleQueue()
+        )
+        self._writer: threading.Thread | None = None
+
+    def load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with self.log_file.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        timestamp, weight, key = line.rstrip("\n").split("\t", 2)
+                        self._add(self._logged, key, float(weight), float(timestamp))
+                    except ValueError:
+                        continue
+                    self._log_lines += 1
+            self._scores = dict(self._logged)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.exception(f"Could not load launch history from {self.log_file}")
+
+    def score(self, key: str, now: float | None = None) -> float:
+        """Decayed launch score of `key`, 0 if it was never launched"""
+        self.load()
+        if (entry := self._scores.get(key)) is None:
+            return 0.0
+        return self._decayed(entry, now or time.time())
+
+    def boost(self, key: str) -> int:
+        """Ranking bonus for `key`, on the same scale as matcher scores"""
+        return round(BOOST_WEIGHT * math.log2(1 + self.score(key)))
+
+    def record(self, key: str, weight: float = 1.0):
+        """Records a launch of `key`. Only touches memory, the log is written later."""
+        self.load()
+        now = time.time()
+        self._add(self._scores, key, weight, now)
+        self._queue.put((now, weight, key))
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=self._write_loop, name="frecency", daemon=True
+            )
+            self._writer.start()
+            atexit.register(self.flush)
+
+    def flush(self, timeout: float = 1.0):
+        """Waits (a bit) for pending writes, e.g. before exiting"""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join(timeout)
+        self._writer = None
+
+    def _decayed(self, entry: tuple[float, float], now: float) -> float:
+        score, updated = entry
+        return score * math.exp(-self._decay * (now - updated))
+
+    def _add(
+        self,
+        scores: dict[str, tuple[float, float]],
+        key: str,
+        weight: float,
+        timestamp: float,
+    ):
+        if (entry := scores.get(key)) is not None:
+            score, updated = entry
+            if timestamp >= updated:
+                score *= math.exp(-self._decay * (timestamp - updated))
+            else:
+                weight *= math.exp(-self._decay * (updated - timestamp))
+                timestamp = updated
+            weight += score
+        scores[key] = (weight, timestamp)
+
+    def _write_loop(self):
+        while (item := self._queue.get()) is not None:
+            timestamp, weight, key = item
+            try:
+                self.log_file.parent.mkdir(parents=True, exist_ok=True)
+                with self.log_file.open("a", encoding="utf-8") as f:
+                    f.write(f"{timestamp:.3f}\t{weight:g}\t{key}\n")
+                self._add(self._logged, key, weight, timestamp)
+                self._log_lines += 1
+                if self._log_lines > max(
+                    self._compact_min_lines, self._compact_ratio * len(self._logged)
+                ):
+                    self._compact()
+            except OSError:
+                logger.exception(f"Could not write launch history to {self.log_file}")
+
+    def _compact(self):
+        now = time.time()
+        lines = []
+        for key, entry in list(self._logged.items()):
+            if self._decayed(entry, now) < MIN_SCORE:
+                del self._logged[key]
+                continue
+            score, updated = entry
+            lines.append(f"{updated:.3f}\t{score:.6g}\t{key}\n")
+        atomic_write(self.log_file, "".join(lines).encode())
+        self._log_lines = len(lines)
+        logger.info(f"Compacted launch history to {len(lines)} entries")
+
+
+FRECENCY = FrecencyStore(user_data_dir() / "history.log")
+"""Shared launch history"""
@@ -0,0 +1,154 @@
+"""Asynchronous icon loading for runner rows.
+
+Icon names are resolved against the theme on the main thread (cheap, and the icon
+theme isn't thread-safe), while decoding happens on worker threads. Everything but
+decoding, including the caches, is only touched from the main thread. Decoded
+pixbufs are kept in an LRU bounded in bytes, and scaled thumbnails can be
+persisted on disk, keyed by source path, mtime and size.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from gi.repository import GdkPixbuf, Gio, GLib, Gtk  # type: ignore
+from loguru import logger
+
+from shared.paths import user_cache_dir
+
+type IconCallback = Callable[[GdkPixbuf.Pixbuf | None], None]
+
+
+class IconService:
+    def __init__(
+        self,
+        max_bytes: int = 8 * 1024 * 1024,
+        workers: int = 2,
+        thumbnail_dir: Path | None = None,
+    ) -> None:
+        """
+        Parameters
+        ----------
+        max_bytes : int - upper bound for pixel data kept in memory
+        workers : int - number of decoding threads
+        thumbnail_dir : Path | None - where scaled thumbnails are persisted, `None`
+                                      disables the on-disk cache
+        """
+        self.max_bytes = max_bytes
+        self.thumbnail_dir = thumbnail_dir
+
+        self._cache: OrderedDict[tuple[str, int], GdkPixbuf.Pixbuf] = OrderedDict()
+        self._cache_bytes = 0
+        self._paths: dict[tuple[str, int], str | None] = {}
+        self._waiting: dict[tuple[str, int], list[IconCallback]] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="icons"
+        )
+
+    def get_cached(self, icon: str, size: int = 24) -> GdkPixbuf.Pixbuf | None:
+        if (pixbuf := self._cache.get((icon, size))) is not None:
+            self._cache.move_to_end((icon, size))
+        return pixbuf
+
+    def request(self, icon: str, callback: IconCallback, size: int = 24):
+        """Calls `callback` on the main loop with the icon, or `None` if not found.
+
+        Cached icons are delivered right away; requests for an icon that's already
+        being loaded share a single decode.
+        """
+        if (pixbuf := self.get_cached(icon, size)) is not None:
+            callback(pixbuf)
+            return
+
+        key = (icon, size)
+        if key in self._waiting:
+            self._waiting[key].append(callback)
+            return
+
+        if (path := self._resolve(icon, size)) is None:
+            callback(None)
+            return
+        self._waiting[key] = [callback]
+        self._executor.submit(self._load, key, path)
+
+    def _resolve(self, icon: str, size: int) -> str | None:
+        """File path for an icon name (or path), memoized"""
+        key = (icon, size)
+        if key in self._paths:
+            return self._paths[key]
+
+        path: str | None = None
+        if os.path.isabs(icon):
+            path = icon if os.path.exists(icon) else None
+        else:
+            try:
+                gicon = Gio.Icon.new_for_string(icon)
+            except GLib.Error:
+                gicon = None
+            info = (
+                Gtk.IconTheme.get_default().lookup_by_gicon(
+                    gicon, size, Gtk.IconLookupFlags.FORCE_SIZE
+                )
+                if gicon is not None
+                else None
+            )
+            path = info.get_filename() if info is not None else None
+        self._paths[key] = path
+        return path
+
+    def _thumbnail_path(self, path: str, size: int) -> Path | None:
+        if self.thumbnail_dir is None:
+            return None
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        digest = hashlib.sha1(f"{path}:{mtime}:{size}".encode()).hexdigest()
+        return self.thumbnail_dir / f"{digest}.png"
+
+    def _load(self, key: tuple[str, int], path: str):
+        """Runs on a worker thread"""
+        size = key[1]
+        pixbuf: GdkPixbuf.Pixbuf | None = None
+        try:
+            thumbnail = self._thumbnail_path(path, size)
+            if thumbnail is not None and thumbnail.exists():
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file(str(thumbnail))
+            else:
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(path, size, size, True)
+                if thumbnail is not None:
+                    thumbnail.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = thumbnail.with_suffix(f".{threading.get_ident()}.tmp")
+                    pixbuf.savev(str(tmp), "png", [], [])
+                    os.replace(tmp, thumbnail)
+        except (GLib.Error, OSError):
+            logger.warning(f"Could not load icon {path}")
+        except Exception:
+            logger.exception(f"Could not load icon {path}")
+        finally:
+            # Whatever happened, so that requests waiting on this key get an answer
+            # (`None` at worst) and later ones don't queue up behind it forever
+            GLib.idle_add(self._deliver, key, pixbuf)
+
+    def _deliver(self, key: tuple[str, int], pixbuf: GdkPixbuf.Pixbuf | None):
+        callbacks = self._waiting.pop(key, [])
+        if pixbuf is not None:
+            self._store(key, pixbuf)
+        for callback in callbacks:
+            callback(pixbuf)
+        return False
+
+    def _store(self, key: tuple[str, int], pixbuf: GdkPixbuf.Pixbuf):
+        self._cache[key] = pixbuf
+        self._cache_bytes += pixbuf.get_byte_length()
+        while self._cache_bytes > self.max_bytes and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= evicted.get_byte_length()
+
+
+ICON_SERVICE = IconService(thumbnail_dir=user_cache_dir() / "icons")
+"""Shared icon service"""
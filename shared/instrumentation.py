@@ -0,0 +1,115 @@
+"""Latency instrumentation for the launcher's hot paths.
+
+Disabled by default (set `FAFAFA_TRACE=1`, or flip `TRACER.enabled` at runtime);
+while disabled every call returns right away. When enabled, durations are kept in
+bounded per-metric windows for rolling percentiles, and as trace events that can
+be dumped in Chrome's trace format (load it in `chrome://tracing` or Perfetto).
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+from shared.paths import atomic_write
+
+SAMPLES_PER_METRIC = 512
+MAX_TRACE_EVENTS = 20_000
+
+_DISABLED_SPAN = nullcontext()
+
+
+class Tracer:
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self._origin = time.perf_counter()
+        self._samples: dict[str, deque[float]] = {}
+        self._events: deque[dict] = deque(maxlen=MAX_TRACE_EVENTS)
+        self._flows: dict[str, float] = {}
+
+    def now(self) -> float:
+        return time.perf_counter()
+
+    def record(self, metric: str, start: float, end: float | None = None):
+        """Records a duration, with `start`/`end` taken from `now()`"""
+        if not self.enabled:
+            return
+        end = self.now() if end is None else end
+        duration_ms = (end - start) * 1000
+        if (samples := self._samples.get(metric)) is None:
+            samples = self._samples[metric] = deque(maxlen=SAMPLES_PER_METRIC)
+        samples.append(duration_ms)
+        self._events.append(
+            {
+                "name": metric,
+                "ph": "X",
+                "ts": (start - self._origin) * 1_000_000,
+                "dur": duration_ms * 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            }
+        )
+
+    def span(self, metric: str):
+        """Context manager recording how long its body took"""
+        if not self.enabled:
+            return _DISABLED_SPAN
+        return self._span(metric)
+
+    @contextmanager
+    def _span(self, metric: str):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.record(metric, start)
+
+    def flow_start(self, flow: str):
+        """Starts a multi-stage flow, e.g. from a keybinding to the last row shown"""
+        if self.enabled:
+            self._flows[flow] = self.now()
+
+    def flow_mark(self, flow: str, stage: str):
+        """Records the time from the start of `flow` to `stage` as `flow.stage`"""
+        if not self.enabled or (start := self._flows.get(flow)) is None:
+            return
+        self.record(f"{flow}.{stage}", start)
+
+    def percentiles(self) -> dict[str, dict[str, float]]:
+        """p50/p95/p99 (in ms) over the latest samples of every metric"""
+        report: dict[str, dict[str, float]] = {}
+        for metric, samples in list(self._samples.items()):
+            ordered = sorted(samples)
+            if not ordered:
+                continue
+            report[metric] = {
+                "count": len(ordered),
+                **{
+                    f"p{p}": round(
+                        ordered[min(len(ordered) - 1, len(ordered) * p // 100)], 3
+                    )
+                    for p in (50, 95, 99)
+                },
+            }
+        return report
+
+    def dump_chrome_trace(self, path: Path | str) -> Path:
+        path = Path(path)
+        atomic_write(
+            path,
+            json.dumps(
+                {"traceEvents": list(self._events), "displayTimeUnit": "ms"}
+            ).encode(),
+        )
+        return path
+
+    def reset(self):
+        self._samples.clear()
+        self._events.clear()
+        self._flows.clear()
+
+
+TRACER = Tracer(enabled=os.environ.get("FAFAFA_TRACE") == "1")
@@ -0,0 +1,141 @@
+"""Unix socket front end for summoning plugins, see `fafafa_msg.py` for a client.
+
+One request per connection, a single JSON line:
+
+    {"plugin": "apps", "kwargs": {"mode": "list"}}
+
+answered with a single JSON line:
+
+    {"ok": true, "handled_ms": 0.41}  or  {"ok": false, "error": "..."}
+
+Everything runs on the GTK main loop (no threads), at high priority so requests
+aren't queued behind idle work.
+"""
+
+import json
+import os
+import socket
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from gi.repository import GLib  # type: ignore
+from loguru import logger
+
+from shared.paths import APP_NAME, user_runtime_dir
+
+MAX_REQUEST_BYTES = 64 * 1024
+
+type RequestHandler = Callable[[str, dict], bool]
+"""Called with the plugin name and its kwargs, returns False for unknown plugins"""
+
+
+def socket_path() -> Path:
+    return user_runtime_dir() / f"{APP_NAME}.sock"
+
+
+class IpcServer:
+    def __init__(self, handler: RequestHandler, path: Path | None = None) -> None:
+        self.path = path or socket_path()
+        self._handler = handler
+        self._socket: socket.socket | None = None
+        self._watch = 0
+
+    def start(self) -> bool:
+        """Starts listening, unless another instance already does"""
+        if self._in_use():
+            logger.warning(f"{self.path} is in use, not listening for requests")
+            return False
+        self.path.unlink(missing_ok=True)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)  # only the user may connect
+        try:
+            server.bind(str(self.path))
+        finally:
+            os.umask(old_umask)
+        server.listen(8)
+        server.setblocking(False)
+        self._socket = server
+        self._watch = GLib.io_add_watch(
+            server.fileno(), GLib.PRIORITY_HIGH, GLib.IO_IN, self._handle_accept
+        )
+        return True
+
+    def stop(self):
+        if self._watch:
+            GLib.source_remove(self._watch)
+            self._watch = 0
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+            self.path.unlink(missing_ok=True)
+
+    def _in_use(self) -> bool:
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(self.path))
+        except OSError:
+            return False
+        finally:
+            probe.close()
+        return True
+
+    def _handle_accept(self, *_):
+        assert self._socket is not None
+        try:
+            conn, _ = self._socket.accept()
+        except BlockingIOError:
+            return True
+        conn.setblocking(False)
+        buffer = bytearray()
+        GLib.io_add_watch(
+            conn.fileno(),
+            GLib.PRIORITY_HIGH,
+            GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+            self._handle_readable,
+            conn,
+            buffer,
+        )
+        return True
+
+    def _handle_readable(self, _, condition, conn: socket.socket, buffer: bytearray):
+        try:
+            chunk = conn.recv(4096)
+        except BlockingIOError:
+            return True
+        except OSError:
+            chunk = b""
+        buffer += chunk
+        if chunk and b"\n" not in chunk and len(buffer) < MAX_REQUEST_BYTES:
+            return True  # wait for the rest of the line
+
+        response = self._respond(bytes(buffer))
+        try:
+            conn.setblocking(True)
+            conn.sendall(json.dumps(response).encode() + b"\n")
+        except OSError:
+            pass
+        finally:
+            conn.close()
+        return False
+
+    def _respond(self, data: bytes) -> dict:
+        start = time.perf_counter()
+        try:
+            request = json.loads(data.split(b"\n", 1)[0] or b"null")
+            plugin = request["plugin"]
+            kwargs = request.get("kwargs") or {}
+            if not isinstance(plugin, str) or not isinstance(kwargs, dict):
+                raise TypeError
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return {"ok": False, "error": "bad request"}
+        try:
+            if not self._handler(plugin, kwargs):
+                return {"ok": False, "error": f"unknown plugin '{plugin}'"}
+        except Exception as e:
+            logger.exception(f"IPC request for '{plugin}' failed")
+            return {"ok": False, "error": str(e)}
+        return {
+            "ok": True,
+            "handled_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
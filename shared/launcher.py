@@ -0,0 +1,308 @@
+"""Starting apps, commands and URIs without tying them to the launcher.
+
+`LAUNCHER` is what plugins go through: it starts things from the next main loop
+iteration, once the runner got hidden, and never waits on them. It also times
+every launch, from the runner's submit to the spawn, and from the spawn to the
+app's first window, so a slow app can be told apart from a slow launcher. First
+windows are only seen on Hyprland, which announces them on its event socket.
+"""
+
+import os
+import shlex
+import socket
+import subprocess
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from gi.repository import Gdk, Gio, GLib  # type: ignore
+from loguru import logger
+
+from shared.app_catalogue import AppEntry
+from shared.instrumentation import TRACER
+from shared.path_index import PATH_INDEX
+
+# Launches whose first window didn't show up by then aren't waited on anymore
+FIRST_WINDOW_TIMEOUT_S = 30
+
+
+def spawn_detached(
+    argv: list[str], executable: str | None = None, cwd: str | None = None
+) -> bool:
+    """Starts `argv` in a session of its own, with no stdio inherited.
+
+    Only fork/exec happen on the calling thread; the child is reaped from the
+    main loop when it exits, and keeps running if the launcher quits.
+    """
+    try:
+        process = subprocess.Popen(
+            argv,
+            executable=executable,
+            cwd=cwd or os.path.expanduser("~"),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            close_fds=True,
+        )
+    except OSError as e:
+        logger.error(f"Could not run {argv}: {e}")
+        return False
+    GLib.child_watch_add(GLib.PRIORITY_DEFAULT, process.pid, _reap, process)
+    logger.info(f"Started {argv} (pid {process.pid})")
+    return True
+
+
+def _reap(pid: int, status: int, process: subprocess.Popen):
+    # GLib already waited for it, let `Popen` know so it doesn't try again
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+
+def run_command(command_line: str) -> bool:
+    """Runs a command line the way a shell would split it, but without a shell"""
+    try:
+        argv = shlex.split(command_line)
+    except ValueError as e:
+        logger.error(f"Could not parse command '{command_line}': {e}")
+        return False
+    if not argv:
+        return False
+    if (executable := PATH_INDEX.resolve(os.path.expanduser(argv[0]))) is None:
+        logger.error(f"Command not found: {argv[0]}")
+        return False
+    return spawn_detached(argv, executable=executable)
+
+
+### Launch service
+
+
+@dataclass
+class _PendingLaunch:
+    name: str
+    window_classes: frozenset[str]
+    """Casefolded window classes the app's windows may have"""
+    spawned: float
+
+
+def _window_classes(*names: str) -> frozenset[str]:
+    return frozenset(name.casefold() for name in names if name)
+
+
+def _app_window_classes(app: AppEntry) -> frozenset[str]:
+    desktop_id = app.id.removesuffix(".desktop")
+    return _window_classes(
+        app.window_class,
+        desktop_id,
+        desktop_id.rsplit(".", 1)[-1],  # org.gnome.Nautilus -> Nautilus
+        os.path.basename(app.executable),
+    )
+
+
+class _HyprlandWindows:
+    """Reports the class of every window opened, read off Hyprland's event socket"""
+
+    def __init__(self, callback: Callable[[str], None]) -> None:
+        self._callback = callback
+        self._socket: socket.socket | None = None
+        self._buffer = b""
+
+    @staticmethod
+    def available() -> bool:
+        return bool(os.environ.get("HYPRLAND_INSTANCE_SIGNATURE"))
+
+    def start(self) -> bool:
+        if self._socket is not None:
+            return True
+        runtime_dir = os.environ.get("XDG_RUNTIME_DIR", "/tmp")
+        signature = os.environ.get("HYPRLAND_INSTANCE_SIGNATURE", "")
+        path = os.path.join(runtime_dir, "hypr", signature, ".socket2.sock")
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(path)
+        except OSError as e:
+            conn.close()
+            logger.warning(f"Not timing first windows, {path} is unavailable: {e}")
+            return False
+        conn.setblocking(False)
+        self._socket = conn
+        GLib.io_add_watch(
+            conn.fileno(),
+            GLib.PRIORITY_DEFAULT_IDLE,
+            GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR,
+            self._handle_readable,
+        )
+        return True
+
+    def _handle_readable(self, *_):
+        assert self._socket is not None
+        try:
+            chunk = self._socket.recv(65536)
+        except BlockingIOError:
+            return True
+        except OSError:
+            chunk = b""
+        if not chunk:
+            self._socket.close()
+            self._socket = None
+            return False
+        *lines, self._buffer = (self._buffer + chunk).split(b"\n")
+        for line in lines:
+            # openwindow>>ADDRESS,WORKSPACE,CLASS,TITLE
+            event, _, data = line.decode("utf-8", "replace").partition(">>")
+            if event == "openwindow" and len(fields := data.split(",", 3)) > 2:
+                self._callback(fields[2])
+        return True
+
+
+class LaunchService:
+    def __init__(self) -> None:
+        self._submitted: float | None = None
+        self._pending: list[_PendingLaunch] = []
+        self._windows = (
+            _HyprlandWindows(self._handle_window_opened)
+            if _HyprlandWindows.available()
+            else None
+        )
+
+    @contextmanager
+    def submitting(self):
+        """Wraps the handling of the user's pick, launches inside are timed from it"""
+        self._submitted = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._submitted = None
+
+    def launch_app(self, app: AppEntry):
+        def launch(submitted: float):
+            info = Gio.DesktopAppInfo.new_from_filename(app.path)
+            if info is None:
+                logger.error(f"Could not launch '{app.id}', {app.path} is gone")
+                return
+            info.launch_uris_async(
+                [],
+                self._launch_context(),
+                None,
+                self._handle_launched,
+                (app.display_name, _app_window_classes(app), submitted),
+            )
+
+        self._defer(launch)
+
+    def open_uri(self, uri: str):
+        """Opens `uri` in the default app for it"""
+
+        def launch(submitted: float):
+            scheme = urlsplit(uri).scheme
+            handler = Gio.AppInfo.get_default_for_uri_scheme(scheme) if scheme else None
+            handler_id = (handler.get_id() or "") if handler is not None else ""
+            classes = _window_classes(handler_id.removesuffix(".desktop"))
+            Gio.AppInfo.launch_default_for_uri_async(
+                uri,
+                self._launch_context(),
+                None,
+                self._handle_uri_launched,
+                (uri, classes, submitted),
+            )
+
+        self._defer(launch)
+
+    def spawn(self, argv: list[str], executable: str | None = None):
+        """`spawn_detached`, once the runner is hidden"""
+
+        def launch(submitted: float):
+            if spawn_detached(argv, executable=executable):
+                name = os.path.basename(argv[0])
+                self._record_spawn(name, _window_classes(name), submitted)
+
+        self._defer(launch)
+
+    def run_command(self, command_line: str):
+        """`run_command`, once the runner is hidden"""
+
+        def launch(submitted: float):
+            if run_command(command_line):
+                name = os.path.basename(shlex.split(command_line)[0])
+                self._record_spawn(name, _window_classes(name), submitted)
+
+        self._defer(launch)
+
+    def _defer(self, launch: Callable[[float], None]):
+        # The hidden window gets flushed to the compositor first
+        submitted = self._submitted or time.perf_counter()
+
+        def run():
+            try:
+                launch(submitted)
+            except Exception:
+                logger.exception("Launch failed")
+            return False
+
+        GLib.idle_add(run)
+
+    @staticmethod
+    def _launch_context() -> Gio.AppLaunchContext:
+        # Lets apps use startup notification / XDG activation
+        if (display := Gdk.Display.get_default()) is not None:
+            return display.get_app_launch_context()
+        return Gio.AppLaunchContext()
+
+    def _handle_launched(self, info: Gio.DesktopAppInfo, result, data):
+        name, classes, submitted = data
+        try:
+            info.launch_uris_finish(result)
+        except GLib.Error as e:
+            logger.error(f"Could not launch '{name}': {e.message}")
+            return
+        self._record_spawn(name, classes, submitted)
+
+    def _handle_uri_launched(self, _, result, data):
+        uri, classes, submitted = data
+        try:
+            Gio.AppInfo.launch_default_for_uri_finish(result)
+        except GLib.Error as e:
+            logger.error(f"Could not open '{uri}': {e.message}")
+            return
+        self._record_spawn(uri, classes, submitted)
+
+    ### Timings
+
+    def _record_spawn(
+        self, name: str, window_classes: frozenset[str], submitted: float
+    ):
+        now = time.perf_counter()
+        TRACER.record("launch.submit_to_spawn", submitted, now)
+        logger.info(
+            f"Launched '{name}' {(now - submitted) * 1000:.1f} ms after it was picked"
+        )
+        if self._windows is None or not window_classes or not self._windows.start():
+            return
+        self._prune(now)
+        self._pending.append(_PendingLaunch(name, window_classes, now))
+
+    def _prune(self, now: float):
+        self._pending = [
+            launch
+            for launch in self._pending
+            if now - launch.spawned < FIRST_WINDOW_TIMEOUT_S
+        ]
+
+    def _handle_window_opened(self, window_class: str):
+        now = time.perf_counter()
+        self._prune(now)
+        window_class = window_class.casefold()
+        for launch in self._pending:
+            if window_class in launch.window_classes:
+                self._pending.remove(launch)
+                TRACER.record("launch.spawn_to_first_window", launch.spawned, now)
+                logger.info(
+                    f"'{launch.name}' showed its first window "
+                    f"{(now - launch.spawned) * 1000:.1f} ms after being launched"
+                )
+                return
+
+
+LAUNCHER = LaunchService()
+"""Shared launch service"""
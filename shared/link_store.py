@@ -0,0 +1,230 @@
+"""Storage backends for quick links.
+
+`JsonLinkStore` keeps an in-memory copy of a JSON file, revalidated by mtime, and
+writes it back atomically, coalescing edits made close together into one write.
+`SqliteLinkStore` is meant for collections too big to rewrite on every edit.
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Protocol
+
+from loguru import logger
+
+from shared.paths import atomic_write, user_config_dir
+
+# Edits made within this many seconds of each other are written together
+WRITE_DELAY = 0.5
+
+
+class LinkStore(Protocol):
+    def list(self) -> dict[str, str]:
+        """All links as a dict mapping names to URLs. Don't mutate it."""
+        ...
+
+    def get(self, name: str) -> str | None: ...
+
+    def set(self, name: str, url: str) -> None: ...
+
+    def remove(self, name: str) -> bool:
+        """Removes a link, returns whether it existed"""
+        ...
+
+    def flush(self) -> None:
+        """Writes pending edits right away"""
+        ...
+
+
+class _DelayedWriter:
+    """Calls `write` once, `delay` seconds after the first of a burst of edits"""
+
+    def __init__(self, write, delay: float) -> None:
+        self._write = write
+        self._delay = delay
+        self._timer: threading.Timer | None = None
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def schedule(self):
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self._delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is None:
+                return
+            self._timer.cancel()
+            self._timer = None
+            self._write()
+
+
+class JsonLinkStore:
+    def __init__(self, path: Path, write_delay: float = WRITE_DELAY) -> None:
+        self.path = path
+        self._links: dict[str, str] = {}
+        self._mtime: int | None = None
+        # Edits not written yet, `None` values are removals
+        self._pending: dict[str, str | None] = {}
+        self._lock = threading.RLock()
+        self._writer = _DelayedWriter(self._write, write_delay)
+
+    def list(self) -> dict[str, str]:
+        with self._lock:
+            self._revalidate()
+            return self._links
+
+    def get(self, name: str) -> str | None:
+        return self.list().get(name)
+
+    def set(self, name: str, url: str) -> None:
+        with self._lock:
+            self._revalidate()
+            self._links = {**self._links, name: url}
+            self._pending[name] = url
+        self._writer.schedule()
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            self._revalidate()
+            if name not in self._links:
+                return False
+            self._links = {k: v for k, v in self._links.items() if k != name}
+            self._pending[name] = None
+        self._writer.schedule()
+        return True
+
+    def flush(self) -> None:
+        self._writer.flush()
+
+    def _stat_mtime(self) -> int | None:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _revalidate(self):
+        """Re-reads the file only if it changed since we last saw it"""
+        mtime = self._stat_mtime()
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        links: dict[str, str] = {}
+        if mtime is not None:
+            try:
+                links = json.loads(self.path.read_bytes() or b"{}")
+            except (OSError, ValueError):
+                logger.warning(
+                    f"Could not load links from {self.path}, starting with empty links"
+                )
+        # Edits that haven't been written yet still win
+        for name, url in self._pending.items():
+            if url is None:
+                links.pop(name, None)
+            else:
+                links[name] = url
+        self._links = links
+
+    def _write(self):
+        with self._lock:
+            self._revalidate()
+            data = json.dumps(self._links, indent=2, ensure_ascii=False)
+            try:
+                atomic_write(self.path, data.encode("utf-8"))
+            except OSError:
+                logger.exception(f"Failed to save links to {self.path}")
+                return
+            self._pending.clear()
+            self._mtime = self._stat_mtime()
+
+
+class SqliteLinkStore:
+    def __init__(self, path: Path, write_delay: float = WRITE_DELAY) -> None:
+        self.path = path
+        self._links: dict[str, str] | None = None
+        self._data_version: int | None = None
+        self._pending: dict[str, str | None] = {}
+        self._lock = threading.RLock()
+        self._writer = _DelayedWriter(self._write, write_delay)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS links (name TEXT PRIMARY KEY, url TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+    def list(self) -> dict[str, str]:
+        with self._lock:
+            # `data_version` only changes when another connection wrote to the db
+            (version,) = self._db.execute("PRAGMA data_version").fetchone()
+            if self._links is None or version != self._data_version:
+                self._data_version = version
+                links = dict(self._db.execute("SELECT name, url FROM links"))
+                for name, url in self._pending.items():
+                    if url is None:
+                        links.pop(name, None)
+                    else:
+                        links[name] = url
+                self._links = links
+            return self._links
+
+    def get(self, name: str) -> str | None:
+        return self.list().get(name)
+
+    def set(self, name: str, url: str) -> None:
+        with self._lock:
+            self._links = {**self.list(), name: url}
+            self._pending[name] = url
+        self._writer.schedule()
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            links = self.list()
+            if name not in links:
+                return False
+            self._links = {k: v for k, v in links.items() if k != name}
+            self._pending[name] = None
+        self._writer.schedule()
+        return True
+
+    def flush(self) -> None:
+        self._writer.flush()
+
+    def _write(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            try:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO links (name, url) VALUES (?, ?)",
+                        [(n, u) for n, u in pending.items() if u is not None],
+                    )
+                    self._db.executemany(
+                        "DELETE FROM links WHERE name = ?",
+                        [(n,) for n, u in pending.items() if u is None],
+                    )
+            except sqlite3.Error:
+                logger.exception(f"Failed to save links to {self.path}")
+                self._pending = {**pending, **self._pending}
+
+
+def default_link_store() -> LinkStore:
+    """SQLite store if `quicklinks.db` exists in the config dir, JSON otherwise"""
+    config_dir = user_config_dir()
+    if (db := config_dir / "quicklinks.db").exists():
+        return SqliteLinkStore(db)
+
+    path = config_dir / "quicklinks.json"
+    legacy = Path("quicklinks.json")
+    if not path.exists() and legacy.is_file() and legacy.stat().st_size:
+        # Links used to be read relative to the working directory
+        logger.info(f"Moving quick links from {legacy.resolve()} to {path}")
+        atomic_write(path, legacy.read_bytes())
+    return JsonLinkStore(path)
@@ -0,0 +1,111 @@
+"""Executables found on `$PATH`, for command completion.
+
+Every directory's listing is kept (and snapshotted to the cache dir) along with
+its mtime; revalidating is one `stat` per directory, and only directories that
+changed get listed again.
+"""
+
+import json
+import os
+from pathlib import Path
+
+from loguru import logger
+
+from shared.paths import atomic_write, user_cache_dir
+
+SNAPSHOT_VERSION = 1
+
+
+class PathIndex:
+    def __init__(self, snapshot_file: Path | None = None) -> None:
+        self.snapshot_file = snapshot_file or user_cache_dir() / "path.json"
+        self.generation = 0
+        """Bumped every time the set of executables changes"""
+
+        self._listings: dict[str, tuple[int, list[str]]] = {}
+        self._executables: dict[str, str] = {}
+        self._path = None
+        self._loaded = False
+
+    def executables(self) -> dict[str, str]:
+        """Executable names to their full path, earlier `$PATH` entries first"""
+        self.revalidate()
+        return self._executables
+
+    def resolve(self, name: str) -> str | None:
+        if os.sep in name:
+            return name if os.access(name, os.X_OK) else None
+        return self.executables().get(name)
+
+    def revalidate(self):
+        """Re-lists the `$PATH` directories that changed since last time"""
+        if not self._loaded:
+            self._loaded = True
+            self._load_snapshot()
+
+        path = os.environ.get("PATH", "")
+        dirs = list(dict.fromkeys(d for d in path.split(os.pathsep) if d))
+        changed = path != self._path
+        relisted = False
+        listings: dict[str, tuple[int, list[str]]] = {}
+        for directory in dirs:
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            cached = self._listings.get(directory)
+            if cached is not None and cached[0] == mtime:
+                listings[directory] = cached
+            else:
+                listings[directory] = (mtime, self._list(directory))
+                relisted = True
+        if not (changed or relisted) and listings.keys() == self._listings.keys():
+            return
+
+        self._path = path
+        self._listings = listings
+        executables: dict[str, str] = {}
+        for directory, (_, names) in listings.items():
+            for name in names:
+                executables.setdefault(name, os.path.join(directory, name))
+        self._executables = executables
+        self.generation += 1
+        if relisted:
+            self._save_snapshot()
+
+    def _list(self, directory: str) -> list[str]:
+        names: list[str] = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file() and os.access(entry.path, os.X_OK):
+                            names.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            logger.warning(f"Could not list {directory} from $PATH")
+        return names
+
+    def _load_snapshot(self):
+        try:
+            snapshot = json.loads(self.snapshot_file.read_bytes())
+            if snapshot.get("version") != SNAPSHOT_VERSION:
+                return
+            self._listings = {
+                directory: (mtime, names)
+                for directory, (mtime, names) in snapshot["dirs"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            self._listings = {}
+
+    def _save_snapshot(self):
+        snapshot = {"version": SNAPSHOT_VERSION, "dirs": self._listings}
+        try:
+            atomic_write(self.snapshot_file, json.dumps(snapshot).encode())
+        except OSError:
+            logger.exception("Could not save $PATH index snapshot")
+
+
+PATH_INDEX = PathIndex()
+"""Shared index, loaded on first use"""
@@ -0,0 +1,58 @@
+import os
+import tempfile
+from pathlib import Path
+
+APP_NAME = "fafafa"
+
+
+def _xdg_dir(env: str, fallback: str) -> Path:
+    value = os.environ.get(env, "")
+    # The spec says relative paths must be ignored
+    return Path(value) if os.path.isabs(value) else Path.home() / fallback
+
+
+def user_cache_dir() -> Path:
+    return _xdg_dir("XDG_CACHE_HOME", ".cache") / APP_NAME
+
+
+def user_config_dir() -> Path:
+    return _xdg_dir("XDG_CONFIG_HOME", ".config") / APP_NAME
+
+
+def user_data_dir() -> Path:
+    return _xdg_dir("XDG_DATA_HOME", ".local/share") / APP_NAME
+
+
+def user_runtime_dir() -> Path:
+    """For sockets; falls back to a private dir in /tmp without a session"""
+    if runtime := os.environ.get("XDG_RUNTIME_DIR"):
+        return Path(runtime)
+    fallback = Path(tempfile.gettempdir()) / f"{APP_NAME}-{os.getuid()}"
+    fallback.mkdir(mode=0o700, exist_ok=True)
+    return fallback
+
+
+def data_dirs() -> list[Path]:
+    """XDG data directories, most important first (user's before system ones)"""
+    system = os.environ.get("XDG_DATA_DIRS") or "/usr/local/share:/usr/share"
+    dirs = [_xdg_dir("XDG_DATA_HOME", ".local/share")]
+    dirs.extend(Path(d) for d in system.split(":") if os.path.isabs(d))
+    return list(dict.fromkeys(dirs))
+
+
+def atomic_write(path: Path, data: bytes):
+    """Writes `data` to a temporary file next to `path`, then renames it over.
+
+    Readers see either the old or the new content, never a truncated file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
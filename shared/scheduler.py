@@ -0,0 +1,127 @@
+"""Main loop work in small steps, within a time budget per frame.
+
+Tasks are callables that do a bit of work per call and return True while there's
+more to do, like `GLib.idle_add` callbacks. Instead of one main loop iteration per
+call, steps run back to back until the frame's budget is spent, then the rest
+waits for the next frame; input stays responsive and frames get painted on time.
+
+Every step goes to the most urgent task first: `INPUT` (e.g. showing the results
+of a keystroke) before `DEFAULT` before `BACKGROUND` (e.g. prewarming). Tasks of
+the same priority take turns.
+
+Only for the main thread: other threads hand work over with `GLib.idle_add`.
+"""
+
+import time
+from collections import deque
+from collections.abc import Callable
+from enum import IntEnum
+
+from gi.repository import GLib  # type: ignore
+from loguru import logger
+
+FRAME_MS = 16
+FRAME_BUDGET_MS = 4
+
+type TaskStep = Callable[[], bool]
+"""Does one step of a task, returns whether there's more to do"""
+
+
+class Priority(IntEnum):
+    INPUT = 0
+    DEFAULT = 1
+    BACKGROUND = 2
+
+
+class Task:
+    """Handle of a submitted task"""
+
+    def __init__(self, step: TaskStep, priority: Priority, name: str) -> None:
+        self.step = step
+        self.priority = priority
+        self.name = name
+        self.active = True
+        """False once it's done or cancelled"""
+
+    def cancel(self):
+        self.active = False
+
+
+class Scheduler:
+    def __init__(
+        self, frame_ms: int = FRAME_MS, budget_ms: int = FRAME_BUDGET_MS
+    ) -> None:
+        self.frame_ms = frame_ms
+        self.budget_ms = budget_ms
+        self._queues: tuple[deque[Task], ...] = tuple(deque() for _ in Priority)
+        self._source = 0
+        self._frame_start = 0.0
+        self._frame_spent = 0.0
+
+    def submit(
+        self,
+        step: TaskStep,
+        priority: Priority = Priority.DEFAULT,
+        name: str = "",
+    ) -> Task:
+        """Runs `step` over and over in upcoming frames until it returns False"""
+        task = Task(step, priority, name or getattr(step, "__name__", "task"))
+        self._queues[priority].append(task)
+        if not self._source:
+            self._schedule()
+        return task
+
+    def _schedule(self):
+        now = time.perf_counter()
+        if (now - self._frame_start) * 1000 >= self.frame_ms:
+            self._frame_start, self._frame_spent = now, 0.0
+        if self._frame_spent * 1000 < self.budget_ms:
+            # Below redraws, so a step never holds up a frame due to be painted
+            self._source = GLib.idle_add(self._run, priority=GLib.PRIORITY_DEFAULT_IDLE)
+            return
+        # This frame's budget is spent, carry on with the next one
+        next_frame = self._frame_start + self.frame_ms / 1000
+        self._source = GLib.timeout_add(
+            max(1, round((next_frame - now) * 1000)),
+            self._run,
+            priority=GLib.PRIORITY_DEFAULT_IDLE,
+        )
+
+    def _next_task(self) -> Task | None:
+        for queue in self._queues:
+            while queue:
+                if queue[0].active:
+                    return queue[0]
+                queue.popleft()
+        return None
+
+    def _run(self):
+        self._source = 0
+        now = time.perf_counter()
+        if (now - self._frame_start) * 1000 >= self.frame_ms:
+            self._frame_start, self._frame_spent = now, 0.0
+        deadline = now + self.budget_ms / 1000 - self._frame_spent
+
+        # At least one step, so tasks advance however long their steps take
+        while (task := self._next_task()) is not None:
+            queue = self._queues[task.priority]
+            try:
+                more = task.step()
+            except Exception:
+                logger.exception(f"Scheduled task '{task.name}' failed")
+                more = False
+            if not more:
+                task.active = False
+            elif queue and queue[0] is task:
+                queue.rotate(-1)  # Take turns with the others of its priority
+            if time.perf_counter() >= deadline:
+                break
+
+        self._frame_spent += time.perf_counter() - now
+        if self._next_task() is not None:
+            self._schedule()
+        return False
+
+
+SCHEDULER = Scheduler()
+"""Shared by the runner and plugins"""
@@ -0,0 +1,39 @@
+"""Ranking of global search hits across providers.
+
+Providers score hits on scales of their own, so scores are only compared after
+scaling them to 0..1 within each provider: its best hit gets 1, its worst 0.
+"""
+
+import heapq
+from collections.abc import Iterator, Mapping, Sequence
+from typing import Protocol
+
+
+class Scored(Protocol):
+    score: float
+
+
+def merge_hits[H: Scored](
+    results: Mapping[str, Sequence[H]],
+) -> Iterator[tuple[str, H]]:
+    """`(source, hit)` for all hits, best first. Every sequence must be best first.
+
+    A source whose hits all score the same (e.g. a single one) has nothing to
+    tell them apart by, they all count as its best.
+    """
+
+    def normalized(name: str, hits: Sequence[H]) -> Iterator[tuple[float, str, H]]:
+        if not hits:
+            return
+        best, worst = hits[0].score, hits[-1].score
+        if best == worst:
+            yield from ((-1.0, name, hit) for hit in hits)
+            return
+        span = best - worst
+        yield from ((-(hit.score - worst) / span, name, hit) for hit in hits)
+
+    merged = heapq.merge(
+        *(normalized(name, hits) for name, hits in results.items()),
+        key=lambda entry: entry[0],
+    )
+    return ((name, hit) for _, name, hit in merged)
@@ -0,0 +1,60 @@
+"""Startup time accounting.
+
+Import this before anything heavy, its import time is the reference point for all
+the numbers reported.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+
+from loguru import logger
+
+from shared.paths import atomic_write, user_cache_dir
+
+
+class StartupReport:
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.imports: dict[str, float] = {}
+        """Milliseconds spent importing each (measured) module"""
+        self.marks: dict[str, float] = {}
+        """Milliseconds since start at which each milestone was reached"""
+
+    @contextmanager
+    def measure_import(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.imports[name] = (time.perf_counter() - start) * 1000
+
+    def mark(self, name: str, once: bool = True):
+        if once and name in self.marks:
+            return
+        self.marks[name] = (time.perf_counter() - self.start) * 1000
+
+    def as_dict(self) -> dict:
+        return {
+            "imports_ms": {k: round(v, 3) for k, v in self.imports.items()},
+            "marks_ms": {k: round(v, 3) for k, v in self.marks.items()},
+        }
+
+    def save(self):
+        """Logs the report and writes it to the cache dir as `startup.json`"""
+        report = self.as_dict()
+        logger.info(
+            "Startup: "
+            + ", ".join(f"{k} at {v:.1f}ms" for k, v in self.marks.items())
+            + " | imports: "
+            + ", ".join(f"{k} {v:.1f}ms" for k, v in self.imports.items())
+        )
+        try:
+            atomic_write(
+                user_cache_dir() / "startup.json", json.dumps(report, indent=2).encode()
+            )
+        except OSError:
+            logger.exception("Could not save startup report")
+
+
+STARTUP = StartupReport()
@@ -0,0 +1,205 @@
+"""Compact on-disk trigram index over paths, read through `mmap`.
+
+Layout, little endian, every array aligned to 8 bytes:
+
+    header       magic, metadata length, path count, trigram count
+    metadata     JSON (e.g. the roots and ignore patterns it was built with)
+    path ends    u64[paths], end offset of every path inside the path blob
+    searchable   u32[paths], offset inside every path from which it's indexed
+    trigrams     u32[trigrams], sorted, 3 casefolded UTF-8 bytes packed in a u32
+    posting ends u64[trigrams], end offset of every trigram's postings
+    postings     u32[...], sorted path numbers per trigram
+    path blob    every path followed by a newline
+
+Opening an index only maps the file; nothing is parsed until it's queried. Path
+numbers follow the order paths were written in, so write shallower paths first
+to have them come first among candidates.
+"""
+
+import json
+import mmap
+import re
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from shared.paths import atomic_write
+
+MAGIC = b"FFTRI\x00\x00\x02"
+_HEADER = struct.Struct("<8sIII4x")
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def trigrams(text: bytes) -> set[int]:
+    return {
+        text[i] << 16 | text[i + 1] << 8 | text[i + 2] for i in range(len(text) - 2)
+    }
+
+
+def encode_path(path: str) -> bytes:
+    return path.encode("utf-8", "surrogateescape")
+
+
+def fold(encoded: bytes) -> bytes:
+    """Casefolded, the same way for indexed paths and for query terms"""
+    return encode_path(encoded.decode("utf-8", "surrogateescape").casefold())
+
+
+def _case_insensitive(term: str) -> re.Pattern[bytes]:
+    # `re.IGNORECASE` on bytes only knows ASCII, spell out every char's cases
+    parts = []
+    for char in term:
+        cases = sorted({encode_path(c) for c in (char, char.lower(), char.upper())})
+        escaped = [re.escape(case) for case in cases]
+        parts.append(
+            escaped[0] if len(escaped) == 1 else b"(?:%b)" % b"|".join(escaped)
+        )
+    return re.compile(b"".join(parts))
+
+
+def write_index(
+    file: Path,
+    paths: Iterable[str],
+    metadata: dict,
+    searchable_from: Iterable[int] | None = None,
+):
+    """Writes an index of `paths`.
+
+    `searchable_from` holds, per path, the offset (in encoded bytes) from which it
+    gets indexed, e.g. to leave out the root all paths share.
+    """
+    blob = bytearray()
+    ends = array("Q")
+    starts = array("I")
+    postings: dict[int, array] = {}
+    offsets = iter(searchable_from) if searchable_from is not None else None
+    for number, path in enumerate(paths):
+        encoded = encode_path(path)
+        blob += encoded
+        blob += b"\n"
+        ends.append(len(blob) - 1)
+        start = next(offsets, 0) if offsets is not None else 0
+        starts.append(start)
+        for gram in trigrams(fold(encoded[start:])):
+            if (posting := postings.get(gram)) is None:
+                posting = postings[gram] = array("I")
+            posting.append(number)
+
+    keys = array("I", sorted(postings))
+    posting_ends = array("Q")
+    all_postings = array("I")
+    for key in keys:
+        all_postings.extend(postings[key])
+        posting_ends.append(len(all_postings))
+
+    meta = json.dumps(metadata).encode()
+    out = bytearray(_HEADER.pack(MAGIC, len(meta), len(ends), len(keys)))
+    for section in (meta, ends, starts, keys, posting_ends, all_postings, blob):
+        out += b"\x00" * (_align(len(out)) - len(out))
+        out += section.tobytes() if isinstance(section, array) else section
+    atomic_write(file, bytes(out))
+
+
+class TrigramIndex:
+    """Read-only view over an index file written by `write_index`"""
+
+    def __init__(self, file: Path) -> None:
+        with open(file, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        magic, meta_size, path_count, gram_count = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"{file} is not a path index")
+
+        offset = _HEADER.size
+
+        def section(size: int) -> memoryview:
+            nonlocal offset
+            offset = _align(offset)
+            part = view[offset : offset + size]
+            offset += size
+            return part
+
+        self.metadata: dict = json.loads(bytes(section(meta_size)))
+        self._ends = section(path_count * 8).cast("Q")
+        self._starts = section(path_count * 4).cast("I")
+        self._keys = section(gram_count * 4).cast("I")
+        self._posting_ends = section(gram_count * 8).cast("Q")
+        postings_count = self._posting_ends[-1] if gram_count else 0
+        self._postings = section(postings_count * 4).cast("I")
+        offset = _align(offset)
+        self._blob_start = offset
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    def path(self, number: int) -> str:
+        start = self._blob_start + (self._ends[number - 1] + 1 if number else 0)
+        end = self._blob_start + self._ends[number]
+        return self._map[start:end].decode("utf-8", "surrogateescape")
+
+    def paths(self) -> Iterator[str]:
+        for number in range(len(self)):
+            yield self.path(number)
+
+    def candidates(self, terms: list[str], limit: int) -> list[int]:
+        """Numbers of (up to `limit`) paths that may contain every term.
+
+        Terms shorter than 3 bytes can't use trigrams; if all of them are that
+        short, the path blob is scanned for the first one instead.
+        """
+        folded = [term.casefold() for term in terms]
+        grams = set().union(*(trigrams(encode_path(term)) for term in folded))
+        if not grams:
+            return self._scan(max(folded, key=len), limit)
+
+        postings: list[memoryview] = []
+        for gram in grams:
+            i = bisect_left(self._keys, gram)
+            if i == len(self._keys) or self._keys[i] != gram:
+                return []
+            start = self._posting_ends[i - 1] if i else 0
+            postings.append(self._postings[start : self._posting_ends[i]])
+
+        postings.sort(key=len)
+        numbers = list(postings[0])
+        for posting in postings[1:]:
+            if not numbers:
+                break
+            if len(numbers) * 16 < len(posting):
+                # Few candidates left, binary search the (much longer) posting
+                numbers = [
+                    n for n in numbers if _contains_sorted(posting, n, len(posting))
+                ]
+            else:
+                numbers = sorted(set(numbers).intersection(posting))
+        return numbers[:limit]
+
+    def _scan(self, term: str, limit: int) -> list[int]:
+        numbers: list[int] = []
+        if not term:
+            return numbers
+        blob_start, ends, starts = self._blob_start, self._ends, self._starts
+        pattern = _case_insensitive(term)
+        position = blob_start
+        while len(numbers) < limit and (found := pattern.search(self._map, position)):
+            number = bisect_left(ends, found.start() - blob_start)
+            path_start = blob_start + (ends[number - 1] + 1 if number else 0)
+            if found.start() < path_start + starts[number]:
+                # In the part that isn't indexed (e.g. the root), look further on
+                position = path_start + starts[number]
+                continue
+            numbers.append(number)
+            # Skip to the next path, one hit per path is enough
+            position = blob_start + ends[number] + 1
+        return numbers
+
+
+def _contains_sorted(values: memoryview, value: int, size: int) -> bool:
+    i = bisect_right(values, value, 0, size)
+    return i > 0 and values[i - 1] == value
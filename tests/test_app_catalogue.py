@@ -0,0 +1,35 @@
+import pytest
+
+Gio = pytest.importorskip("gi.repository.Gio")
+GLib = pytest.importorskip("gi.repository.GLib")
+app_catalogue = pytest.importorskip("shared.app_catalogue")
+
+
+def test_deleted_subdirectory_drops_its_entries(tmp_path):
+    root = tmp_path / "applications"
+    (root / "vendor").mkdir(parents=True)
+    catalogue = app_catalogue.AppCatalogue(tmp_path / "apps.json")
+    catalogue._roots = [root]
+    catalogue._loaded = True
+    catalogue._entries = {
+        desktop_id: app_catalogue.AppEntry(
+            id=desktop_id, path=str(path), name=desktop_id, display_name=desktop_id
+        )
+        for desktop_id, path in [
+            ("vendor-a.desktop", root / "vendor" / "a.desktop"),
+            ("vendor-b.desktop", root / "vendor" / "b.desktop"),
+            ("other.desktop", root / "other.desktop"),
+        ]
+    }
+    (root / "vendor").rmdir()
+
+    catalogue._handle_monitor_event(
+        None,
+        Gio.File.new_for_path(str(root / "vendor")),
+        None,
+        Gio.FileMonitorEvent.DELETED,
+    )
+    GLib.source_remove(catalogue._update_handler)
+    catalogue._apply_updates()
+
+    assert [entry.id for entry in catalogue.entries] == ["other.desktop"]
@@ -0,0 +1,14 @@
+import stat
+
+from shared.clipboard_history import ClipboardRing
+
+
+def test_large_entries_are_private(tmp_path):
+    ring = ClipboardRing(tmp_path / "clipboard.ring", capacity=4)
+    seq = ring.append(b"secret " * 1000, "text/plain")
+
+    blob = ring._blob_file(seq)
+    assert stat.S_IMODE(ring.blob_dir.stat().st_mode) == 0o700
+    assert stat.S_IMODE(blob.stat().st_mode) == 0o600
+    assert stat.S_IMODE(ring.file.stat().st_mode) == 0o600
+    assert ring.content(seq) == (b"secret " * 1000, "text/plain")
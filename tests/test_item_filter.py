@@ -0,0 +1,58 @@
+from modules.runner.item_filter import ItemFilter
+from modules.runner.matcher import FuzzyMatcher
+
+
+def test_blank_query_stays_alphabetical_with_boosts():
+    items = {0: "Zathura", 1: "gimp", 2: "Firefox", 3: "ls", 4: "cat", 5: "awk"}
+    # Commands ranked below apps, as the apps launcher does
+    boosts = {3: -10_000, 4: -10_000, 5: -10_000}
+    item_filter = ItemFilter(items, matcher=FuzzyMatcher(), boosts=boosts)
+
+    keys = [match.key for match in item_filter.filter("")]
+
+    assert keys == [2, 1, 0, 5, 4, 3]
+
+
+def test_boosted_query_ranks_by_score():
+    items = {0: "firefox", 1: "fish"}
+    item_filter = ItemFilter(items, matcher=FuzzyMatcher(), boosts={1: 1000})
+
+    assert [match.key for match in item_filter.filter("fi")] == [1, 0]
+
+
+class _RecordingMatcher(FuzzyMatcher):
+    def __init__(self) -> None:
+        super().__init__()
+        self.candidates: list[list[int] | None] = []
+
+    def match(self, query, items, candidates=None, cancelled=None, ranked=True):
+        self.candidates.append(None if candidates is None else list(candidates))
+        return super().match(query, items, candidates, cancelled, ranked)
+
+
+def test_limit_applies_after_narrowing():
+    items = {n: f"file {n}" for n in range(300)} | {300: "other"}
+    matcher = _RecordingMatcher()
+    item_filter = ItemFilter(items, matcher=matcher, limit=10)
+
+    assert len(item_filter.filter("f")) == 10
+    narrowed = item_filter.filter("fi")
+
+    # Searched among every match of "f", not only the 10 returned
+    assert matcher.candidates[-1] is not None
+    assert len(matcher.candidates[-1]) == 300
+    assert narrowed == FuzzyMatcher().match("fi", item_filter.items)[:10]
+    assert item_filter.cached("fi") == narrowed
+    # Blank queries list everything
+    assert len(item_filter.filter("")) == 301
+
+
+def test_boosts_apply_before_the_limit():
+    items = {n: f"fire {n}" for n in range(150)} | {150: "xfxixrxe"}
+    item_filter = ItemFilter(
+        items, matcher=FuzzyMatcher(), boosts={150: 1000}, limit=10
+    )
+
+    # The weakest match by far, but launched often
+    assert item_filter.filter("fir")[0].key == 150
+    assert item_filter.filter("fire")[0].key == 150
@@ -0,0 +1,30 @@
+from benchmarks.corpus import THROUGHPUT_QUERIES, generate_items
+from modules.runner.matcher import FuzzyMatcher, PreparedItems, SubstringMatcher
+
+
+def test_limit_keeps_the_best_of_the_full_ranking():
+    items = PreparedItems(generate_items(3000))
+    for query in [*THROUGHPUT_QUERIES, "s", "se", "lib wri"]:
+        ranked = FuzzyMatcher().match(query, items)
+        best = FuzzyMatcher(limit=50).match(query, items)
+        assert [m.index for m in best] == [m.index for m in ranked[:50]], query
+
+
+def test_substring_search_takes_in_added_items():
+    items = PreparedItems({1: "Firefox", 2: "Füße"})
+    matcher = SubstringMatcher()
+    assert [m.key for m in matcher.match("f", items)] == [2, 1]
+
+    items.extend({3: "Fish", 4: "Fächer"})
+    assert [m.key for m in matcher.match("f", items)] == [3, 2, 4, 1]
+    assert [m.key for m in matcher.match("ä", items)] == [4]
+
+
+def test_positions_point_into_the_original_string():
+    items = PreparedItems({1: "Straße Fix", 2: "ﬁle Manager", 3: "Plain"})
+
+    assert FuzzyMatcher().match("fix", items)[0].positions == (7, 8, 9)
+    assert FuzzyMatcher().match("sse", items)[0].positions == (4, 5)
+    assert FuzzyMatcher().match("le man", items)[0].positions == (1, 2, 4, 5, 6)
+    assert SubstringMatcher().match("ss", items)[0].positions == (4,)
+    assert FuzzyMatcher().match("pl", items)[0].positions == (0, 1)
@@ -0,0 +1,36 @@
+from dataclasses import dataclass
+
+from shared.search_ranking import merge_hits
+
+
+@dataclass
+class Hit:
+    text: str
+    score: float
+
+
+def test_single_hit_source_ranks_with_the_best():
+    files = [Hit(f"file {n}", 100 - n) for n in range(50)]
+    apps = [Hit("Firefox", 120)]
+
+    merged = [hit.text for _, hit in merge_hits({"files": files, "apps": apps})]
+
+    assert merged.index("Firefox") <= 1
+    assert merged[:3] == ["file 0", "Firefox", "file 1"]
+
+
+def test_sources_scale_their_scores_separately():
+    merged = merge_hits(
+        {
+            "a": [Hit("a best", 1000), Hit("a worst", 10)],
+            "b": [Hit("b best", 3), Hit("b middle", 2), Hit("b worst", 1)],
+        }
+    )
+
+    assert [(name, hit.text) for name, hit in merged] == [
+        ("a", "a best"),
+        ("b", "b best"),
+        ("b", "b middle"),
+        ("a", "a worst"),
+        ("b", "b worst"),
+    ]
@@ -0,0 +1,30 @@
+from shared.trigram_index import TrigramIndex, encode_path, write_index
+
+ROOT = "/home/user/"
+
+
+def _index(tmp_path, paths: list[str]) -> TrigramIndex:
+    file = tmp_path / "files.idx"
+    write_index(file, paths, {}, [len(encode_path(ROOT))] * len(paths))
+    return TrigramIndex(file)
+
+
+def _found(index: TrigramIndex, terms: list[str]) -> list[str]:
+    return [index.path(number) for number in index.candidates(terms, 100)]
+
+
+def test_non_ascii_uppercase_matches(tmp_path):
+    index = _index(tmp_path, [ROOT + "Ärger/Übersicht.txt", ROOT + "other.txt"])
+
+    assert _found(index, ["ärger"]) == [ROOT + "Ärger/Übersicht.txt"]
+    assert _found(index, ["ÜBERSICHT"]) == [ROOT + "Ärger/Übersicht.txt"]
+    # Too short for trigrams, scanned for instead
+    assert _found(index, ["Üb"]) == [ROOT + "Ärger/Übersicht.txt"]
+
+
+def test_short_terms_skip_the_root(tmp_path):
+    index = _index(tmp_path, [ROOT + "notes.txt", ROOT + "Music/"])
+
+    # Both paths have "us" in "/home/user/", only one below it
+    assert _found(index, ["us"]) == [ROOT + "Music/"]
+    assert _found(index, ["US"]) == [ROOT + "Music/"]